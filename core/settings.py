@@ -195,6 +195,8 @@ if _env_csrf:
 
 # OpenAI API Configuration
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+# Optional OpenAI-compatible endpoint (proxy, Azure gateway or a local stand-in server)
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', '')
 
 # Optional local CAD converters (Windows). Set full paths via environment if available.
 # Example: ODA_CONVERTER_PDF = r"C:\\Program Files\\ODA\\dwg2pdf.exe"
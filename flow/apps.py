@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FlowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'flow'
+
+    def ready(self):
+        # Import signals
+        from . import signals  # noqa: F401
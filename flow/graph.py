@@ -0,0 +1,260 @@
+"""
+Compiled, read-only view of flow definitions.
+
+Flows, their steps and dependencies, and subflows change rarely but are read
+on nearly every request. ``get_flow_graph`` loads a flow once (six queries)
+into immutable nodes: active steps in topological order, incoming and
+outgoing dependency edges with their type and lag, and each step's active
+subflows with their own steps and edges. Compiled graphs are memoised per
+process and keyed on the version stored in the FlowGraphVersion row, so the
+version is shared by every worker whatever cache backend is configured.
+post_save and post_delete on any definition model give the row a new
+version (see signals.py). The process that made the change rebuilds on its
+next read; other processes re-read the row at most every
+VERSION_CHECK_SECONDS and rebuild then.
+
+Queryset ``.update()`` sends no signals. Code that bulk-edits definitions
+that way must call ``invalidate()`` itself.
+"""
+import heapq
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+
+from .models import Flow, FlowDependency, FlowGraphVersion, FlowStep, SubFlow, SubFlowStep
+
+# How long a process trusts the version it last read from the database
+VERSION_CHECK_SECONDS = getattr(settings, 'FLOW_GRAPH_VERSION_CHECK_SECONDS', 5)
+
+_memo: Dict[object, Tuple[int, object]] = {}
+_memo_lock = threading.Lock()
+# (version, monotonic time it was read)
+_version: Optional[Tuple[int, float]] = None
+
+
+@dataclass(frozen=True)
+class Edge:
+    predecessor_id: int
+    successor_id: int
+    dependency_type: str
+    lag_time: timedelta
+
+
+@dataclass(frozen=True)
+class StepNode:
+    id: int
+    step_name: str
+    description: str
+    order: int
+    estimated_duration: timedelta
+    is_required: bool
+    is_active: bool
+    app_name: str = ""
+
+    @property
+    def formatted_duration(self) -> str:
+        from main.templatetags.main_tags import format_duration
+        return format_duration(self.estimated_duration)
+
+
+@dataclass(frozen=True)
+class SubFlowGraph:
+    id: int
+    name: str
+    description: str
+    main_flow_step_id: int
+    steps: Tuple[StepNode, ...]
+
+
+@dataclass(frozen=True)
+class FlowGraph:
+    id: int
+    name: str
+    is_active: bool
+    version: int
+    # Active steps, predecessors first (ties broken by ``order``)
+    steps: Tuple[StepNode, ...]
+    # Every step by id, inactive ones included (project steps may still point at them)
+    nodes: Mapping[int, StepNode]
+    predecessors: Mapping[int, Tuple[Edge, ...]]
+    successors: Mapping[int, Tuple[Edge, ...]]
+    # Active subflows per main step id
+    subflows: Mapping[int, Tuple[SubFlowGraph, ...]]
+    # Incoming edges of every subflow step of this flow, by subflow step id
+    subflow_predecessors: Mapping[int, Tuple[Edge, ...]]
+
+    def step_for_app(self, app_name: str) -> Optional[StepNode]:
+        return next((step for step in self.steps if step.app_name == app_name), None)
+
+    def subflows_for(self, step_id: int) -> Tuple[SubFlowGraph, ...]:
+        return self.subflows.get(step_id, ())
+
+
+def graph_version() -> int:
+    global _version
+    if _version is not None and time.monotonic() - _version[1] < VERSION_CHECK_SECONDS:
+        return _version[0]
+    version = FlowGraphVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+    _version = (version, time.monotonic())
+    return version
+
+
+def invalidate() -> None:
+    """Mark every compiled graph stale, in this process now and in others on their next check."""
+    global _version
+    # A fresh clock value rather than +1, so a rolled-back bump is never reused
+    FlowGraphVersion.objects.update_or_create(pk=1, defaults={"version": time.time_ns()})
+    _version = None
+
+
+def expire_version() -> None:
+    """Re-read the version on the next access instead of trusting the one last read."""
+    global _version
+    _version = None
+
+
+def _memoised(key, build):
+    version = graph_version()
+    hit = _memo.get(key)
+    if hit and hit[0] == version:
+        return hit[1]
+    value = build(version)
+    with _memo_lock:
+        _memo[key] = (version, value)
+    return value
+
+
+def _edges_by(edges: List[Edge], attr: str) -> Mapping[int, Tuple[Edge, ...]]:
+    grouped: Dict[int, List[Edge]] = {}
+    for edge in edges:
+        grouped.setdefault(getattr(edge, attr), []).append(edge)
+    return MappingProxyType({key: tuple(value) for key, value in grouped.items()})
+
+
+def _topological(steps: List[StepNode], edges: List[Edge]) -> Tuple[StepNode, ...]:
+    """Kahn's algorithm in O(V+E log V); steps caught in a cycle keep their ``order``."""
+    by_id = {step.id: step for step in steps}
+    indegree = {step.id: 0 for step in steps}
+    successors: Dict[int, List[int]] = {}
+    for edge in edges:
+        if edge.predecessor_id in by_id and edge.successor_id in by_id:
+            indegree[edge.successor_id] += 1
+            successors.setdefault(edge.predecessor_id, []).append(edge.successor_id)
+    ready = [(step.order, step.id) for step in steps if indegree[step.id] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _order, step_id = heapq.heappop(ready)
+        ordered.append(by_id[step_id])
+        for successor_id in successors.get(step_id, ()):
+            indegree[successor_id] -= 1
+            if indegree[successor_id] == 0:
+                heapq.heappush(ready, (by_id[successor_id].order, successor_id))
+    if len(ordered) < len(steps):
+        placed = {step.id for step in ordered}
+        ordered += sorted((step for step in steps if step.id not in placed), key=lambda s: (s.order, s.id))
+    return tuple(ordered)
+
+
+def _edge(dep) -> Edge:
+    return Edge(dep.predecessor_id, dep.successor_id, dep.dependency_type, dep.lag_time)
+
+
+def _compile(flow: Flow, version: int) -> FlowGraph:
+    nodes = {
+        step.id: StepNode(step.id, step.step_name, step.description, step.order, step.estimated_duration,
+                          step.is_required, step.is_active, step.app_name)
+        for step in FlowStep.objects.filter(flow=flow).order_by()
+    }
+    edges = [_edge(dep) for dep in FlowDependency.objects.filter(flow=flow, is_active=True)]
+
+    subflows: Dict[int, List[SubFlowGraph]] = {}
+    all_sub_edges: List[Edge] = []
+    rows = SubFlow.objects.filter(main_flow_step__flow=flow).order_by("name", "id").prefetch_related("steps", "dependencies")
+    for subflow in rows:
+        sub_edges = [_edge(dep) for dep in subflow.dependencies.all() if dep.is_active]
+        all_sub_edges += sub_edges
+        if not subflow.is_active:
+            continue
+        sub_steps = [
+            StepNode(s.id, s.step_name, s.description, s.order, s.estimated_duration, s.is_required, s.is_active)
+            for s in subflow.steps.all() if s.is_active
+        ]
+        subflows.setdefault(subflow.main_flow_step_id, []).append(SubFlowGraph(
+            subflow.id, subflow.name, subflow.description, subflow.main_flow_step_id,
+            _topological(sub_steps, sub_edges),
+        ))
+
+    return FlowGraph(
+        id=flow.id,
+        name=flow.name,
+        is_active=flow.is_active,
+        version=version,
+        steps=_topological([node for node in nodes.values() if node.is_active], edges),
+        nodes=MappingProxyType(nodes),
+        predecessors=_edges_by(edges, "successor_id"),
+        successors=_edges_by(edges, "predecessor_id"),
+        subflows=MappingProxyType({key: tuple(value) for key, value in subflows.items()}),
+        subflow_predecessors=_edges_by(all_sub_edges, "successor_id"),
+    )
+
+
+def get_flow_graph(flow_id: int) -> FlowGraph:
+    def build(version):
+        return _compile(Flow.objects.get(pk=flow_id), version)
+    return _memoised(("flow", flow_id), build)
+
+
+def _index(version) -> dict:
+    """Which flow owns each step and subflow step, plus the main flow and app lookup."""
+    flows = list(Flow.objects.values_list("id", "is_active").order_by("name", "id"))
+    steps = list(FlowStep.objects.order_by().values_list("id", "flow_id", "app_name", "is_active"))
+    sub_steps = SubFlowStep.objects.order_by().values_list("id", "subflow__main_flow_step__flow_id")
+    return {
+        "main_flow_id": next((flow_id for flow_id, is_active in flows if is_active), None),
+        "step_flow": {step_id: flow_id for step_id, flow_id, _app, _active in steps},
+        "subflow_step_flow": dict(sub_steps),
+        "app_steps": {app: flow_id for _id, flow_id, app, is_active in steps if is_active},
+    }
+
+
+def _flow_index() -> dict:
+    return _memoised("index", _index)
+
+
+def get_main_flow_graph() -> Optional[FlowGraph]:
+    """The first active flow by name (the one the dashboard and new projects use)."""
+    flow_id = _flow_index()["main_flow_id"]
+    return get_flow_graph(flow_id) if flow_id else None
+
+
+def find_app_step(app_name: str) -> Tuple[Optional[FlowGraph], Optional[StepNode]]:
+    flow_id = _flow_index()["app_steps"].get(app_name)
+    if flow_id is None:
+        return None, None
+    graph = get_flow_graph(flow_id)
+    return graph, graph.step_for_app(app_name)
+
+
+def flow_app_names() -> List[str]:
+    return sorted(_flow_index()["app_steps"])
+
+
+def step_predecessors(flow_step_id: int) -> Tuple[int, ...]:
+    flow_id = _flow_index()["step_flow"].get(flow_step_id)
+    if flow_id is None:
+        return ()
+    return tuple(edge.predecessor_id for edge in get_flow_graph(flow_id).predecessors.get(flow_step_id, ()))
+
+
+def subflow_step_predecessors(subflow_step_id: int) -> Tuple[int, ...]:
+    flow_id = _flow_index()["subflow_step_flow"].get(subflow_step_id)
+    if flow_id is None:
+        return ()
+    edges = get_flow_graph(flow_id).subflow_predecessors.get(subflow_step_id, ())
+    return tuple(edge.predecessor_id for edge in edges)
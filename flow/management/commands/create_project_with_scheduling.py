@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
-from flow.models import Flow, FlowStep, Project, ProjectStep, SubFlow, SubFlowStep, ProjectSubFlowStep
-from datetime import timedelta
+from flow.utils import create_project_with_scheduling, create_projects_with_scheduling
 
 class Command(BaseCommand):
     help = 'Creates a new project with automatic scheduling based on flow durations'
@@ -30,6 +29,12 @@ class Command(BaseCommand):
             type=str,
             help='Username to assign the project to',
         )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=1,
+            help='Number of projects to create in bulk, named "<name> 1".."<name> N" (for load testing)',
+        )
 
     def handle(self, *args, **options):
         project_name = options['name']
@@ -56,89 +61,42 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'User "{options["assigned_to"]}" not found'))
                 return
         
-        # Get the main flow
-        try:
-            flow = Flow.objects.filter(is_active=True).first()
-            if not flow:
-                self.stdout.write(self.style.ERROR('No active flow found. Please run setup_flows first.'))
+        if options['count'] > 1:
+            projects = create_projects_with_scheduling(
+                [f'{project_name} {i+1}' for i in range(options['count'])],
+                project_description,
+                assigned_user,
+                start_datetime,
+            )
+            if not projects:
+                self.stdout.write(self.style.ERROR('No active flow with steps found. Please run setup_flows first.'))
                 return
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error getting flow: {e}'))
-            return
-
-        # Get flow steps in order
-        flow_steps = FlowStep.objects.filter(flow=flow, is_active=True).order_by('order')
-        if not flow_steps.exists():
-            self.stdout.write(self.style.ERROR('No flow steps found.'))
+            self.stdout.write(self.style.SUCCESS(f'Created {len(projects)} projects: {projects[0].name} .. {projects[-1].name}'))
+            self.stdout.write(f'Scheduled from {start_datetime.strftime("%Y-%m-%d")} to {projects[0].target_completion_date.strftime("%Y-%m-%d")}')
             return
 
-        # Create the project
-        project = Project.objects.create(
-            name=project_name,
-            description=project_description,
-            flow=flow,
-            created_by=User.objects.filter(is_superuser=True).first(),
-            assigned_to=assigned_user,
-            status='not_started',
-            start_date=start_datetime
+        # Create and schedule the project (critical-path dates, see flow/scheduling.py)
+        project = create_project_with_scheduling(
+            project_name=project_name,
+            project_description=project_description,
+            assigned_user=assigned_user,
+            start_date=start_datetime,
         )
+        if not project:
+            self.stdout.write(self.style.ERROR('No active flow with steps found. Please run setup_flows first.'))
+            return
 
         self.stdout.write(self.style.SUCCESS(f'Created project: {project.name}'))
 
-        # Calculate scheduling
-        current_date = start_datetime
-        total_duration = timedelta(0)
-
-        for flow_step in flow_steps:
-            # Calculate target completion date for this main step
-            step_duration = flow_step.estimated_duration
-            target_completion = current_date + step_duration
-            total_duration += step_duration
-
-            # Create project step
-            project_step = ProjectStep.objects.create(
-                project=project,
-                flow_step=flow_step,
-                status='pending',
-                assigned_to=assigned_user,
-                target_completion_date=target_completion
-            )
-
-            self.stdout.write(f'  Created main step: {flow_step.step_name} (Due: {target_completion.strftime("%Y-%m-%d %H:%M")})')
-
-            # Create subflow steps for this main step
-            subflows = SubFlow.objects.filter(main_flow_step=flow_step, is_active=True)
-            subflow_current_date = current_date
-
-            for subflow in subflows:
-                subflow_steps = SubFlowStep.objects.filter(subflow=subflow, is_active=True).order_by('order')
-                
-                for subflow_step in subflow_steps:
-                    # Calculate target completion date for this subflow step
-                    subflow_step_duration = subflow_step.estimated_duration
-                    subflow_target_completion = subflow_current_date + subflow_step_duration
-
-                    # Create project subflow step
-                    project_subflow_step = ProjectSubFlowStep.objects.create(
-                        project=project,
-                        subflow_step=subflow_step,
-                        status='pending',
-                        assigned_to=assigned_user,
-                        target_completion_date=subflow_target_completion
-                    )
-
-                    self.stdout.write(f'    Created sub-step: {subflow_step.step_name} (Due: {subflow_target_completion.strftime("%Y-%m-%d %H:%M")})')
-                    
-                    # Move to next subflow step (finish-to-start dependency)
-                    subflow_current_date = subflow_target_completion
-
-            # Move to next main step (finish-to-start dependency)
-            current_date = target_completion
-
-        # Set project target completion date
-        project.target_completion_date = start_datetime + total_duration
-        project.save()
+        sub_steps = {}
+        for sub_step in project.subflow_steps.select_related('subflow_step__subflow'):
+            sub_steps.setdefault(sub_step.subflow_step.subflow.main_flow_step_id, []).append(sub_step)
+        for project_step in project.project_steps.select_related('flow_step').order_by('target_completion_date', 'flow_step__order'):
+            self.stdout.write(f'  Created main step: {project_step.flow_step.step_name} (Due: {project_step.target_completion_date.strftime("%Y-%m-%d %H:%M")})')
+            for sub_step in sorted(sub_steps.get(project_step.flow_step_id, []), key=lambda s: s.target_completion_date):
+                self.stdout.write(f'    Created sub-step: {sub_step.subflow_step.step_name} (Due: {sub_step.target_completion_date.strftime("%Y-%m-%d %H:%M")})')
 
+        total_duration = project.target_completion_date - start_datetime
         self.stdout.write(self.style.SUCCESS(f'Project scheduled from {start_datetime.strftime("%Y-%m-%d")} to {project.target_completion_date.strftime("%Y-%m-%d")}'))
         self.stdout.write(f'Total estimated duration: {total_duration.days} days, {total_duration.seconds // 3600} hours')
         self.stdout.write(f'Project ID: {project.id}')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0002_subflow_subflowstep_subflowdependency_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlowGraphVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Flow Graph Version',
+            },
+        ),
+    ]
@@ -188,27 +188,20 @@ class ProjectStep(models.Model):
     @property
     def can_start(self):
         """Check if this step can start based on dependencies"""
-        if self.status != 'pending':
-            return False
-        
-        # Check if all predecessor steps are completed
-        dependencies = FlowDependency.objects.filter(
-            successor=self.flow_step,
-            is_active=True
-        )
-        
-        for dep in dependencies:
-            try:
-                pred_step = ProjectStep.objects.get(
-                    project=self.project,
-                    flow_step=dep.predecessor
-                )
-                if pred_step.status != 'completed':
-                    return False
-            except ProjectStep.DoesNotExist:
-                return False
-        
-        return True
+        cached = getattr(self, '_can_start', None)
+        if cached and cached[0] == self.status:
+            return cached[1]
+        return ProjectStep.resolve_can_start([self])[self.pk]
+
+    @classmethod
+    def resolve_can_start(cls, project_steps):
+        """can_start for many project steps in one query (given a warm flow graph).
+
+        Returns {pk: bool} and caches the answer on each instance, so
+        ``can_start`` (also in templates) costs nothing afterwards.
+        """
+        from .graph import step_predecessors
+        return _resolve_can_start(project_steps, cls, 'flow_step', step_predecessors)
 
 class SubFlow(models.Model):
     """Sub-flows within main flow steps"""
@@ -330,27 +323,47 @@ class ProjectSubFlowStep(models.Model):
     @property
     def can_start(self):
         """Check if this subflow step can start based on dependencies"""
-        if self.status != 'pending':
-            return False
+        cached = getattr(self, '_can_start', None)
+        if cached and cached[0] == self.status:
+            return cached[1]
+        return ProjectSubFlowStep.resolve_can_start([self])[self.pk]
 
-        # Check if all predecessor steps are completed
-        dependencies = SubFlowDependency.objects.filter(
-            successor=self.subflow_step,
-            is_active=True
-        )
+    @classmethod
+    def resolve_can_start(cls, project_steps):
+        """Bulk can_start, as ProjectStep.resolve_can_start."""
+        from .graph import subflow_step_predecessors
+        return _resolve_can_start(project_steps, cls, 'subflow_step', subflow_step_predecessors)
 
-        for dep in dependencies:
-            try:
-                pred_step = ProjectSubFlowStep.objects.get(
-                    project=self.project,
-                    subflow_step=dep.predecessor
-                )
-                if pred_step.status != 'completed':
-                    return False
-            except ProjectSubFlowStep.DoesNotExist:
-                return False
 
-        return True
+def _resolve_can_start(project_steps, step_model, node, predecessors_of):
+    """A pending step can start once every active predecessor of its flow (or
+    subflow) step has a completed instance in the same project. Dependency
+    edges come from the compiled flow graph, so the only query is one IN
+    lookup of the predecessor instances' statuses."""
+    project_steps = list(project_steps)
+    node_id = node + '_id'
+    ready = {ps.pk: False for ps in project_steps}
+    pending = [ps for ps in project_steps if ps.status == 'pending']
+
+    predecessors = {getattr(ps, node_id): predecessors_of(getattr(ps, node_id)) for ps in pending}
+    waiting = [ps for ps in pending if predecessors[getattr(ps, node_id)]]
+    statuses = {}
+    if waiting:
+        rows = step_model.objects.filter(**{
+            'project_id__in': {ps.project_id for ps in waiting},
+            node_id + '__in': set().union(*(predecessors[getattr(ps, node_id)] for ps in waiting)),
+        }).order_by().values_list('project_id', node_id, 'status')
+        statuses = {(project_id, pred_id): status for project_id, pred_id, status in rows}
+
+    for ps in pending:
+        ready[ps.pk] = all(
+            statuses.get((ps.project_id, pred_id)) == 'completed'
+            for pred_id in predecessors[getattr(ps, node_id)]
+        )
+    for ps in project_steps:
+        # Keyed by status so a later status change on the instance is not masked
+        ps._can_start = (ps.status, ready[ps.pk])
+    return ready
 
 class FlowTemplate(models.Model):
     """Templates for common flows"""
@@ -368,3 +381,14 @@ class FlowTemplate(models.Model):
 
     def __str__(self):
         return self.name
+
+class FlowGraphVersion(models.Model):
+    """Single row whose version changes whenever a flow definition does (see graph.py)"""
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Flow Graph Version"
+
+    def __str__(self):
+        return str(self.version)
@@ -0,0 +1,130 @@
+"""
+Critical-path scheduling over a compiled flow graph.
+
+``schedule`` runs the classic forward and backward passes in O(V+E) over
+steps that are already in topological order (FlowGraph.steps and
+SubFlowGraph.steps are). It honours all four dependency types and their lag
+times:
+
+    finish_to_start   successor starts  >= predecessor finishes + lag
+    start_to_start    successor starts  >= predecessor starts   + lag
+    finish_to_finish  successor finishes >= predecessor finishes + lag
+    start_to_finish   successor finishes >= predecessor starts   + lag
+
+Steps with no active predecessors start with the project. Edges to inactive
+steps, or to steps outside the set being scheduled, are ignored.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Mapping, Sequence, Tuple
+
+from .graph import Edge, FlowGraph, StepNode, SubFlowGraph
+
+
+@dataclass(frozen=True)
+class ScheduledStep:
+    step: StepNode
+    earliest_start: datetime
+    earliest_finish: datetime
+    latest_start: datetime
+    latest_finish: datetime
+
+    @property
+    def duration(self) -> timedelta:
+        return self.step.estimated_duration
+
+    @property
+    def slack(self) -> timedelta:
+        return self.latest_start - self.earliest_start
+
+    @property
+    def is_critical(self) -> bool:
+        return self.slack <= timedelta(0)
+
+
+@dataclass(frozen=True)
+class Schedule:
+    start: datetime
+    finish: datetime
+    # Same order as the steps passed in (topological)
+    steps: Tuple[ScheduledStep, ...]
+
+    def by_step(self) -> Dict[int, ScheduledStep]:
+        return {entry.step.id: entry for entry in self.steps}
+
+    @property
+    def critical_path(self) -> Tuple[StepNode, ...]:
+        return tuple(entry.step for entry in self.steps if entry.is_critical)
+
+
+def _earliest_start(edge: Edge, pred_start: datetime, pred_finish: datetime, duration: timedelta) -> datetime:
+    """Earliest start the edge allows its successor (of the given duration)."""
+    kind = edge.dependency_type
+    if kind == 'start_to_start':
+        return pred_start + edge.lag_time
+    if kind == 'finish_to_finish':
+        return pred_finish + edge.lag_time - duration
+    if kind == 'start_to_finish':
+        return pred_start + edge.lag_time - duration
+    return pred_finish + edge.lag_time
+
+
+def _latest_finish(edge: Edge, succ_start: datetime, succ_finish: datetime, duration: timedelta) -> datetime:
+    """Latest finish the edge allows its predecessor (of the given duration)."""
+    kind = edge.dependency_type
+    if kind == 'start_to_start':
+        return succ_start - edge.lag_time + duration
+    if kind == 'finish_to_finish':
+        return succ_finish - edge.lag_time
+    if kind == 'start_to_finish':
+        return succ_finish - edge.lag_time + duration
+    return succ_start - edge.lag_time
+
+
+def schedule(steps: Sequence[StepNode], predecessors: Mapping[int, Sequence[Edge]], start: datetime) -> Schedule:
+    """Earliest/latest start and finish for ``steps`` (topologically ordered)."""
+    position = {step.id: index for index, step in enumerate(steps)}
+    incoming = [
+        [edge for edge in predecessors.get(step.id, ()) if position.get(edge.predecessor_id, index) < index]
+        for index, step in enumerate(steps)
+    ]
+    outgoing = [[] for _ in steps]
+    for index, edges in enumerate(incoming):
+        for edge in edges:
+            outgoing[position[edge.predecessor_id]].append((index, edge))
+
+    # Forward pass
+    early_start, early_finish = [], []
+    for index, step in enumerate(steps):
+        duration = step.estimated_duration
+        es = start
+        for edge in incoming[index]:
+            pred = position[edge.predecessor_id]
+            es = max(es, _earliest_start(edge, early_start[pred], early_finish[pred], duration))
+        early_start.append(es)
+        early_finish.append(es + duration)
+
+    finish = max(early_finish, default=start)
+
+    # Backward pass
+    late_start, late_finish = [None] * len(steps), [None] * len(steps)
+    for index in range(len(steps) - 1, -1, -1):
+        duration = steps[index].estimated_duration
+        lf = finish
+        for succ, edge in outgoing[index]:
+            lf = min(lf, _latest_finish(edge, late_start[succ], late_finish[succ], duration))
+        late_finish[index] = lf
+        late_start[index] = lf - duration
+
+    return Schedule(start, finish, tuple(
+        ScheduledStep(step, early_start[i], early_finish[i], late_start[i], late_finish[i])
+        for i, step in enumerate(steps)
+    ))
+
+
+def schedule_flow(graph: FlowGraph, start: datetime) -> Schedule:
+    return schedule(graph.steps, graph.predecessors, start)
+
+
+def schedule_subflow(graph: FlowGraph, subflow: SubFlowGraph, start: datetime) -> Schedule:
+    return schedule(subflow.steps, graph.subflow_predecessors, start)
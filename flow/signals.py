@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import graph
+from .models import Flow, FlowDependency, FlowStep, SubFlow, SubFlowDependency, SubFlowStep
+
+GRAPH_MODELS = (Flow, FlowStep, FlowDependency, SubFlow, SubFlowStep, SubFlowDependency)
+
+
+def _invalidate_graph(sender, **kwargs):
+    # The new version commits with the change itself. After commit, drop the
+    # version this process last read: another thread may have read it before
+    # the commit and would otherwise keep it for VERSION_CHECK_SECONDS
+    graph.invalidate()
+    transaction.on_commit(graph.expire_version)
+
+
+for model in GRAPH_MODELS:
+    receiver(post_save, sender=model, dispatch_uid=f"flow-graph-save-{model.__name__}")(_invalidate_graph)
+    receiver(post_delete, sender=model, dispatch_uid=f"flow-graph-delete-{model.__name__}")(_invalidate_graph)
@@ -1,3 +1,212 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+
+from .graph import find_app_step, get_flow_graph, invalidate
+from .models import (FlowDependency, FlowGraphVersion, FlowStep, Project, ProjectStep, ProjectSubFlowStep, SubFlow,
+                     SubFlowDependency, SubFlowStep)
+from .scheduling import schedule_flow
+from .utils import (calculate_project_timeline, create_default_engineering_flow, create_project_with_scheduling,
+                    create_projects_with_scheduling, get_next_available_steps)
+
+
+class CanStartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.flow = create_default_engineering_flow()
+        self.flow_steps = list(self.flow.steps.order_by("order"))
+        self.projects = []
+        for n in range(4):
+            project = Project.objects.create(name=f"Project {n}", flow=self.flow, created_by=self.user)
+            for flow_step in self.flow_steps:
+                ProjectStep.objects.create(project=project, flow_step=flow_step)
+            self.projects.append(project)
+        # Projects 0 and 1 have finished the first step; project 1 has also started the second
+        ProjectStep.objects.filter(project__in=self.projects[:2], flow_step=self.flow_steps[0]).update(status="completed")
+        ProjectStep.objects.filter(project=self.projects[1], flow_step=self.flow_steps[1]).update(status="in_progress")
+
+    def test_bulk_matches_per_step_answer_in_one_query(self):
+        ProjectStep.resolve_can_start(ProjectStep.objects.all())  # compile the flow graph
+        project_steps = list(ProjectStep.objects.all())
+        with self.assertNumQueries(1):
+            ready = ProjectStep.resolve_can_start(project_steps)
+        with self.assertNumQueries(0):
+            self.assertEqual({ps.pk for ps in project_steps if ps.can_start}, {pk for pk, ok in ready.items() if ok})
+        for ps in ProjectStep.objects.all():
+            self.assertEqual(ps.can_start, ready[ps.pk], ps)
+
+        second = {ps.project_id: ready[ps.pk] for ps in project_steps if ps.flow_step_id == self.flow_steps[1].id}
+        self.assertEqual(second, {self.projects[0].id: True, self.projects[1].id: False,
+                                  self.projects[2].id: False, self.projects[3].id: False})
+        first = {ps.project_id: ready[ps.pk] for ps in project_steps if ps.flow_step_id == self.flow_steps[0].id}
+        self.assertEqual(first, {self.projects[0].id: False, self.projects[1].id: False,
+                                 self.projects[2].id: True, self.projects[3].id: True})
+
+    def test_cached_answer_follows_status(self):
+        project_step = ProjectStep.objects.get(project=self.projects[2], flow_step=self.flow_steps[0])
+        ProjectStep.resolve_can_start([project_step])
+        self.assertTrue(project_step.can_start)
+        project_step.status = "in_progress"
+        self.assertFalse(project_step.can_start)
+
+    def test_next_available_steps(self):
+        self.assertEqual([ps.flow_step for ps in get_next_available_steps(self.projects[0])], [self.flow_steps[1]])
+
+    def test_subflow_steps(self):
+        subflow = SubFlow.objects.create(name="Checks", main_flow_step=self.flow_steps[0], created_by=self.user)
+        first, second = [SubFlowStep.objects.create(subflow=subflow, step_name=f"Check {n}", order=n,
+                                                    estimated_duration=timedelta(hours=1)) for n in (1, 2)]
+        SubFlowDependency.objects.create(subflow=subflow, predecessor=first, successor=second)
+        project = self.projects[0]
+        done = ProjectSubFlowStep.objects.create(project=project, subflow_step=first, status="completed")
+        waiting = ProjectSubFlowStep.objects.create(project=project, subflow_step=second)
+        ProjectSubFlowStep.resolve_can_start([waiting])  # compile the flow graph
+        with self.assertNumQueries(1):
+            ready = ProjectSubFlowStep.resolve_can_start([done, waiting])
+        self.assertEqual(ready, {done.pk: False, waiting.pk: True})
+
+    def test_views_use_bulk_readiness(self):
+        self.client.force_login(self.user)
+        response = self.client.get(f"/flow/step/{self.flow_steps[1].app_name}/")
+        self.assertEqual([ps.project_id for ps in response.context["can_start_projects"]], [self.projects[0].id])
+        self.assertEqual(self.client.get(f"/flow/project/{self.projects[0].id}/").status_code, 200)
+        page = self.client.get(f"/flow/step-detail/{self.flow_steps[1].app_name}/")
+        self.assertContains(page, self.flow_steps[1].step_name)
+        self.assertContains(page, "1d")  # formatted estimated duration badge
+        self.assertContains(page, "0 Sub-Processes")
+        self.assertEqual(self.client.get("/flow/step/not_a_step/").status_code, 404)
+        home = self.client.get("/")
+        self.assertEqual([step.id for step in home.context["flow_steps"]], [step.id for step in self.flow_steps])
+        self.assertEqual(home.context["flow_steps"][0].pending_count, 2)
+
+        blocked = ProjectStep.objects.get(project=self.projects[2], flow_step=self.flow_steps[1])
+        self.client.get(f"/flow/start-step/{blocked.id}/")
+        blocked.refresh_from_db()
+        self.assertEqual(blocked.status, "pending")
+        ready = ProjectStep.objects.get(project=self.projects[0], flow_step=self.flow_steps[1])
+        self.client.get(f"/flow/start-step/{ready.id}/")
+        ready.refresh_from_db()
+        self.assertEqual(ready.status, "in_progress")
+
+
+class FlowGraphTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.flow = create_default_engineering_flow()
+        self.flow_steps = list(self.flow.steps.order_by("order"))
+
+    def test_compiled_once_until_definitions_change(self):
+        graph = get_flow_graph(self.flow.id)
+        find_app_step("drafting_queue")
+        self.assertEqual([step.id for step in graph.steps], [step.id for step in self.flow_steps])
+        self.assertEqual([edge.predecessor_id for edge in graph.predecessors[self.flow_steps[1].id]],
+                         [self.flow_steps[0].id])
+        with self.assertNumQueries(0):
+            self.assertIs(get_flow_graph(self.flow.id), graph)
+            self.assertEqual(find_app_step("drafting_queue")[1].id, self.flow_steps[3].id)
+
+        # Saving any definition bumps the version and the next read recompiles
+        last = self.flow_steps[-1]
+        last.step_name = "Purchasing"
+        last.save()
+        rebuilt = get_flow_graph(self.flow.id)
+        self.assertIsNot(rebuilt, graph)
+        self.assertEqual(rebuilt.nodes[last.id].step_name, "Purchasing")
+
+    def test_version_is_shared_through_the_database(self):
+        graph = get_flow_graph(self.flow.id)
+        # Another worker changes a definition: only the shared row tells this process
+        FlowStep.objects.filter(pk=self.flow_steps[0].pk).update(step_name="Renamed elsewhere")
+        FlowGraphVersion.objects.filter(pk=1).update(version=F("version") + 1)
+        self.assertIs(get_flow_graph(self.flow.id), graph)  # within VERSION_CHECK_SECONDS
+        with mock.patch("flow.graph.VERSION_CHECK_SECONDS", 0):
+            rebuilt = get_flow_graph(self.flow.id)
+        self.assertEqual(rebuilt.nodes[self.flow_steps[0].id].step_name, "Renamed elsewhere")
+
+    def test_topological_order_follows_dependencies(self):
+        # Make step 2 depend on step 5 as well: it has to come after it
+        FlowDependency.objects.create(flow=self.flow, predecessor=self.flow_steps[4], successor=self.flow_steps[1])
+        FlowDependency.objects.filter(predecessor=self.flow_steps[1], successor=self.flow_steps[2]).delete()
+        order = [step.id for step in get_flow_graph(self.flow.id).steps]
+        self.assertLess(order.index(self.flow_steps[4].id), order.index(self.flow_steps[1].id))
+
+        self.flow_steps[5].delete()
+        self.assertNotIn(self.flow_steps[5].id, [step.id for step in get_flow_graph(self.flow.id).steps])
+
+
+class SchedulingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.flow = create_default_engineering_flow()
+        self.steps = list(self.flow.steps.order_by("order"))
+        self.start = timezone.make_aware(datetime(2026, 1, 5, 8, 0))
+
+    def test_chain_is_all_critical(self):
+        plan = schedule_flow(get_flow_graph(self.flow.id), self.start)
+        total = sum((step.estimated_duration for step in self.steps), timedelta(0))
+        self.assertEqual(plan.finish, self.start + total)
+        self.assertEqual([step.id for step in plan.critical_path], [step.id for step in self.steps])
+        self.assertTrue(all(entry.slack == timedelta(0) for entry in plan.steps))
+
+    def test_dependency_types_and_lag(self):
+        # approval(2d) -> customer(1d) FS; long lead(3d) now starts 1 day after approval starts (SS),
+        # so customer and long lead run in parallel and customer, now a dead end, gains slack
+        first, second, third = self.steps[:3]
+        FlowDependency.objects.filter(successor=third).update(predecessor=first, dependency_type="start_to_start",
+                                                              lag_time=timedelta(days=1))
+        invalidate()
+        schedule = schedule_flow(get_flow_graph(self.flow.id), self.start)
+        plan = schedule.by_step()
+        self.assertEqual(plan[third.id].earliest_start, self.start + timedelta(days=1))
+        self.assertEqual(plan[second.id].earliest_start, self.start + timedelta(days=2))
+        self.assertEqual(plan[second.id].latest_finish, schedule.finish)
+        self.assertEqual(plan[second.id].slack, schedule.finish - plan[second.id].earliest_finish)
+        self.assertFalse(plan[second.id].is_critical)
+        self.assertTrue(plan[third.id].is_critical)
+
+        # Finish-to-finish: customer must finish no earlier than 2 days after long lead finishes
+        FlowDependency.objects.create(flow=self.flow, predecessor=third, successor=second,
+                                      dependency_type="finish_to_finish", lag_time=timedelta(days=2))
+        plan = schedule_flow(get_flow_graph(self.flow.id), self.start).by_step()
+        self.assertEqual(plan[second.id].earliest_finish, plan[third.id].earliest_finish + timedelta(days=2))
+
+        # Start-to-finish: the drafting queue (5d) must finish at least 6 days after approval starts
+        fourth = self.steps[3]
+        FlowDependency.objects.filter(successor=fourth).update(predecessor=first, dependency_type="start_to_finish",
+                                                               lag_time=timedelta(days=6))
+        invalidate()
+        plan = schedule_flow(get_flow_graph(self.flow.id), self.start).by_step()
+        self.assertEqual(plan[fourth.id].earliest_finish, self.start + timedelta(days=6))
+
+    def test_project_dates_come_from_schedule(self):
+        project = create_project_with_scheduling("Scheduled", "", start_date=self.start)
+        timeline = calculate_project_timeline(project)
+        due = dict(project.project_steps.values_list("flow_step_id", "target_completion_date"))
+        self.assertEqual(due, {row["step"].id: row["end_date"] for row in timeline})
+        self.assertEqual(project.target_completion_date, max(due.values()))
+
+    def test_bulk_instantiation(self):
+        subflow = SubFlow.objects.create(name="Checks", main_flow_step=self.steps[1], created_by=self.user)
+        for n in (1, 2):
+            SubFlowStep.objects.create(subflow=subflow, step_name=f"Check {n}", order=n, estimated_duration=timedelta(hours=1))
+        single = create_project_with_scheduling("Single", "", start_date=self.start)
+
+        # With the graph compiled, the query count is fixed however many projects are created
+        with self.assertNumQueries(7):
+            projects = create_projects_with_scheduling([f"Bulk {n}" for n in range(30)], start_date=self.start)
+        self.assertEqual(len(projects), 30)
+        expected = sorted(single.project_steps.values_list("flow_step_id", "target_completion_date"))
+        for project in (projects[0], projects[-1]):
+            self.assertEqual(sorted(project.project_steps.values_list("flow_step_id", "target_completion_date")), expected)
+            self.assertEqual(project.subflow_steps.count(), 2)
 
-# Create your tests here.
+        out = StringIO()
+        call_command("create_sample_projects", count=5, stdout=out)
+        self.assertIn("Successfully created 5 sample projects", out.getvalue())
+        self.assertEqual(ProjectStep.objects.filter(project__name__startswith="Sample Project").count(), 5 * len(self.steps))
@@ -1,12 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import timedelta
-from .models import Flow, FlowStep, Project, ProjectStep, FlowDependency, FlowCategory
+from .models import Flow, FlowStep, Project, ProjectStep, ProjectSubFlowStep, FlowDependency, FlowCategory
+from .graph import flow_app_names, get_flow_graph, get_main_flow_graph
+from .scheduling import schedule_flow, schedule_subflow
 
 def get_flow_apps():
     """Get all apps that are part of flows"""
-    flow_steps = FlowStep.objects.filter(is_active=True).values_list('app_name', flat=True).distinct()
-    return list(flow_steps)
+    return flow_app_names()
 
 def get_non_flow_apps():
     """Get all apps that are not part of flows"""
@@ -76,43 +77,100 @@ def create_default_engineering_flow():
     return flow
 
 def calculate_project_timeline(project):
-    """Calculate the timeline for a project based on flow steps and dependencies"""
-    if not project.flow:
+    """Calculate the timeline for a project based on flow steps and dependencies.
+
+    Critical-path schedule of the project's flow (see scheduling.py): one entry
+    per active step in dependency order, with earliest and latest dates and slack.
+    """
+    if not project.flow_id:
         return None
     
-    steps = FlowStep.objects.filter(flow=project.flow, is_active=True).order_by('order')
-    timeline = []
-    current_date = project.start_date or timezone.now()
-    
-    for step in steps:
-        # Calculate when this step can start
-        dependencies = FlowDependency.objects.filter(
-            successor=step,
-            is_active=True
-        ).select_related('predecessor')
-        
-        start_date = current_date
-        for dep in dependencies:
-            # Find the predecessor step's completion time
-            pred_step = steps.filter(id=dep.predecessor.id).first()
-            if pred_step:
-                # This is simplified - in reality, you'd need to track actual completion times
-                pred_duration = pred_step.estimated_duration
-                pred_start = start_date - pred_duration
-                start_date = max(start_date, pred_start + pred_duration + dep.lag_time)
-        
-        end_date = start_date + step.estimated_duration
-        
-        timeline.append({
-            'step': step,
-            'start_date': start_date,
-            'end_date': end_date,
-            'duration': step.estimated_duration
-        })
-        
-        current_date = end_date
-    
-    return timeline
+    plan = schedule_flow(get_flow_graph(project.flow_id), project.start_date or timezone.now())
+    return [
+        {
+            'step': entry.step,
+            'start_date': entry.earliest_start,
+            'end_date': entry.earliest_finish,
+            'latest_start': entry.latest_start,
+            'latest_end': entry.latest_finish,
+            'slack': entry.slack,
+            'is_critical': entry.is_critical,
+            'duration': entry.duration,
+        }
+        for entry in plan.steps
+    ]
+
+# Rows per INSERT when instantiating projects in bulk
+BULK_CREATE_BATCH_SIZE = 500
+
+def create_project_with_scheduling(project_name, project_description, assigned_user=None, start_date=None):
+    """Create a new project with automatic scheduling based on flow durations"""
+    projects = create_projects_with_scheduling([project_name], project_description, assigned_user, start_date)
+    return projects[0] if projects else None
+
+def create_projects_with_scheduling(project_names, project_description='', assigned_user=None, start_date=None,
+                                    created_by=None):
+    """Create one scheduled project per name in a single transaction.
+
+    The flow is read once from the compiled graph and scheduled once; every
+    project gets the same dates, and all projects, project steps and subflow
+    steps are inserted with bulk_create. Returns [] when there is no active
+    flow with steps.
+    """
+    from django.contrib.auth.models import User
+
+    if start_date is None:
+        start_date = timezone.now()
+
+    # Get the main flow (compiled graph: steps and subflows without further queries)
+    flow = get_main_flow_graph()
+    if not flow:
+        return []
+
+    # Critical-path schedule over the flow's dependencies (see scheduling.py);
+    # each subflow is scheduled from its main step's earliest start
+    plan = schedule_flow(flow, start_date)
+    if not plan.steps:
+        return []
+    step_dates = [(entry.step.id, entry.earliest_finish) for entry in plan.steps]
+    subflow_dates = [
+        (sub_entry.step.id, sub_entry.earliest_finish)
+        for entry in plan.steps
+        for subflow in flow.subflows_for(entry.step.id)
+        for sub_entry in schedule_subflow(flow, subflow, entry.earliest_start).steps
+    ]
+
+    if created_by is None:
+        created_by = User.objects.filter(is_superuser=True).first()
+    projects = [
+        Project(
+            name=name,
+            description=project_description,
+            flow_id=flow.id,
+            created_by=created_by,
+            assigned_to=assigned_user,
+            status='not_started',
+            start_date=start_date,
+            target_completion_date=plan.finish,
+        )
+        for name in project_names
+    ]
+
+    with transaction.atomic():
+        Project.objects.bulk_create(projects, batch_size=BULK_CREATE_BATCH_SIZE)
+        # Project steps are due at their earliest finish
+        ProjectStep.objects.bulk_create((
+            ProjectStep(project=project, flow_step_id=step_id, status='pending',
+                        assigned_to=assigned_user, target_completion_date=due)
+            for project in projects for step_id, due in step_dates
+        ), batch_size=BULK_CREATE_BATCH_SIZE)
+        ProjectSubFlowStep.objects.bulk_create((
+            ProjectSubFlowStep(project=project, subflow_step_id=step_id, status='pending',
+                               assigned_to=assigned_user, target_completion_date=due)
+            for project in projects for step_id, due in subflow_dates
+        ), batch_size=BULK_CREATE_BATCH_SIZE)
+
+    return projects
 
 def get_flow_progress(project):
     """Get detailed progress information for a project"""
@@ -140,10 +198,11 @@ def can_start_step(project_step):
 
 def get_next_available_steps(project):
     """Get the next steps that can be started in a project"""
-    steps = ProjectStep.objects.filter(
+    steps = list(ProjectStep.objects.filter(
         project=project,
         status='pending'
-    ).select_related('flow_step').order_by('flow_step__order')
+    ).select_related('flow_step').order_by('flow_step__order'))
+    ProjectStep.resolve_can_start(steps)
     
     available_steps = []
     for step in steps:
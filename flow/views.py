@@ -1,32 +1,32 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
 from django.contrib import messages
 from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
-from .models import (Flow, FlowStep, Project, ProjectStep, FlowDependency, 
-                    SubFlow, SubFlowStep, ProjectSubFlowStep)
-from .utils import get_flow_apps
+from .models import FlowStep, Project, ProjectStep, FlowDependency
+from .utils import create_project_with_scheduling, get_flow_apps
+from .graph import find_app_step
 
 @login_required
 def step_detail(request, app_name):
     """View for individual workflow step - shows all projects at this step"""
     try:
-        # Get the flow step with subflows
-        flow_step = get_object_or_404(FlowStep, app_name=app_name, is_active=True)
+        # Get the flow step with subflows (from the compiled flow graph)
+        flow, flow_step = find_app_step(app_name)
+        if flow_step is None:
+            raise Http404(f"No active workflow step for {app_name}")
         
         # Get all projects that are currently at this step
         project_steps = ProjectStep.objects.filter(
-            flow_step=flow_step,
+            flow_step_id=flow_step.id,
             project__status__in=['not_started', 'in_progress', 'on_hold']
         ).select_related('project', 'assigned_to').order_by('-created_at')
         
         # Get projects that can start this step (dependencies met)
-        can_start_projects = []
-        for project_step in project_steps:
-            if project_step.can_start and project_step.status == 'pending':
-                can_start_projects.append(project_step)
+        pending_steps = list(project_steps.filter(status='pending'))
+        ready = ProjectStep.resolve_can_start(pending_steps)
+        can_start_projects = [ps for ps in pending_steps if ready[ps.pk]]
         
         # Get projects currently in progress at this step
         in_progress_projects = project_steps.filter(status='in_progress')
@@ -36,12 +36,12 @@ def step_detail(request, app_name):
         
         # Get projects completed at this step (recent)
         completed_projects = ProjectStep.objects.filter(
-            flow_step=flow_step,
+            flow_step_id=flow_step.id,
             status='completed'
         ).select_related('project').order_by('-actual_completion_date')[:10]
         
         # Get subflows for this step
-        subflows = flow_step.subflows.filter(is_active=True).prefetch_related('steps')
+        subflows = flow.subflows_for(flow_step.id)
         
         context = {
             'flow_step': flow_step,
@@ -63,7 +63,8 @@ def step_detail(request, app_name):
 def project_detail(request, project_id):
     """View for individual project details"""
     project = get_object_or_404(Project, id=project_id)
-    project_steps = project.project_steps.all().order_by('flow_step__order')
+    project_steps = list(project.project_steps.select_related('flow_step', 'assigned_to').order_by('flow_step__order'))
+    ProjectStep.resolve_can_start(project_steps)
     
     # Calculate completed steps count
     completed_steps_count = project.project_steps.filter(status='completed').count()
@@ -81,9 +82,9 @@ def project_detail(request, project_id):
 @login_required
 def start_project_step(request, project_step_id):
     """Start a project step"""
-    project_step = get_object_or_404(ProjectStep, id=project_step_id)
+    project_step = get_object_or_404(ProjectStep.objects.select_related('project', 'flow_step'), id=project_step_id)
     
-    if not project_step.can_start:
+    if not ProjectStep.resolve_can_start([project_step])[project_step.pk]:
         messages.error(request, "This step cannot be started yet - dependencies not met")
         return redirect('flow:step_detail', app_name=project_step.flow_step.app_name)
     
@@ -166,84 +167,6 @@ def unblock_project_step(request, project_step_id):
     messages.success(request, f"Unblocked {project_step.flow_step.step_name} for project {project_step.project.name}")
     return redirect('flow:step_detail', app_name=project_step.flow_step.app_name)
 
-def create_project_with_scheduling(project_name, project_description, assigned_user=None, start_date=None):
-    """Create a new project with automatic scheduling based on flow durations"""
-    if start_date is None:
-        start_date = timezone.now()
-    
-    # Get the main flow
-    flow = Flow.objects.filter(is_active=True).first()
-    if not flow:
-        return None
-    
-    # Get flow steps in order
-    flow_steps = FlowStep.objects.filter(flow=flow, is_active=True).order_by('order')
-    if not flow_steps.exists():
-        return None
-
-    # Create the project
-    project = Project.objects.create(
-        name=project_name,
-        description=project_description,
-        flow=flow,
-        created_by=User.objects.filter(is_superuser=True).first(),
-        assigned_to=assigned_user,
-        status='not_started',
-        start_date=start_date
-    )
-
-    # Calculate scheduling
-    current_date = start_date
-    total_duration = timedelta(0)
-
-    for flow_step in flow_steps:
-        # Calculate target completion date for this main step
-        step_duration = flow_step.estimated_duration
-        target_completion = current_date + step_duration
-        total_duration += step_duration
-
-        # Create project step
-        project_step = ProjectStep.objects.create(
-            project=project,
-            flow_step=flow_step,
-            status='pending',
-            assigned_to=assigned_user,
-            target_completion_date=target_completion
-        )
-
-        # Create subflow steps for this main step
-        subflows = SubFlow.objects.filter(main_flow_step=flow_step, is_active=True)
-        subflow_current_date = current_date
-
-        for subflow in subflows:
-            subflow_steps = SubFlowStep.objects.filter(subflow=subflow, is_active=True).order_by('order')
-            
-            for subflow_step in subflow_steps:
-                # Calculate target completion date for this subflow step
-                subflow_step_duration = subflow_step.estimated_duration
-                subflow_target_completion = subflow_current_date + subflow_step_duration
-
-                # Create project subflow step
-                project_subflow_step = ProjectSubFlowStep.objects.create(
-                    project=project,
-                    subflow_step=subflow_step,
-                    status='pending',
-                    assigned_to=assigned_user,
-                    target_completion_date=subflow_target_completion
-                )
-                
-                # Move to next subflow step (finish-to-start dependency)
-                subflow_current_date = subflow_target_completion
-
-        # Move to next main step (finish-to-start dependency)
-        current_date = target_completion
-
-    # Set project target completion date
-    project.target_completion_date = start_date + total_duration
-    project.save()
-
-    return project
-
 @login_required
 def create_new_project(request):
     """Create a new project with automatic scheduling"""
@@ -276,21 +199,23 @@ def create_new_project(request):
 def step_detail_page(request, app_name):
     """Detailed page for individual workflow step with all information and processes"""
     try:
-        # Get the flow step with subflows
-        flow_step = get_object_or_404(FlowStep, app_name=app_name, is_active=True)
+        # Get the flow step with subflows (from the compiled flow graph)
+        flow, flow_step = find_app_step(app_name)
+        if flow_step is None:
+            raise Http404(f"No active workflow step for {app_name}")
         
         # Get all projects that are currently at this step
         project_steps = ProjectStep.objects.filter(
-            flow_step=flow_step,
+            flow_step_id=flow_step.id,
             project__status__in=['not_started', 'in_progress', 'on_hold']
         ).select_related('project', 'assigned_to').order_by('-created_at')
         
         # Get subflows for this step
-        subflows = SubFlow.objects.filter(main_flow_step=flow_step, is_active=True).prefetch_related('steps')
+        subflows = flow.subflows_for(flow_step.id)
         
         # Get completed projects for this step
         completed_projects = ProjectStep.objects.filter(
-            flow_step=flow_step,
+            flow_step_id=flow_step.id,
             project__status='completed'
         ).select_related('project', 'assigned_to').order_by('-actual_completion_date')[:10]
         
@@ -301,6 +226,9 @@ def step_detail_page(request, app_name):
         blocked_count = project_steps.filter(status='blocked').count()
         completed_count = completed_projects.count()
         
+        project_steps = list(project_steps)
+        ProjectStep.resolve_can_start(project_steps)
+        
         context = {
             'title': f'{flow_step.step_name} - Detailed View',
             'flow_step': flow_step,
@@ -1,3 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from flow.models import FlowStep, Project, ProjectStep
+from flow.utils import create_default_engineering_flow
+
+
+class HomeDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.user)
+        self.flow = create_default_engineering_flow()
+        self.steps = list(self.flow.steps.order_by("order"))
+        for n, status in enumerate(["completed", "in_progress", "pending", "blocked"]):
+            project = Project.objects.create(name=f"Project {n}", flow=self.flow, created_by=self.user)
+            ProjectStep.objects.create(project=project, flow_step=self.steps[0], status=status)
+            ProjectStep.objects.create(project=project, flow_step=self.steps[1])
+
+    def flow_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/")
+        return response, len([q for q in queries if "flow_" in q["sql"]])
+
+    def test_counts_in_constant_queries(self):
+        response, cold = self.flow_queries()
+        first, second = response.context["flow_steps"][:2]
+        self.assertEqual((first.total_projects, first.completed_count, first.in_progress_count,
+                          first.pending_count, first.blocked_count), (4, 1, 1, 1, 1))
+        self.assertEqual((second.total_projects, second.pending_count), (4, 4))
+        self.assertEqual(response.context["flow_steps"][2].total_projects, 0)
+
+        # Longer flows cost no extra queries
+        FlowStep.objects.create(flow=self.flow, app_name="extra", step_name="Extra", order=7,
+                                estimated_duration=self.steps[0].estimated_duration)
+        cache.clear()
+        response, longer = self.flow_queries()
+        self.assertEqual(len(response.context["flow_steps"]), 7)
+        self.assertEqual(longer, cold)
+
+        # Warm: graph and counts both cached
+        _response, warm = self.flow_queries()
+        self.assertEqual(warm, 0)
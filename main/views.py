@@ -1,7 +1,16 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from flow.models import Flow, FlowStep, ProjectStep, SubFlow
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from flow.graph import get_main_flow_graph
+from flow.models import ProjectStep
 from datetime import timedelta
+from types import SimpleNamespace
+
+# Dashboard step counters may be this many seconds old
+STEP_COUNTS_CACHE_SECONDS = getattr(settings, 'HOME_STEP_COUNTS_CACHE_SECONDS', 30)
+STEP_COUNT_STATUSES = ('in_progress', 'pending', 'completed', 'blocked')
 
 def format_duration(duration):
     """Format a timedelta duration for display"""
@@ -27,27 +36,46 @@ def format_duration(duration):
                 return f"{weeks}w {remaining_days}d"
     return str(duration)
 
+def step_counts(flow):
+    """{flow step id: {'total', 'in_progress', 'pending', 'completed', 'blocked'}}
+    for every step of the flow, from one grouped ProjectStep query. Cached briefly;
+    the key carries the flow-graph version so redefined flows never reuse counts."""
+    key = f'home:step-counts:{flow.id}:{flow.version}'
+    counts = cache.get(key)
+    if counts is None:
+        rows = (
+            ProjectStep.objects.filter(flow_step_id__in=[step.id for step in flow.steps])
+            .order_by()
+            .values('flow_step_id')
+            .annotate(total=Count('id'), **{
+                status: Count('id', filter=Q(status=status)) for status in STEP_COUNT_STATUSES
+            })
+        )
+        counts = {row.pop('flow_step_id'): row for row in rows}
+        cache.set(key, counts, STEP_COUNTS_CACHE_SECONDS)
+    return counts
+
 def home(request):
     """Homepage dashboard view"""
     # Get the main engineering flow and its steps
     try:
-        main_flow = Flow.objects.filter(is_active=True).first()
-        flow_steps = FlowStep.objects.filter(flow=main_flow, is_active=True).order_by('order') if main_flow else []
-        
-        # Add formatted duration and statistics to each step
-        for step in flow_steps:
+        main_flow = get_main_flow_graph()
+        flow_steps = []
+        counts = step_counts(main_flow) if main_flow else {}
+        for node in sorted(main_flow.steps, key=lambda s: s.order) if main_flow else []:
+            # Graph nodes are immutable; copy into a row we can annotate
+            step = SimpleNamespace(**vars(node))
             step.formatted_duration = format_duration(step.estimated_duration)
             
             # Get project statistics for this step
-            project_steps = ProjectStep.objects.filter(flow_step=step)
-            step.total_projects = project_steps.count()
-            step.in_progress_count = project_steps.filter(status='in_progress').count()
-            step.pending_count = project_steps.filter(status='pending').count()
-            step.completed_count = project_steps.filter(status='completed').count()
-            step.blocked_count = project_steps.filter(status='blocked').count()
+            step_stats = counts.get(step.id, {})
+            step.total_projects = step_stats.get('total', 0)
+            for status in STEP_COUNT_STATUSES:
+                setattr(step, f'{status}_count', step_stats.get(status, 0))
             
             # Get subflow count
-            step.subflow_count = SubFlow.objects.filter(main_flow_step=step, is_active=True).count()
+            step.subflow_count = len(main_flow.subflows_for(step.id))
+            flow_steps.append(step)
             
     except:
         main_flow = None
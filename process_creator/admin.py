@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Module, Process, Step, StepImage, StepLink, StepFile, AIInteraction, ProcessTemplate, TemplateStep, Job, JobStep, JobSubtask, JobStepImage
+from .models import Module, Process, Step, StepImage, StepLink, StepFile, AIInteraction, ProcessTemplate, TemplateStep, Job, JobStep, JobSubtask, JobStepImage, ExportJob, AIResponseCache
 
 
 @admin.register(Module)
@@ -52,10 +52,10 @@ class StepAdmin(admin.ModelAdmin):
 
 @admin.register(AIInteraction)
 class InteractionAdmin(admin.ModelAdmin):
-    list_display = ['process', 'interaction_type', 'tokens_used', 'cost', 'created_at']
+    list_display = ['process', 'interaction_type', 'prompt_tokens', 'completion_tokens', 'cost', 'created_at']
     list_filter = ['interaction_type', 'created_at']
     search_fields = ['process__name', 'prompt_sent', 'response_received']
-    readonly_fields = ['created_at', 'tokens_used', 'cost']
+    readonly_fields = ['created_at', 'tokens_used', 'prompt_tokens', 'completion_tokens', 'cost']
     ordering = ['-created_at']
 
 # New admin registrations
@@ -106,3 +106,21 @@ class JobStepImageAdmin(admin.ModelAdmin):
     list_display = ("job_step", "subtask_index", "order", "uploaded_at")
     list_filter = ("job_step",)
     ordering = ("job_step", "order")
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "process", "requested_by", "attempts", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    search_fields = ("process__name", "filename", "error")
+    readonly_fields = ("created_at", "started_at", "finished_at", "updated_at")
+    ordering = ("-created_at",)
+
+
+@admin.register(AIResponseCache)
+class AIResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ("model", "prompt_hash", "max_tokens", "temperature", "tokens_used", "hits", "created_at", "last_hit_at")
+    list_filter = ("model",)
+    search_fields = ("prompt_hash", "content")
+    readonly_fields = ("key", "prompt_hash", "created_at", "last_hit_at", "hits")
+    ordering = ("-created_at",)
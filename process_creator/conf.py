@@ -1,6 +1,79 @@
+import os
+
 from django.conf import settings
 
 # Configurable label for "Job" entities used in UI
 JOB_LABEL = getattr(settings, "PROCESS_CREATOR_JOB_LABEL", "Job")
 
 
+# Background export queue (PDF/Word). When enabled the UI enqueues exports and
+# polls for the result. Off by default: only turn it on where
+# `python manage.py run_export_worker` is running to process them.
+EXPORT_QUEUE_ENABLED = getattr(settings, "PROCESS_CREATOR_EXPORT_QUEUE", False)
+EXPORT_WORKERS = getattr(settings, "PROCESS_CREATOR_EXPORT_WORKERS", 2)
+# Running jobs whose worker has not checked in for this long (seconds) are assumed orphaned and re-queued
+EXPORT_JOB_STALE_AFTER = getattr(settings, "PROCESS_CREATOR_EXPORT_JOB_STALE_AFTER", 15 * 60)
+# How often (seconds) a worker marks its own jobs alive and re-queues other workers' orphans
+EXPORT_JOB_SWEEP_INTERVAL = getattr(settings, "PROCESS_CREATOR_EXPORT_JOB_SWEEP_INTERVAL", 60)
+EXPORT_JOB_MAX_ATTEMPTS = getattr(settings, "PROCESS_CREATOR_EXPORT_JOB_MAX_ATTEMPTS", 2)
+
+# Content-addressed cache of rendered exports (see services/export_cache.py)
+EXPORT_CACHE_ENABLED = getattr(settings, "PROCESS_CREATOR_EXPORT_CACHE", True)
+EXPORT_CACHE_DIR = str(getattr(settings, "PROCESS_CREATOR_EXPORT_CACHE_DIR", settings.BASE_DIR / "cache" / "exports"))
+EXPORT_CACHE_MAX_BYTES = getattr(settings, "PROCESS_CREATOR_EXPORT_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+
+# Rasterised StepFile PDF pages embedded in Word exports (see services/pdf_pages.py)
+PDF_PAGE_CACHE_DIR = str(getattr(settings, "PROCESS_CREATOR_PDF_PAGE_CACHE_DIR", settings.BASE_DIR / "cache" / "pdf_pages"))
+PDF_PAGE_CACHE_MAX_BYTES = getattr(settings, "PROCESS_CREATOR_PDF_PAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+# Default raster options; exports can override them with pdf_dpi / pdf_format / pdf_quality
+PDF_RASTER_DPI = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_DPI", 144)
+PDF_RASTER_FORMAT = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_FORMAT", "png")
+PDF_RASTER_JPEG_QUALITY = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_JPEG_QUALITY", 80)
+# Documents with at least this many pages are rendered in chunks across a process pool
+PDF_RASTER_WORKERS = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_WORKERS", min(4, os.cpu_count() or 1))
+PDF_RASTER_PARALLEL_MIN_PAGES = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_PARALLEL_MIN_PAGES", 8)
+PDF_RASTER_CHUNK_PAGES = getattr(settings, "PROCESS_CREATOR_PDF_RASTER_CHUNK_PAGES", 4)
+
+# Resized screenshot derivatives (see services/image_derivatives.py): longest edge in px
+IMAGE_DERIVATIVE_SIZES = getattr(settings, "PROCESS_CREATOR_IMAGE_DERIVATIVE_SIZES", {"thumb": 320, "medium": 1400})
+IMAGE_DERIVATIVE_QUALITY = getattr(settings, "PROCESS_CREATOR_IMAGE_DERIVATIVE_QUALITY", 82)
+# An original that could not be processed is not retried for this many seconds
+IMAGE_DERIVATIVE_MISS_SECONDS = getattr(settings, "PROCESS_CREATOR_IMAGE_DERIVATIVE_MISS_SECONDS", 3600)
+
+# Background DWG/IDW -> PDF conversion (see services/conversions.py). The converter
+# executables themselves are configured with ODA_CONVERTER_PDF / INVENTOR_IDW_TO_PDF.
+CONVERTER_WORKERS = getattr(settings, "PROCESS_CREATOR_CONVERTER_WORKERS", 4)
+# Max simultaneous runs per executable path; unlisted executables run one at a time
+CONVERTER_CONCURRENCY = getattr(settings, "PROCESS_CREATOR_CONVERTER_CONCURRENCY", {})
+CONVERSION_TIMEOUT = getattr(settings, "PROCESS_CREATOR_CONVERSION_TIMEOUT", 120)
+CONVERSION_MAX_ATTEMPTS = getattr(settings, "PROCESS_CREATOR_CONVERSION_MAX_ATTEMPTS", 3)
+# Seconds before retry n is base * 2**(n-1)
+CONVERSION_RETRY_DELAY = getattr(settings, "PROCESS_CREATOR_CONVERSION_RETRY_DELAY", 5)
+
+# Stored OpenAI responses (see services/ai.py); identical prompts within the TTL are not re-sent
+AI_CACHE_ENABLED = getattr(settings, "PROCESS_CREATOR_AI_CACHE", True)
+AI_CACHE_TTL = getattr(settings, "PROCESS_CREATOR_AI_CACHE_TTL", 30 * 24 * 3600)
+# Shared OpenAI client: request timeouts (seconds), retries with backoff, parallel calls
+AI_TIMEOUT = getattr(settings, "PROCESS_CREATOR_AI_TIMEOUT", 120)
+AI_CONNECT_TIMEOUT = getattr(settings, "PROCESS_CREATOR_AI_CONNECT_TIMEOUT", 10)
+AI_MAX_RETRIES = getattr(settings, "PROCESS_CREATOR_AI_MAX_RETRIES", 3)
+AI_MAX_CONCURRENT = getattr(settings, "PROCESS_CREATOR_AI_MAX_CONCURRENT", 4)
+# Bulk summary/analysis: "map_reduce" summarises each process concurrently and then
+# combines the summaries; "combined" sends every process in one prompt
+AI_BULK_MODE = getattr(settings, "PROCESS_CREATOR_AI_BULK_MODE", "map_reduce")
+# Re-summarise from the previous summary plus the steps changed since it (requests may
+# pass "incremental": false to resend every step)
+AI_INCREMENTAL_SUMMARY = getattr(settings, "PROCESS_CREATOR_AI_INCREMENTAL_SUMMARY", True)
+# Upper bound on prompt tokens (0 = the model's context window minus max_tokens);
+# longer prompts have their longest step details trimmed (see services/ai_budget.py)
+AI_PROMPT_TOKEN_BUDGET = getattr(settings, "PROCESS_CREATOR_AI_PROMPT_TOKEN_BUDGET", 0)
+# Search backend: "auto" uses SQLite FTS5 when the index table exists, "index" forces the
+# portable inverted index (run rebuild_search_index after switching)
+SEARCH_BACKEND = getattr(settings, "PROCESS_CREATOR_SEARCH_BACKEND", "auto")
+SEARCH_RESULTS = getattr(settings, "PROCESS_CREATOR_SEARCH_RESULTS", 30)
+# Processes per page on the process list (more load as the user scrolls)
+PROCESS_LIST_PAGE_SIZE = getattr(settings, "PROCESS_CREATOR_PROCESS_LIST_PAGE_SIZE", 50)
+# Processes with more steps than this open in the editor with step bodies loaded on
+# demand (0 = always load everything up front)
+EDITOR_LAZY_STEPS = getattr(settings, "PROCESS_CREATOR_EDITOR_LAZY_STEPS", 40)
+EDITOR_FRAGMENT_BATCH = getattr(settings, "PROCESS_CREATOR_EDITOR_FRAGMENT_BATCH", 50)
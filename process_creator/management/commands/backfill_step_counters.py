@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Step, StepImage
+from ...services.step_counters import backfill
+
+
+class Command(BaseCommand):
+    help = "Recompute the bullet, details-length and image counters stored on steps"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--process", type=int, help="Only steps of this process id")
+        parser.add_argument("--batch-size", type=int, default=500, help="Steps updated per batch")
+
+    def handle(self, *args, **options):
+        steps = Step.objects.order_by("id")
+        if options["process"]:
+            steps = steps.filter(process_id=options["process"])
+        changed = backfill(steps, StepImage, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Checked {steps.count()} step(s); corrected text counters on {changed}."))
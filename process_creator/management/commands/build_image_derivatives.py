@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ...models import JobStepImage, StepImage
+from ...services.image_derivatives import derivative_name, generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail/medium/WebP copies for existing step and job screenshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--process", type=int, help="Only step images of this process id (skips job images)")
+        parser.add_argument("--force", action="store_true", help="Rebuild derivatives that already exist")
+
+    def handle(self, *args, **options):
+        querysets = [StepImage.objects.order_by("id")]
+        if options["process"]:
+            querysets[0] = querysets[0].filter(step__process_id=options["process"])
+        else:
+            querysets.append(JobStepImage.objects.order_by("id"))
+
+        built = skipped = failed = 0
+        for qs in querysets:
+            for img in qs.iterator():
+                if not img.image:
+                    continue
+                storage = img.image.storage
+                if not options["force"] and storage.exists(derivative_name(img.image.name, "thumb")):
+                    skipped += 1
+                    continue
+                try:
+                    generate_derivatives(img.image)
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"Could not process {img.image.name}: {e}"))
+                    continue
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built {built}, already present {skipped}, failed {failed}."))
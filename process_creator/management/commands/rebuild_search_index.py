@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...services.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for processes, steps, template steps and job steps"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Objects indexed per insert batch")
+
+    def handle(self, *args, **options):
+        backend = "SQLite FTS5" if fts_enabled() else "inverted index"
+        self.stdout.write(f"Rebuilding search index ({backend})...")
+        counts = rebuild_index(batch_size=options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {sum(counts.values())} document(s)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ...services.conversions import convert_pending
+
+
+class Command(BaseCommand):
+    help = "Finish DWG/IDW to PDF conversions left pending (e.g. after a server restart)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stale-after", type=int, help="Only rows untouched for this many seconds (defaults to twice the conversion timeout)")
+        parser.add_argument("--failed", action="store_true", help="Also retry conversions that already failed")
+
+    def handle(self, *args, **options):
+        converted = convert_pending(
+            stale_after=options["stale_after"],
+            include_failed=options["failed"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} file(s)."))
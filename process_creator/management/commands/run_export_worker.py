@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ...conf import EXPORT_WORKERS
+from ...services.export_jobs import purge_export_jobs, run_worker
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF/Word exports in a local process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=EXPORT_WORKERS, help="Number of worker processes")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue polls when idle")
+        parser.add_argument("--once", action="store_true", help="Drain the current queue and exit")
+        parser.add_argument("--purge-days", type=int, default=7, help="Delete finished jobs older than this many days (0 disables)")
+
+    def handle(self, *args, **options):
+        if options["purge_days"]:
+            purged = purge_export_jobs(options["purge_days"])
+            if purged:
+                self.stdout.write(f"Purged {purged} old export job(s).")
+        self.stdout.write(f"Export worker started with {options['workers']} process(es).")
+        try:
+            processed = run_worker(
+                workers=options["workers"],
+                poll_interval=options["poll_interval"],
+                once=options["once"],
+                log=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Export worker stopped.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} export job(s)."))
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from ...models import StepFile
+from ...services.pdf_pages import cached_page_paths, evict_pdf_pages, render_pdf_pages
+
+
+class Command(BaseCommand):
+    help = "Rasterise existing StepFile PDFs into the page cache used by Word exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--process", type=int, help="Only warm files attached to this process id")
+        parser.add_argument("--dpi", type=int, help="Render resolution (defaults to PDF_RASTER_DPI)")
+        parser.add_argument("--format", choices=["png", "jpeg"], help="Page image format (defaults to PDF_RASTER_FORMAT)")
+        parser.add_argument("--quality", type=int, help="JPEG quality (defaults to PDF_RASTER_JPEG_QUALITY)")
+        parser.add_argument("--evict", action="store_true", help="Only trim the cache to its size cap")
+
+    def handle(self, *args, **options):
+        if options["evict"]:
+            removed = evict_pdf_pages()
+            self.stdout.write(self.style.SUCCESS(f"Evicted {removed} cached document(s)."))
+            return
+
+        files = StepFile.objects.filter(file__iendswith=".pdf").order_by("id")
+        if options["process"]:
+            files = files.filter(step__process_id=options["process"])
+
+        raster = {"dpi": options["dpi"], "fmt": options["format"], "quality": options["quality"]}
+        warmed = skipped = failed = 0
+        for sf in files.iterator():
+            try:
+                path = sf.file.path
+            except Exception:
+                path = ""
+            if not path or not os.path.exists(path):
+                failed += 1
+                continue
+            if cached_page_paths(path, **raster) is not None:
+                skipped += 1
+                continue
+            if render_pdf_pages(path, **raster):
+                warmed += 1
+                self.stdout.write(f"Cached {sf.file.name}")
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"Could not rasterise {sf.file.name}"))
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed}, already cached {skipped}, failed {failed}."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:44
+
+import process_creator.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0014_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stepfile',
+            name='conversion_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stepfile',
+            name='conversion_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='stepfile',
+            name='source',
+            field=models.FileField(blank=True, upload_to=process_creator.models.step_file_upload_path),
+        ),
+        migrations.AddField(
+            model_name='stepfile',
+            name='status',
+            field=models.CharField(choices=[('ready', 'Ready'), ('converting', 'Converting'), ('failed', 'Conversion failed')], db_index=True, default='ready', max_length=20),
+        ),
+    ]
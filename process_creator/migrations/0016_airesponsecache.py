@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0015_stepfile_conversion_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='sha256 of model, max_tokens, temperature and prompt hash', max_length=64, unique=True)),
+                ('model', models.CharField(max_length=100)),
+                ('max_tokens', models.PositiveIntegerField()),
+                ('temperature', models.FloatField()),
+                ('prompt_hash', models.CharField(max_length=64)),
+                ('content', models.TextField()),
+                ('tokens_used', models.PositiveIntegerField(default=0, help_text='Tokens spent by the original call')),
+                ('cost', models.DecimalField(decimal_places=6, default=0, help_text='Cost of the original call', max_digits=10)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0016_airesponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiinteraction',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Tokens in the response (output)', null=True),
+        ),
+        migrations.AddField(
+            model_name='aiinteraction',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Tokens in the prompt (input)', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0017_aiinteraction_token_split'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiinteraction',
+            name='snapshot',
+            field=models.JSONField(blank=True, default=dict, help_text='What a summary was built from, for incremental updates'),
+        ),
+    ]
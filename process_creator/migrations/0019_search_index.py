@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 03:59
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+FTS_TABLE = "process_creator_search_fts"
+DOC_TABLE = "process_creator_searchdocument"
+
+
+def create_fts(apps, schema_editor):
+    # FTS5 is SQLite-only and optional at compile time; without it search uses SearchPosting
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, content='{DOC_TABLE}', "
+                f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            return
+        # Keep the external-content index in step with SearchDocument rows
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+            f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END"
+        )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for suffix in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0018_aiinteraction_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('process', 'Process'), ('step', 'Step'), ('template_step', 'Template Step'), ('job_step', 'Job Step')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('parent_id', models.PositiveIntegerField(help_text='Process, template or job the object belongs to')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(help_text='Occurrences, with title matches counted extra')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='process_creator.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'document'], name='process_cre_term_e34941_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
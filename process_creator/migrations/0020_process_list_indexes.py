@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0019_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['-updated_at', '-id'], name='process_cre_updated_d30be1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['module', '-updated_at', '-id'], name='process_cre_module__f0a7e5_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_bullets(details):
+    # Frozen copy of services.step_counters.count_bullets as of this migration
+    return sum(1 for line in (details or "").split("\n") if line.strip().startswith("-"))
+
+
+def backfill_counters(apps, schema_editor):
+    Step = apps.get_model('process_creator', 'Step')
+    StepImage = apps.get_model('process_creator', 'StepImage')
+    counts = (StepImage.objects.filter(step=OuterRef('pk')).order_by()
+              .values('step').annotate(n=Count('pk')).values('n')[:1])
+    Step.objects.update(image_count=Coalesce(Subquery(counts), 0))
+    batch = []
+    for step in Step.objects.only('id', 'details').iterator(chunk_size=500):
+        step.bullet_count = count_bullets(step.details)
+        step.details_length = len(step.details or '')
+        batch.append(step)
+        if len(batch) >= 500:
+            Step.objects.bulk_update(batch, ['bullet_count', 'details_length'])
+            batch = []
+    Step.objects.bulk_update(batch, ['bullet_count', 'details_length'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0020_process_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='step',
+            name='bullet_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='details_length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='step',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
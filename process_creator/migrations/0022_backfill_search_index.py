@@ -0,0 +1,78 @@
+import re
+from collections import Counter
+
+from django.db import migrations
+
+# Frozen copies of what services/search.py indexed when this migration was
+# written; later changes there must not alter what it does on a fresh database.
+FTS_TABLE = 'process_creator_search_fts'
+TITLE_WEIGHT = 5
+_WORD = re.compile(r'\w+')
+
+# kind -> (model name, object -> (parent id, title, body parts))
+SOURCES = {
+    'process': ('Process', lambda p: (p.id, p.name, [p.description, p.summary, p.notes])),
+    'step': ('Step', lambda s: (s.process_id, s.title, [s.details])),
+    'template_step': ('TemplateStep', lambda s: (s.template_id, s.title, [s.details])),
+    'job_step': ('JobStep', lambda s: (s.job_id, s.title, [s.details, s.notes])),
+}
+
+
+def tokenize(text):
+    return [word[:64] for word in _WORD.findall((text or '').lower())]
+
+
+def term_weights(title, body):
+    weights = Counter(tokenize(body))
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    return weights
+
+
+def document_fields(kind, obj):
+    parent_id, title, parts = SOURCES[kind][1](obj)
+    body = '\n\n'.join(part.strip() for part in parts if part and part.strip())
+    return parent_id, title[:255], body
+
+
+def fts_table_exists(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def index_existing(apps, schema_editor):
+    # 0019 created an empty index; documents for rows saved since then are kept
+    SearchDocument = apps.get_model('process_creator', 'SearchDocument')
+    SearchPosting = apps.get_model('process_creator', 'SearchPosting')
+    # With the FTS5 table the triggers index the documents; otherwise the postings are the index
+    use_fts = fts_table_exists(schema_editor.connection)
+    for kind, (model_name, _fields) in SOURCES.items():
+        Model = apps.get_model('process_creator', model_name)
+        indexed = set(SearchDocument.objects.filter(kind=kind).values_list('object_id', flat=True))
+        documents = []
+        for obj in Model.objects.order_by('pk').iterator(chunk_size=500):
+            if obj.pk in indexed:
+                continue
+            parent_id, title, body = document_fields(kind, obj)
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, parent_id=parent_id, title=title, body=body))
+        SearchDocument.objects.bulk_create(documents, batch_size=500)
+        if not use_fts:
+            SearchPosting.objects.bulk_create((
+                SearchPosting(document=document, term=term, weight=weight)
+                for document in documents
+                for term, weight in term_weights(document.title, document.body).items()
+            ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0021_step_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
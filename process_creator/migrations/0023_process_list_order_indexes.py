@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process_creator', '0022_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='process',
+            name='process_cre_updated_d30be1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='process',
+            name='process_cre_module__f0a7e5_idx',
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['order', 'id'], name='process_cre_order_baa70d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['module', 'order', 'id'], name='process_cre_module__ab9b28_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from .services.step_counters import count_bullets
+
 
 class Module(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -39,6 +41,11 @@ class Process(models.Model):
 
     class Meta:
         ordering = ["order", "name"]
+        # Keyset pagination of the process list (in the user's order, optionally per module)
+        indexes = [
+            models.Index(fields=["order", "id"]),
+            models.Index(fields=["module", "order", "id"]),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -49,6 +56,11 @@ class Step(models.Model):
     order = models.PositiveIntegerField(default=1)
     title = models.CharField(max_length=255)
     details = models.TextField(blank=True)
+    # Denormalised for process_stats: the two text counters are refreshed on save,
+    # image_count by the StepImage signals (see services/step_counters.py)
+    bullet_count = models.PositiveIntegerField(default=0, editable=False)
+    details_length = models.PositiveIntegerField(default=0, editable=False)
+    image_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -59,6 +71,14 @@ class Step(models.Model):
     def __str__(self) -> str:
         return f"{self.order}. {self.title}"
 
+    def save(self, *args, **kwargs):
+        self.bullet_count = count_bullets(self.details)
+        self.details_length = len(self.details or "")
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "details" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "bullet_count", "details_length"}
+        super().save(*args, **kwargs)
+
 
 class StepImage(models.Model):
     step = models.ForeignKey(Step, related_name="images", on_delete=models.CASCADE)
@@ -92,9 +112,20 @@ def step_file_upload_path(instance, filename: str) -> str:
 
 
 class StepFile(models.Model):
+    STATUS_CHOICES = [
+        ("ready", "Ready"),
+        ("converting", "Converting"),
+        ("failed", "Conversion failed"),
+    ]
+
     step = models.ForeignKey(Step, on_delete=models.CASCADE, related_name="files")
     order = models.PositiveIntegerField(default=1)
     file = models.FileField(upload_to=step_file_upload_path)
+    # DWG/IDW uploads keep the original here once converted; ``file`` then holds the PDF
+    source = models.FileField(upload_to=step_file_upload_path, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="ready", db_index=True)
+    conversion_error = models.TextField(blank=True)
+    conversion_attempts = models.PositiveIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -116,7 +147,10 @@ class AIInteraction(models.Model):
     prompt_sent = models.TextField(help_text="The prompt/instructions sent")
     response_received = models.TextField(help_text="The response received")
     tokens_used = models.PositiveIntegerField(null=True, blank=True, help_text="Number of tokens used")
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True, help_text="Tokens in the prompt (input)")
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True, help_text="Tokens in the response (output)")
     cost = models.DecimalField(max_digits=10, decimal_places=6, null=True, blank=True, help_text="Cost of this interaction")
+    snapshot = models.JSONField(default=dict, blank=True, help_text="What a summary was built from, for incremental updates")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -244,3 +278,97 @@ class JobStepImage(models.Model):
     class Meta:
         ordering = ["order", "id"]
 
+
+
+def export_job_result_path(instance, filename: str) -> str:
+    return f"exports/job_{instance.id}/{filename}"
+
+
+class ExportJob(models.Model):
+    """A queued PDF/Word export rendered by the background export worker."""
+    KIND_CHOICES = [
+        ("process_pdf", "Process PDF"),
+        ("process_word", "Process Word"),
+        ("bulk_pdf", "Bulk PDF"),
+        ("bulk_word", "Bulk Word"),
+    ]
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued", db_index=True)
+    process = models.ForeignKey(Process, null=True, blank=True, on_delete=models.CASCADE, related_name="export_jobs")
+    params = models.JSONField(default=dict, blank=True, help_text="Request parameters (key -> list of values)")
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="process_export_jobs")
+    result = models.FileField(upload_to=export_job_result_path, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=120, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+
+class AIResponseCache(models.Model):
+    """A stored chat completion, reused when the same prompt is sent with the same settings."""
+    key = models.CharField(max_length=64, unique=True, help_text="sha256 of model, max_tokens, temperature and prompt hash")
+    model = models.CharField(max_length=100)
+    max_tokens = models.PositiveIntegerField()
+    temperature = models.FloatField()
+    prompt_hash = models.CharField(max_length=64)
+    content = models.TextField()
+    tokens_used = models.PositiveIntegerField(default=0, help_text="Tokens spent by the original call")
+    cost = models.DecimalField(max_digits=10, decimal_places=6, default=0, help_text="Cost of the original call")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"{self.model} {self.prompt_hash[:12]} ({self.hits} hits)"
+
+
+class SearchDocument(models.Model):
+    """Searchable text of one process, step, template step or job step (see services/search.py)."""
+    KIND_CHOICES = [
+        ("process", "Process"),
+        ("step", "Step"),
+        ("template_step", "Template Step"),
+        ("job_step", "Job Step"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    parent_id = models.PositiveIntegerField(help_text="Process, template or job the object belongs to")
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ("kind", "object_id")
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} #{self.object_id}: {self.title}"
+
+
+class SearchPosting(models.Model):
+    """Inverted-index entry used when SQLite FTS5 is unavailable."""
+    document = models.ForeignKey(SearchDocument, related_name="postings", on_delete=models.CASCADE)
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(help_text="Occurrences, with title matches counted extra")
+
+    class Meta:
+        indexes = [models.Index(fields=["term", "document"])]
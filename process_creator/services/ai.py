@@ -0,0 +1,252 @@
+"""
+OpenAI chat completions for summaries and analyses, with a persistent response
+cache.
+
+Responses are stored in AIResponseCache keyed on (model, max_tokens,
+temperature, sha256 of the prompt). A byte-identical prompt sent within
+AI_CACHE_TTL returns the stored text immediately and costs nothing; pass
+``use_cache=False`` (the views accept ``"refresh": true``) to force a new
+completion, which then replaces the stored one.
+
+All calls share one OpenAI client per (API key, base URL), so its HTTP
+connection pool and TLS sessions are reused. The client applies the
+configured timeouts and retries failed requests with exponential backoff;
+a semaphore caps how many completions run at once. Setting OPENAI_BASE_URL
+points it at any OpenAI-compatible server, e.g. a local stand-in in tests.
+"""
+import hashlib
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .. import conf
+from ..models import AIResponseCache
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+
+# Pricing per 1K tokens (as of 2024)
+PRICING = {
+    'gpt-4o-mini': {'input': 0.00015, 'output': 0.0006},
+    'gpt-4o': {'input': 0.005, 'output': 0.015},
+    'gpt-3.5-turbo': {'input': 0.0015, 'output': 0.002}
+}
+
+
+def calculate_cost(prompt_tokens, completion_tokens, model):
+    """Calculate cost from the prompt (input) and completion (output) token counts"""
+    if model not in PRICING:
+        model = DEFAULT_MODEL
+
+    cost = (Decimal(str(PRICING[model]['input'])) * prompt_tokens
+            + Decimal(str(PRICING[model]['output'])) * completion_tokens) / 1000
+    return cost.quantize(Decimal('0.000001'))
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def cache_key(prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+    raw = f"{model}\n{max_tokens}\n{temperature!r}\n{prompt_hash(prompt)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_cached_response(key: str):
+    cutoff = timezone.now() - timedelta(seconds=conf.AI_CACHE_TTL)
+    entry = AIResponseCache.objects.filter(key=key, created_at__gte=cutoff).first()
+    if entry is not None:
+        AIResponseCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_hit_at=timezone.now())
+    return entry
+
+
+def store_response(key, prompt, model, max_tokens, temperature, content, tokens_used, cost):
+    # Expired rows are never served again; drop them while we are writing anyway
+    AIResponseCache.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=conf.AI_CACHE_TTL)).delete()
+    AIResponseCache.objects.update_or_create(key=key, defaults={
+        'model': model,
+        'max_tokens': max_tokens,
+        'temperature': temperature,
+        'prompt_hash': prompt_hash(prompt),
+        'content': content,
+        'tokens_used': tokens_used,
+        'cost': cost,
+        'hits': 0,
+        'created_at': timezone.now(),
+        'last_hit_at': None,
+    })
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_call_slots = threading.BoundedSemaphore(max(1, conf.AI_MAX_CONCURRENT))
+
+
+def _base_url():
+    return getattr(settings, 'OPENAI_BASE_URL', '') or None
+
+
+def ai_configured() -> bool:
+    return bool(settings.OPENAI_API_KEY or _base_url())
+
+
+def get_client():
+    """Return the shared client for the current API key and base URL."""
+    # Stand-in servers behind OPENAI_BASE_URL do not check the key
+    api_key = settings.OPENAI_API_KEY or 'local'
+    base_url = _base_url()
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            import openai
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=openai.Timeout(conf.AI_TIMEOUT, connect=conf.AI_CONNECT_TIMEOUT),
+                max_retries=conf.AI_MAX_RETRIES,
+            )
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    Shared AsyncOpenAI client for the running event loop (async clients cannot
+    be reused across loops). Used by the streaming endpoints.
+    """
+    import asyncio
+    import openai
+
+    api_key = settings.OPENAI_API_KEY or 'local'
+    base_url = _base_url()
+    per_loop = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get((api_key, base_url))
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=openai.Timeout(conf.AI_TIMEOUT, connect=conf.AI_CONNECT_TIMEOUT),
+            max_retries=conf.AI_MAX_RETRIES,
+        )
+        per_loop[(api_key, base_url)] = client
+    return client
+
+
+def _request_completion(client, prompt, model, max_tokens, temperature):
+    # No database access here: this runs on pool threads in call_openai_api_many
+    with _call_slots:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+    usage = response.usage
+    return response.choices[0].message.content, usage.prompt_tokens, usage.completion_tokens
+
+
+def _error(message):
+    return {
+        'success': False,
+        'error': message,
+        'tokens_used': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'cost': Decimal('0.00')
+    }
+
+
+def call_openai_api_many(prompts, model=DEFAULT_MODEL, max_tokens=2000, temperature=DEFAULT_TEMPERATURE,
+                         use_cache=True, client=None):
+    """
+    Send independent prompts concurrently and return one result dict per
+    prompt, in order (see call_openai_api). Cache reads and writes happen on
+    the calling thread; only the HTTP requests run on the pool.
+    """
+    use_cache = use_cache and conf.AI_CACHE_ENABLED
+    results = [None] * len(prompts)
+    pending = []
+    for index, prompt in enumerate(prompts):
+        key = cache_key(prompt, model, max_tokens, temperature)
+        entry = get_cached_response(key) if use_cache else None
+        if entry is not None:
+            results[index] = {
+                'success': True,
+                'content': entry.content,
+                'tokens_used': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'cost': Decimal('0.00'),
+                'cached': True,
+            }
+        else:
+            pending.append((index, prompt, key))
+    if not pending:
+        return results
+
+    if client is None:
+        if not ai_configured():
+            for index, _prompt, _key in pending:
+                results[index] = _error('OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.')
+            return results
+        client = get_client()
+
+    def outcomes():
+        args = (model, max_tokens, temperature)
+        if len(pending) == 1:
+            try:
+                yield pending[0], _request_completion(client, pending[0][1], *args), None
+            except Exception as e:
+                yield pending[0], None, e
+            return
+        with ThreadPoolExecutor(max_workers=min(len(pending), max(1, conf.AI_MAX_CONCURRENT))) as pool:
+            futures = {pool.submit(_request_completion, client, item[1], *args): item for item in pending}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+    for (index, prompt, key), completion, error in outcomes():
+        if error is not None:
+            results[index] = _error(str(error))
+            continue
+        content, prompt_tokens, completion_tokens = completion
+        tokens_used = prompt_tokens + completion_tokens
+        cost = calculate_cost(prompt_tokens, completion_tokens, model)
+        # Refreshed responses replace the stored one even when reading was bypassed
+        if conf.AI_CACHE_ENABLED and content:
+            store_response(key, prompt, model, max_tokens, temperature, content, tokens_used, cost)
+        results[index] = {
+            'success': True,
+            'content': content,
+            'tokens_used': tokens_used,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost': cost,
+            'cached': False,
+        }
+    return results
+
+
+def call_openai_api(prompt, model=DEFAULT_MODEL, max_tokens=2000, temperature=DEFAULT_TEMPERATURE,
+                    use_cache=True, client=None):
+    """
+    Helper function to call OpenAI API and track usage.
+
+    Returns ``{'success', 'content', 'tokens_used', 'prompt_tokens',
+    'completion_tokens', 'cost', 'cached'}`` or ``{'success': False, 'error',
+    ...}``. Cached responses report zero tokens and cost because nothing was
+    spent on them.
+    """
+    return call_openai_api_many([prompt], model=model, max_tokens=max_tokens, temperature=temperature,
+                                use_cache=use_cache, client=client)[0]
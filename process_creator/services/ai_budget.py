@@ -0,0 +1,113 @@
+"""
+Token counting and prompt budgets for the AI endpoints.
+
+Counts use tiktoken when it is installed (exact for OpenAI models) and fall
+back to a four-characters-per-token estimate otherwise. A prompt's budget is
+the model's context window minus the completion's ``max_tokens``, optionally
+capped by PROCESS_CREATOR_AI_PROMPT_TOKEN_BUDGET. Prompts over budget are
+trimmed by shortening the longest pieces (step details, process summaries)
+first, so short steps survive intact.
+"""
+from functools import lru_cache
+from typing import List
+
+from .. import conf
+
+# Context window per model (prompt + completion)
+CONTEXT_WINDOWS = {
+    'gpt-4o-mini': 128000,
+    'gpt-4o': 128000,
+    'gpt-3.5-turbo': 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 16385
+# Chat message framing the API adds around the prompt
+MESSAGE_OVERHEAD = 16
+TRIM_MARKER = ' … [trimmed]'
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+
+def count_tokens(text: str, model: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, limit: int, model: str) -> str:
+    if limit <= 0:
+        return ''
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:limit * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:limit])
+
+
+def prompt_budget(model: str, max_tokens: int) -> int:
+    """Tokens the prompt may use so that the completion still fits."""
+    budget = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW) - max_tokens - MESSAGE_OVERHEAD
+    if conf.AI_PROMPT_TOKEN_BUDGET:
+        budget = min(budget, conf.AI_PROMPT_TOKEN_BUDGET)
+    return max(0, budget)
+
+
+def fits(prompt: str, model: str, max_tokens: int) -> bool:
+    return count_tokens(prompt, model) <= prompt_budget(model, max_tokens)
+
+
+def fit_pieces(pieces: List[str], available: int, model: str) -> List[str]:
+    """
+    Shorten ``pieces`` so their token total is at most ``available``, trimming
+    the longest first: every piece is capped at the largest common length that
+    fits, so pieces already under the cap are left alone.
+    """
+    counts = [count_tokens(piece, model) for piece in pieces]
+    if sum(counts) <= available:
+        return list(pieces)
+
+    marker = count_tokens(TRIM_MARKER, model)
+    remaining = max(0, available)
+    cap = 0
+    ordered = sorted(counts)
+    for index, count in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        if count <= share:
+            remaining -= count
+            continue
+        cap = share
+        break
+
+    return [
+        piece if count <= cap else (truncate_tokens(piece, cap - marker, model) + TRIM_MARKER if cap > marker else '')
+        for piece, count in zip(pieces, counts)
+    ]
+
+
+def fit_prompt(render, pieces: List[str], model: str, max_tokens: int) -> str:
+    """
+    Return ``render(pieces)``, trimming ``pieces`` with fit_pieces if the
+    rendered prompt is over budget. ``render`` builds the full prompt from a
+    list of pieces; the text around them counts against the budget too.
+    """
+    prompt = render(pieces)
+    budget = prompt_budget(model, max_tokens)
+    over = count_tokens(prompt, model) - budget
+    available = sum(count_tokens(piece, model) for piece in pieces)
+    # Token counts are not exactly additive across joins, so tighten until it fits
+    while over > 0 and available > 0:
+        available = max(0, available - over)
+        prompt = render(fit_pieces(pieces, available, model))
+        over = count_tokens(prompt, model) - budget
+    return prompt
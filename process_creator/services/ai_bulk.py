@@ -0,0 +1,260 @@
+"""
+Prompt builders and persistence for per-process AI summaries and analyses, and
+the map-reduce mode of bulk summary/analysis.
+
+Instead of one JSON dump of every selected process, ``map_reduce`` first makes
+sure each process has an up-to-date summary (the "map", run concurrently), then
+sends a single "reduce" prompt built from those summaries. Map results are the
+same summaries ``ai_generate_summary`` produces: they are saved to
+``Process.summary`` and logged as AIInteraction rows.
+
+Summaries are updated incrementally: each summary interaction stores a snapshot
+of what it was built from, and the next one sends only the previous summary
+plus the steps edited (``Step.updated_at``), added or removed since. A process
+with no changes keeps its summary without another call.
+
+Every prompt built here is checked against the model's token budget (see
+ai_budget.py); when a process is too large, its longest step details are
+trimmed rather than letting the API reject the request.
+"""
+from datetime import datetime
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from ..models import AIInteraction, Process, Step
+from .ai import DEFAULT_MODEL, call_openai_api, call_openai_api_many, prompt_hash
+from .ai_budget import count_tokens, fit_prompt
+
+SUMMARY_MAX_TOKENS = 500
+ANALYSIS_MAX_TOKENS = 2000
+REDUCE_MAX_TOKENS = 2000
+
+
+def _steps_prompt(steps, header: str, footer: str, model: str, max_tokens: int) -> str:
+    def render(details):
+        prompt = header
+        for step, detail in zip(steps, details):
+            prompt += f"{step.order}. {step.title}\n"
+            if detail:
+                prompt += f"   Details: {detail}\n"
+            image_count = len(step.images.all())
+            if image_count:
+                prompt += f"   Images: {image_count} screenshot(s)\n"
+            prompt += "\n"
+        return prompt + footer
+
+    # Over budget, the longest step details are shortened first
+    return fit_prompt(render, [step.details for step in steps], model, max_tokens)
+
+
+def build_summary_prompt(process, instructions: str, model: str = DEFAULT_MODEL,
+                         max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    header = f"""{instructions}
+
+Process Details:
+Name: {process.name}
+Description: {process.description or 'No description provided'}
+
+Steps:
+"""
+    footer = f"Notes: {process.notes}\n" if process.notes else ''
+    return _steps_prompt(list(process.steps.all()), header, footer, model, max_tokens)
+
+
+def build_analysis_prompt(process, instructions: str, model: str = DEFAULT_MODEL,
+                          max_tokens: int = ANALYSIS_MAX_TOKENS) -> str:
+    header = f"""You are a business process improvement consultant. {instructions}
+
+Process Details:
+Name: {process.name}
+Description: {process.description or 'No description provided'}
+
+Current Process Steps:
+"""
+    footer = f"Additional Notes: {process.notes}\n" if process.notes else ''
+    footer += f"\nCurrent Summary: {process.summary or 'No summary available'}\n"
+    footer += """
+Please provide a detailed analysis following the instructions above. Structure your response with clear headings and actionable recommendations.
+"""
+    return _steps_prompt(list(process.steps.all()), header, footer, model, max_tokens)
+
+
+def build_incremental_summary_prompt(process, instructions: str, changed, removed, model: str = DEFAULT_MODEL,
+                                     max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    header = f"""{instructions}
+
+The process "{process.name}" already has the summary below, but some of its steps have changed since it was written. Revise the summary so it reflects the changes and keep everything that is still accurate. Reply with the complete revised summary only.
+
+Current Summary:
+{process.summary}
+
+"""
+    if removed:
+        header += "Removed Steps:\n" + "".join(f"- {title}\n" for title in removed) + "\n"
+    if changed:
+        header += "Changed or Added Steps:\n"
+    return _steps_prompt(changed, header, '', model, max_tokens)
+
+
+def summary_snapshot(process, instructions: str, as_of=None) -> dict:
+    """
+    What a summary is built from, stored on its AIInteraction: the time the
+    prompt was built, a hash of the instructions and process fields, and the
+    step ids and titles it covered.
+    """
+    basis = f"{instructions}\n{process.name}\n{process.description}\n{process.notes}"
+    return {
+        'as_of': (as_of or timezone.now()).isoformat(),
+        'basis': prompt_hash(basis),
+        'steps': {str(step.id): step.title for step in process.steps.all()},
+    }
+
+
+def step_changes(process, snapshot: dict, instructions: str):
+    """
+    Steps edited (by ``Step.updated_at``) or added since ``snapshot``, and the
+    titles of steps removed since, as ``(changed, removed)``. None when the
+    summary cannot be updated incrementally.
+    """
+    if not snapshot or not process.summary:
+        return None
+    if snapshot.get('basis') != summary_snapshot(process, instructions)['basis']:
+        return None
+    as_of = datetime.fromisoformat(snapshot['as_of'])
+    before = snapshot.get('steps', {})
+    steps = list(process.steps.all())
+    changed = [step for step in steps if str(step.id) not in before or step.updated_at > as_of]
+    current = {str(step.id) for step in steps}
+    removed = [title for step_id, title in before.items() if step_id not in current]
+    return changed, removed
+
+
+def summary_prompt(process, instructions: str, snapshot=None, incremental: bool = True):
+    """
+    Choose how to (re)summarise ``process``. Returns ``(prompt, snapshot)``
+    where ``snapshot`` is to be saved with the result; ``prompt`` is None when
+    nothing changed since the summary ``snapshot`` (from the latest summary
+    interaction) describes. Only the changed steps and the previous summary
+    are sent when that prompt is shorter than the full one.
+    """
+    new_snapshot = summary_snapshot(process, instructions)
+    full = build_summary_prompt(process, instructions)
+    changes = step_changes(process, snapshot, instructions) if incremental else None
+    if changes is None:
+        return full, new_snapshot
+    changed, removed = changes
+    if not changed and not removed:
+        return None, snapshot
+    prompt = build_incremental_summary_prompt(process, instructions, changed, removed)
+    if count_tokens(prompt, DEFAULT_MODEL) >= count_tokens(full, DEFAULT_MODEL):
+        return full, new_snapshot
+    return prompt, new_snapshot
+
+
+def latest_summary_snapshot(process):
+    interaction = (process.ai_interactions.filter(interaction_type='summary')
+                   .order_by('-created_at', '-id').only('snapshot').first())
+    return interaction.snapshot if interaction else None
+
+
+def build_reduce_prompt(instructions: str, summaries, model: str = DEFAULT_MODEL,
+                        max_tokens: int = REDUCE_MAX_TOKENS) -> str:
+    def render(texts):
+        sections = "\n\n".join(f"## {name}\n{text}" for (name, _summary), text in zip(summaries, texts))
+        return f"{instructions}\n\nThe input is a set of processes, each already summarised:\n\n{sections}"
+
+    return fit_prompt(render, [summary.strip() for _name, summary in summaries], model, max_tokens)
+
+
+def save_summary(process, prompt, result, instructions=None, snapshot=None):
+    """Store a generated summary on the process and log the interaction."""
+    process.summary = result['content']
+    if instructions is not None:
+        process.summary_instructions = instructions
+    process.last_ai_update = timezone.now()
+    process.save()
+    return AIInteraction.objects.create(
+        process=process,
+        interaction_type='summary',
+        prompt_sent=prompt,
+        response_received=result['content'],
+        tokens_used=result['tokens_used'],
+        prompt_tokens=result.get('prompt_tokens'),
+        completion_tokens=result.get('completion_tokens'),
+        cost=result['cost'],
+        snapshot=snapshot or {},
+    )
+
+
+def save_analysis(process, prompt, result, instructions=None):
+    """Store a generated analysis on the process and log the interaction."""
+    process.analysis = result['content']
+    if instructions is not None:
+        process.analysis_instructions = instructions
+    process.last_ai_update = timezone.now()
+    process.save()
+    return AIInteraction.objects.create(
+        process=process,
+        interaction_type='analysis',
+        prompt_sent=prompt,
+        response_received=result['content'],
+        tokens_used=result['tokens_used'],
+        prompt_tokens=result.get('prompt_tokens'),
+        completion_tokens=result.get('completion_tokens'),
+        cost=result['cost']
+    )
+
+
+def _latest_snapshots(process_ids):
+    latest = {}
+    rows = (AIInteraction.objects.filter(process_id__in=process_ids, interaction_type='summary')
+            .order_by('process_id', '-created_at', '-id')
+            .values_list('process_id', 'snapshot'))
+    for process_id, snapshot in rows:
+        latest.setdefault(process_id, snapshot)
+    return latest
+
+
+def map_reduce(process_ids, reduce_instructions: str, use_cache: bool = True, client=None,
+               incremental: bool = True) -> dict:
+    """
+    Summarise each process (concurrently, reusing stored summaries), then run
+    one reduce call over the results. Returns the reduce call's result dict
+    with ``processes`` (how many were summarised) and ``reused`` added.
+
+    ``use_cache=False`` bypasses the response cache; ``incremental=False``
+    resummarises every process from scratch instead of reusing or updating
+    its stored summary.
+    """
+    processes = list(
+        Process.objects.filter(id__in=process_ids).order_by('order')
+        .prefetch_related(Prefetch('steps', queryset=Step.objects.order_by('order').prefetch_related('images')))
+    )
+    if not processes:
+        return {'success': False, 'error': 'No valid processes found'}
+
+    latest = _latest_snapshots([p.id for p in processes])
+    summaries = {}
+    to_map = []
+    for process in processes:
+        prompt, snapshot = summary_prompt(process, process.summary_instructions,
+                                          latest.get(process.id) if incremental else None, incremental=incremental)
+        if prompt is None:
+            summaries[process.id] = process.summary
+        else:
+            to_map.append((process, prompt, snapshot))
+    reused = len(summaries)
+
+    results = call_openai_api_many([prompt for _p, prompt, _s in to_map], max_tokens=SUMMARY_MAX_TOKENS,
+                                   use_cache=use_cache, client=client)
+    for (process, prompt, snapshot), result in zip(to_map, results):
+        if not result['success']:
+            return {'success': False, 'error': f"Summarising {process.name} failed: {result['error']}"}
+        save_summary(process, prompt, result, snapshot=snapshot)
+        summaries[process.id] = result['content']
+
+    reduce_prompt = build_reduce_prompt(reduce_instructions, [(p.name, summaries[p.id]) for p in processes])
+    result = call_openai_api(reduce_prompt, max_tokens=REDUCE_MAX_TOKENS, use_cache=use_cache, client=client)
+    result.update(processes=len(processes), reused=reused)
+    return result
@@ -0,0 +1,117 @@
+"""
+Server-sent events for AI summaries and analyses.
+
+``stream_completion`` is an async generator of SSE frames: a ``token`` event per
+chunk of generated text, then a single ``done`` event (or ``error``). Returned
+from a view inside a StreamingHttpResponse and served through core/asgi.py, the
+stream runs on the event loop, so a slow completion does not hold a worker
+thread. Under WSGI (e.g. runserver) Django would buffer the whole stream
+first, so the editor only uses these endpoints when it was itself served
+through ASGI and otherwise calls the blocking JSON endpoints.
+
+Once the completion finishes, ``on_complete(result)`` runs in a thread with the
+same result dict call_openai_api returns, so callers persist the text and usage
+exactly as the blocking endpoints do.
+"""
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from .. import conf
+from .ai import (
+    DEFAULT_MODEL, DEFAULT_TEMPERATURE, ai_configured, cache_key, calculate_cost, get_async_client,
+    get_cached_response, store_response,
+)
+from .ai_budget import count_tokens
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _done(result):
+    return sse('done', {
+        'content': result['content'],
+        'tokens_used': result['tokens_used'],
+        'prompt_tokens': result['prompt_tokens'],
+        'completion_tokens': result['completion_tokens'],
+        'cost': str(result['cost']),
+        'cached': result['cached'],
+    })
+
+
+def _free_result(content):
+    return {'success': True, 'content': content, 'tokens_used': 0, 'prompt_tokens': 0,
+            'completion_tokens': 0, 'cost': Decimal('0.00'), 'cached': True}
+
+
+async def replay(content):
+    """Stream text that needed no completion (e.g. a summary with nothing to update)."""
+    yield sse('token', content)
+    yield _done(_free_result(content))
+
+
+async def stream_completion(prompt, on_complete, model=DEFAULT_MODEL, max_tokens=2000,
+                            temperature=DEFAULT_TEMPERATURE, use_cache=True, client=None):
+    key = cache_key(prompt, model, max_tokens, temperature)
+    if use_cache and conf.AI_CACHE_ENABLED:
+        entry = await sync_to_async(get_cached_response)(key)
+        if entry is not None:
+            result = _free_result(entry.content)
+            yield sse('token', entry.content)
+            await sync_to_async(on_complete)(result)
+            yield _done(result)
+            return
+
+    if client is None:
+        if not ai_configured():
+            yield sse('error', {'error': 'OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.'})
+            return
+        client = get_async_client()
+
+    parts = []
+    usage = None
+    try:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                text = chunk.choices[0].delta.content
+                if text:
+                    parts.append(text)
+                    yield sse('token', text)
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+    except Exception as e:
+        yield sse('error', {'error': str(e)})
+        return
+
+    content = ''.join(parts)
+    if usage:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    else:
+        # Servers that ignore include_usage: count locally rather than record nothing
+        prompt_tokens, completion_tokens = count_tokens(prompt, model), count_tokens(content, model)
+    tokens_used = prompt_tokens + completion_tokens
+    result = {
+        'success': True,
+        'content': content,
+        'tokens_used': tokens_used,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'cost': calculate_cost(prompt_tokens, completion_tokens, model),
+        'cached': False,
+    }
+    if conf.AI_CACHE_ENABLED and content:
+        await sync_to_async(store_response)(
+            key, prompt, model, max_tokens, temperature, content, tokens_used, result['cost']
+        )
+    await sync_to_async(on_complete)(result)
+    yield _done(result)
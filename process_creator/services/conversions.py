@@ -0,0 +1,228 @@
+"""
+Background DWG/IDW -> PDF conversion for StepFile uploads.
+
+The upload view stores the original drawing as a StepFile with status
+"converting" and returns; ``schedule_conversion`` hands the row to a thread
+pool once the transaction commits. Each attempt runs the configured converter
+(ODA_CONVERTER_PDF / INVENTOR_IDW_TO_PDF) as ``<exe> <input> <output>`` under a
+per-executable semaphore, since the CAD converters do not cope with many
+simultaneous instances. Failed attempts are retried with backoff; after the
+last one the row is marked "failed" and keeps the original file, so users can
+still download it. Rows left "converting" by a restarted server are picked up
+by the ``run_conversions`` management command.
+"""
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .. import conf
+from ..models import StepFile
+
+logger = logging.getLogger(__name__)
+
+# File extension -> Django setting holding the converter executable (or command list)
+CONVERTER_SETTINGS = {
+    ".dwg": "ODA_CONVERTER_PDF",
+    ".idw": "INVENTOR_IDW_TO_PDF",
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+class ConversionError(Exception):
+    pass
+
+
+class _ConvertedFile(File):
+    """
+    Converter output on disk. Exposing ``temporary_file_path`` (as Django's
+    TemporaryUploadedFile does) makes FileSystemStorage move the file into place
+    with ``file_move_safe`` - a rename on the same filesystem - instead of
+    copying it through Python.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(None, name=path)
+        self.size = os.path.getsize(path)
+
+    def temporary_file_path(self) -> str:
+        return self.name
+
+
+def is_convertible(filename: str) -> bool:
+    return os.path.splitext(filename or "")[1].lower() in CONVERTER_SETTINGS
+
+
+def converter_command(filename: str) -> Optional[List[str]]:
+    """
+    Command prefix for converting ``filename``, or None when no converter is
+    installed. Settings may be a path or a list such as ``[python, script]``.
+    """
+    setting = CONVERTER_SETTINGS.get(os.path.splitext(filename or "")[1].lower())
+    value = getattr(settings, setting, "") if setting else ""
+    command = [str(part) for part in value] if isinstance(value, (list, tuple)) else ([str(value)] if value else [])
+    if not command or not os.path.exists(command[0]):
+        return None
+    return command
+
+
+def _limit_for(command: List[str]) -> threading.BoundedSemaphore:
+    # Keyed by the executable (the script for ``[python, script]`` commands)
+    key = command[-1]
+    with _limits_lock:
+        if key not in _limits:
+            _limits[key] = threading.BoundedSemaphore(max(1, conf.CONVERTER_CONCURRENCY.get(key, 1)))
+        return _limits[key]
+
+
+def _run_converter(command: List[str], src_path: str, out_path: str) -> None:
+    with _limit_for(command):
+        try:
+            completed = subprocess.run(
+                command + [src_path, out_path],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False, timeout=conf.CONVERSION_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            raise ConversionError(f"Converter timed out after {conf.CONVERSION_TIMEOUT}s")
+        except OSError as e:
+            raise ConversionError(f"Could not start converter: {e}")
+    if completed.returncode != 0:
+        detail = completed.stderr.decode("utf-8", "replace").strip()[-500:]
+        raise ConversionError(f"Converter exited with status {completed.returncode}" + (f": {detail}" if detail else ""))
+    if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+        raise ConversionError("Converter produced no output")
+
+
+def convert_step_file(step_file_id: int) -> str:
+    """
+    Make one conversion attempt. Returns the resulting status: "ready",
+    "failed", "converting" (a retry is due) or "missing" (row deleted).
+    """
+    claimed = StepFile.objects.filter(id=step_file_id, status="converting").update(
+        conversion_attempts=F("conversion_attempts") + 1, updated_at=timezone.now()
+    )
+    if not claimed:
+        sf = StepFile.objects.filter(id=step_file_id).only("status").first()
+        return sf.status if sf else "missing"
+    sf = StepFile.objects.get(id=step_file_id)
+
+    # The converter reads the stored upload in place (the upload itself was moved
+    # there from Django's temporary upload file) and writes next to it, so the
+    # PDF can be renamed into storage rather than copied
+    out_path = None
+    try:
+        src_path = sf.file.path
+        out_fd, out_path = tempfile.mkstemp(prefix=".converting-", suffix=".pdf", dir=os.path.dirname(src_path))
+        os.close(out_fd)
+        command = converter_command(sf.file.name)
+        if command is None:
+            raise ConversionError("No converter is configured for this file type")
+        _run_converter(command, src_path, out_path)
+
+        if not StepFile.objects.filter(id=step_file_id).exists():
+            return "missing"
+        original = sf.file.name
+        pdf_name = os.path.splitext(os.path.basename(original))[0] + ".pdf"
+        sf.file.save(pdf_name, _ConvertedFile(out_path), save=False)
+        sf.source.name = original
+        sf.status = "ready"
+        sf.conversion_error = ""
+        sf.save(update_fields=["file", "source", "status", "conversion_error", "updated_at"])
+    except Exception as e:
+        logger.warning("Conversion of StepFile %s failed (attempt %s): %s", step_file_id, sf.conversion_attempts, e)
+        status = "converting" if sf.conversion_attempts < conf.CONVERSION_MAX_ATTEMPTS else "failed"
+        StepFile.objects.filter(id=step_file_id).update(
+            status=status, conversion_error=str(e) or e.__class__.__name__, updated_at=timezone.now()
+        )
+        return status
+    finally:
+        # Gone already when it was moved into storage
+        if out_path and os.path.exists(out_path):
+            os.unlink(out_path)
+
+    try:
+        from .pdf_pages import warm_pdf_pages_async
+        warm_pdf_pages_async(sf.file.path)
+    except Exception:
+        pass
+    return "ready"
+
+
+def retry_delay(attempts: int) -> float:
+    return conf.CONVERSION_RETRY_DELAY * (2 ** max(0, attempts - 1))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, conf.CONVERTER_WORKERS), thread_name_prefix="step-convert")
+        return _executor
+
+
+def _run_in_pool(step_file_id: int) -> None:
+    try:
+        status = convert_step_file(step_file_id)
+        if status == "converting":
+            attempts = StepFile.objects.filter(id=step_file_id).values_list("conversion_attempts", flat=True).first() or 1
+            timer = threading.Timer(retry_delay(attempts), submit_conversion, args=(step_file_id,))
+            timer.daemon = True
+            timer.start()
+    except Exception:
+        logger.exception("Conversion worker crashed on StepFile %s", step_file_id)
+    finally:
+        # Pool threads must not hold on to their DB connection
+        connection.close()
+
+
+def submit_conversion(step_file_id: int) -> None:
+    _get_executor().submit(_run_in_pool, step_file_id)
+
+
+def schedule_conversion(step_file_id: int) -> None:
+    """Convert in the background once the row that created it is committed."""
+    transaction.on_commit(lambda: submit_conversion(step_file_id))
+
+
+def convert_pending(stale_after: Optional[int] = None, include_failed: bool = False, log=None) -> int:
+    """
+    Synchronously finish conversions the pool never completed (e.g. the server
+    restarted mid-conversion), retrying each up to CONVERSION_MAX_ATTEMPTS.
+    ``include_failed`` also gives failed rows a fresh set of attempts.
+    Returns the number of files converted.
+    """
+    log = log or (lambda msg: logger.info(msg))
+    stale_after = conf.CONVERSION_TIMEOUT * 2 if stale_after is None else stale_after
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    if include_failed:
+        StepFile.objects.filter(status="failed").update(status="converting", conversion_attempts=0, updated_at=cutoff)
+    pending = StepFile.objects.filter(status="converting", updated_at__lte=cutoff)
+    converted = 0
+    for step_file_id in pending.order_by("id").values_list("id", flat=True):
+        # A row orphaned during its last attempt still gets one more try
+        StepFile.objects.filter(id=step_file_id, conversion_attempts__gte=conf.CONVERSION_MAX_ATTEMPTS).update(
+            conversion_attempts=conf.CONVERSION_MAX_ATTEMPTS - 1
+        )
+        status = convert_step_file(step_file_id)
+        while status == "converting":
+            attempts = StepFile.objects.filter(id=step_file_id).values_list("conversion_attempts", flat=True).first() or 1
+            time.sleep(retry_delay(attempts))
+            status = convert_step_file(step_file_id)
+        log(f"StepFile {step_file_id}: {status}")
+        converted += status == "ready"
+    return converted
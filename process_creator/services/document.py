@@ -0,0 +1,281 @@
+"""
+Intermediate document model for exports and print views.
+
+A process (or job) is parsed once into ProcessDoc/JobDoc -> DocStep -> DocLine
+-> DocImage, with bullets already matched to their substep images. Backends in
+render_docx, render_html and render_markdown only walk this tree, so bullet
+parsing and image matching live in one place and several formats can be
+produced from the same parsed tree.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from ..models import JobStep, JobSubtask, JobStepImage
+from .export_data import ProcessNode, StepNode, load_process_tree
+from .image_derivatives import derivative
+
+BULLET_RE = re.compile(r'^\s*-\s+(.*)$')
+
+
+@dataclass
+class DocImage:
+    # path/url point at the medium-size derivative; full_url at the original upload
+    path: str
+    url: str
+    name: str
+    full_url: str = ''
+    order: int = 0
+    substep_index: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.path) and os.path.exists(self.path)
+
+
+@dataclass
+class DocFile:
+    path: str
+    url: str
+    name: str
+    order: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.name.lower().endswith('.pdf')
+
+
+@dataclass
+class DocLink:
+    title: str
+    url: str
+    order: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+@dataclass
+class DocLine:
+    """One line of step details. Bullets carry the images attached to that substep."""
+    text: str
+    raw: str
+    is_bullet: bool = False
+    images: List[DocImage] = field(default_factory=list)
+
+
+@dataclass
+class DocStep:
+    order: int
+    title: str
+    lines: List[DocLine] = field(default_factory=list)
+    # Images not tied to a bullet (no substep_index, or the bullet no longer exists)
+    loose_images: List[DocImage] = field(default_factory=list)
+    images: List[DocImage] = field(default_factory=list)
+    files: List[DocFile] = field(default_factory=list)
+    links: List[DocLink] = field(default_factory=list)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Job-only content
+    percent: Optional[int] = None
+    checklist: List[Tuple[str, bool]] = field(default_factory=list)
+    job_images: List[DocImage] = field(default_factory=list)
+    notes: str = ''
+
+
+@dataclass
+class ProcessDoc:
+    name: str
+    module_name: str = ''
+    summary: str = ''
+    description: str = ''
+    notes: str = ''
+    analysis: str = ''
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    steps: List[DocStep] = field(default_factory=list)
+
+    @property
+    def pdf_files(self) -> List[DocFile]:
+        return [f for step in self.steps for f in step.files if f.is_pdf]
+
+
+@dataclass
+class JobDoc:
+    name: str
+    label: str
+    status: str
+    template_name: str = ''
+    created_at: Optional[datetime] = None
+    percent: int = 0
+    steps: List[DocStep] = field(default_factory=list)
+
+
+def _media_path(field_file) -> str:
+    return os.path.join(settings.MEDIA_ROOT, str(field_file)) if field_file else ''
+
+
+def _media_url(field_file) -> str:
+    try:
+        return field_file.url
+    except ValueError:
+        return ''
+
+
+def _doc_image(img) -> DocImage:
+    medium = derivative(img.image, 'medium') if img.image else ''
+    return DocImage(
+        path=os.path.join(settings.MEDIA_ROOT, medium) if medium else '',
+        url=img.image.storage.url(medium) if medium else '',
+        full_url=_media_url(img.image),
+        name=os.path.basename(img.image.name or ''),
+        order=img.order,
+        substep_index=getattr(img, 'substep_index', None),
+        created_at=img.uploaded_at,
+        updated_at=img.updated_at,
+    )
+
+
+def parse_lines(details: str, images: List[DocImage]) -> Tuple[List[DocLine], List[DocImage]]:
+    """
+    Split step details into lines and attach each image to the bullet matching
+    its ``substep_index``. Returns ``(lines, loose_images)``.
+    """
+    by_substep = {}
+    loose = []
+    for img in images:
+        if img.substep_index is None:
+            loose.append(img)
+        else:
+            by_substep.setdefault(img.substep_index, []).append(img)
+
+    lines = []
+    bullet_idx = -1
+    for raw in details.split('\n') if details else []:
+        line = raw.rstrip('\r')
+        match = BULLET_RE.match(line)
+        if match:
+            bullet_idx += 1
+            lines.append(DocLine(text=match.group(1), raw=line, is_bullet=True,
+                                 images=by_substep.pop(bullet_idx, [])))
+        else:
+            lines.append(DocLine(text=line, raw=line))
+    # Images whose bullet was removed still belong to the step
+    for index in sorted(by_substep):
+        loose.extend(by_substep[index])
+    return lines, loose
+
+
+def build_step(node: StepNode) -> DocStep:
+    step = node.step
+    images = [_doc_image(img) for img in node.images]
+    lines, loose = parse_lines(step.details, images)
+    return DocStep(
+        order=step.order,
+        title=step.title,
+        lines=lines,
+        loose_images=loose,
+        images=images,
+        files=[
+            DocFile(path=_media_path(f.file), url=_media_url(f.file), name=os.path.basename(f.file.name or ''),
+                    order=f.order, created_at=f.uploaded_at, updated_at=f.updated_at)
+            for f in node.files
+        ],
+        links=[
+            DocLink(title=link.title, url=link.url, order=link.order,
+                    created_at=link.created_at, updated_at=link.updated_at)
+            for link in node.links
+        ],
+        created_at=step.created_at,
+        updated_at=step.updated_at,
+    )
+
+
+def build_process_doc(tree: ProcessNode) -> ProcessDoc:
+    """Build the document model from an export_data process tree."""
+    process = tree.process
+    return ProcessDoc(
+        name=process.name,
+        module_name=process.module.name if process.module_id else '',
+        summary=process.summary or '',
+        description=process.description or '',
+        notes=process.notes or '',
+        analysis=process.analysis or '',
+        created_at=process.created_at,
+        updated_at=process.updated_at,
+        steps=[build_step(node) for node in tree.steps],
+    )
+
+
+def _percent(done: int, total: int) -> int:
+    return int(round((done / total) * 100)) if total else 0
+
+
+def build_job_doc(job, label: str) -> JobDoc:
+    """
+    Build the document model for a Job. Substep images come from the matching
+    step (by order) of the template's source process.
+    """
+    job_steps = list(
+        JobStep.objects.filter(job=job).order_by('order', 'id').prefetch_related(
+            Prefetch('subtasks', queryset=JobSubtask.objects.order_by('order', 'id')),
+            Prefetch('images', queryset=JobStepImage.objects.order_by('order', 'id')),
+        )
+    )
+    template = job.template
+    source_by_order = {}
+    if template and template.source_process_id:
+        source = load_process_tree(template.source_process_id)
+        source_by_order = {node.step.order: node for node in source.steps}
+
+    steps = []
+    total_subtasks = done_subtasks = 0
+    for job_step in job_steps:
+        subtasks = list(job_step.subtasks.all())
+        done = sum(1 for t in subtasks if t.completed)
+        total_subtasks += len(subtasks)
+        done_subtasks += done
+        if subtasks:
+            pct = _percent(done, len(subtasks))
+        else:
+            pct = 100 if job_step.status == 'completed' else 0
+
+        src = source_by_order.get(job_step.order)
+        images = [_doc_image(img) for img in src.images] if src else []
+        lines, loose = parse_lines(job_step.details, images)
+        steps.append(DocStep(
+            order=job_step.order,
+            title=job_step.title,
+            lines=lines,
+            loose_images=loose,
+            images=images,
+            created_at=job_step.created_at,
+            updated_at=job_step.updated_at,
+            percent=pct,
+            checklist=[(t.text, t.completed) for t in subtasks],
+            job_images=[_doc_image(img) for img in job_step.images.all()],
+            notes=job_step.notes or '',
+        ))
+
+    if total_subtasks:
+        overall = _percent(done_subtasks, total_subtasks)
+    else:
+        overall = _percent(sum(1 for s in job_steps if s.status == 'completed'), len(job_steps) or 1)
+
+    return JobDoc(
+        name=job.name,
+        label=label,
+        status=job.get_status_display(),
+        template_name=template.name if template else '',
+        created_at=job.created_at,
+        percent=overall,
+        steps=steps,
+    )
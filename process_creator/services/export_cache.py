@@ -0,0 +1,179 @@
+"""
+Content-addressed cache for rendered PDF/Word exports.
+
+The cache key is a hash of everything that affects the output: the export kind,
+the option flags and the revision (``updated_at``) of the processes, steps,
+images, files and links involved. Identical requests are served from disk and
+the key doubles as the HTTP ETag. Entries are evicted least-recently-used once
+the cache grows past EXPORT_CACHE_MAX_BYTES; signal receivers drop the
+single-process entries for a process as soon as it changes. Bulk entries are
+left to the LRU: an edit changes their fingerprint, so they are never served
+again and age out like any other unused entry.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+from .. import conf
+from ..models import Process, Step, StepImage, StepFile, StepLink
+from .exports import (
+    EXPORT_TOGGLES, build_export, read_history_data, read_raster_options, restamp_filename, selected_process_ids,
+    _bulk_processes,
+)
+
+# Bump when the renderers change so stale documents are not served
+EXPORT_CACHE_VERSION = "3"
+
+
+def _process_ids_for(kind, params, pk=None):
+    if kind.startswith('process_'):
+        return [int(pk)]
+    process_ids = selected_process_ids(params)
+    if not process_ids:
+        return []
+    return list(_bulk_processes(process_ids, params.get('module')).values_list('id', flat=True))
+
+
+def export_fingerprint(kind, params, pk=None) -> str:
+    """Return the cache key / ETag for an export request."""
+    process_ids = _process_ids_for(kind, params, pk)
+    state = {
+        'version': EXPORT_CACHE_VERSION,
+        'kind': kind,
+        'options': {name: str(params.get(name, 'false')).lower() == 'true' for name in EXPORT_TOGGLES},
+        'raster': read_raster_options(params),
+        'focused_step': params.get('focused_step') or '',
+        'module': params.get('module') or '',
+        'history': read_history_data(params),
+        'processes': list(
+            Process.objects.filter(id__in=process_ids).order_by('id')
+            .values_list('id', 'order', 'updated_at', 'module_id', 'module__updated_at')
+        ),
+        'steps': list(
+            Step.objects.filter(process_id__in=process_ids).order_by('id')
+            .values_list('id', 'updated_at')
+        ),
+        'images': list(
+            StepImage.objects.filter(step__process_id__in=process_ids).order_by('id')
+            .values_list('id', 'updated_at')
+        ),
+        'files': list(
+            StepFile.objects.filter(step__process_id__in=process_ids).order_by('id')
+            .values_list('id', 'updated_at')
+        ),
+        'links': list(
+            StepLink.objects.filter(step__process_id__in=process_ids).order_by('id')
+            .values_list('id', 'updated_at')
+        ),
+    }
+    payload = json.dumps(state, default=str, sort_keys=True).encode('utf-8')
+    digest = hashlib.sha256(payload).hexdigest()[:40]
+    # Prefix single-process entries so they can be invalidated without an index
+    prefix = f"p{process_ids[0]}" if kind.startswith('process_') and process_ids else "b"
+    return f"{prefix}-{digest}"
+
+
+def _entry_paths(key):
+    return (
+        os.path.join(conf.EXPORT_CACHE_DIR, f"{key}.bin"),
+        os.path.join(conf.EXPORT_CACHE_DIR, f"{key}.json"),
+    )
+
+
+def get_cached_export(key):
+    """Return ``(content, filename, content_type)`` for a cached key, or None."""
+    if not conf.EXPORT_CACHE_ENABLED:
+        return None
+    data_path, meta_path = _entry_paths(key)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(data_path, 'rb') as f:
+            content = f.read()
+        # Touch so eviction treats this entry as recently used
+        os.utime(data_path, None)
+    except (OSError, ValueError):
+        return None
+    return content, meta['filename'], meta['content_type']
+
+
+def _atomic_write(path, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def store_export(key, content, filename, content_type):
+    if not conf.EXPORT_CACHE_ENABLED:
+        return
+    try:
+        os.makedirs(conf.EXPORT_CACHE_DIR, exist_ok=True)
+        data_path, meta_path = _entry_paths(key)
+        meta = {'filename': filename, 'content_type': content_type}
+        _atomic_write(data_path, content)
+        _atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        evict_exports()
+    except OSError:
+        # A read-only or full disk should never break the download itself
+        pass
+
+
+def cached_build_export(kind, params, pk=None, key=None):
+    """build_export() with the disk cache in front. Returns (content, filename, content_type, key)."""
+    key = key or export_fingerprint(kind, params, pk)
+    cached = get_cached_export(key)
+    if cached is not None:
+        content, filename, content_type = cached
+        # The stored name carries the first render's timestamp
+        return content, restamp_filename(filename), content_type, key
+    content, filename, content_type = build_export(kind, params, pk=pk)
+    store_export(key, content, filename, content_type)
+    return content, filename, content_type, key
+
+
+def _remove_entry(data_path):
+    for path in (data_path, data_path[:-len('.bin')] + '.json'):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def evict_exports(max_bytes: Optional[int] = None) -> int:
+    """Drop least-recently-used entries until the cache fits in ``max_bytes``."""
+    max_bytes = conf.EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for path in glob.glob(os.path.join(conf.EXPORT_CACHE_DIR, '*.bin')):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    removed = 0
+    for _mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove_entry(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def invalidate_process_exports(process_id: int) -> int:
+    """Remove cached single-process exports of ``process_id``."""
+    removed = 0
+    for path in glob.glob(os.path.join(conf.EXPORT_CACHE_DIR, f'p{process_id}-*.bin')):
+        _remove_entry(path)
+        removed += 1
+    return removed
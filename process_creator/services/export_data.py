@@ -0,0 +1,84 @@
+"""
+Export data loader: fetch everything an export needs in a fixed number of queries.
+
+Renderers walk the returned tree (process -> steps -> images/files/links)
+instead of calling ``step.images.all()`` and friends per bullet, so the query
+count no longer grows with the number of steps or attachments. The wrapped
+model instances carry their prefetch caches, so templates that still use
+``process.steps.all`` / ``step.images.all`` are served from memory too.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.db.models import Prefetch
+
+from ..models import Process, Step, StepImage, StepFile, StepLink
+
+
+@dataclass
+class StepNode:
+    step: Step
+    images: List[StepImage]
+    files: List[StepFile]
+    links: List[StepLink]
+    # Images keyed by the bullet they belong to; None holds unplaced images
+    images_by_substep: Dict[Optional[int], List[StepImage]] = field(default_factory=dict)
+
+    @classmethod
+    def from_step(cls, step: Step) -> "StepNode":
+        images = list(step.images.all())
+        grouped: Dict[Optional[int], List[StepImage]] = {}
+        for img in images:
+            grouped.setdefault(img.substep_index, []).append(img)
+        return cls(step=step, images=images, files=list(step.files.all()),
+                   links=list(step.links.all()), images_by_substep=grouped)
+
+    @property
+    def pdf_files(self) -> List[StepFile]:
+        return [f for f in self.files if f.file.name.lower().endswith('.pdf')]
+
+
+@dataclass
+class ProcessNode:
+    process: Process
+    steps: List[StepNode]
+
+    @property
+    def step_models(self) -> List[Step]:
+        return [node.step for node in self.steps]
+
+
+def _steps_queryset(focused_step_id=None):
+    steps = Step.objects.order_by('order', 'id').prefetch_related(
+        Prefetch('images', queryset=StepImage.objects.order_by('order', 'id')),
+        Prefetch('files', queryset=StepFile.objects.order_by('order', 'id')),
+        Prefetch('links', queryset=StepLink.objects.order_by('order', 'id')),
+    )
+    if focused_step_id:
+        try:
+            steps = steps.filter(id=int(focused_step_id))
+        except (TypeError, ValueError):
+            pass
+    return steps
+
+
+def prefetch_export_tree(processes, focused_step_id=None):
+    """Attach module, steps and attachments to a Process queryset."""
+    return processes.select_related('module').prefetch_related(
+        Prefetch('steps', queryset=_steps_queryset(focused_step_id))
+    )
+
+
+def _to_node(process: Process) -> ProcessNode:
+    return ProcessNode(process=process, steps=[StepNode.from_step(s) for s in process.steps.all()])
+
+
+def load_process_tree(pk, focused_step_id=None) -> ProcessNode:
+    """Load one process for export. Raises Process.DoesNotExist."""
+    process = prefetch_export_tree(Process.objects.filter(pk=pk), focused_step_id).get()
+    return _to_node(process)
+
+
+def load_bulk_tree(processes) -> List[ProcessNode]:
+    """Load every process in an (ordered) queryset for a bulk export."""
+    return [_to_node(p) for p in prefetch_export_tree(processes)]
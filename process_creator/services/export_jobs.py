@@ -0,0 +1,186 @@
+"""
+Database-backed queue for PDF/Word exports.
+
+Requests enqueue an ExportJob row; ``run_worker`` (via the ``run_export_worker``
+management command) claims queued rows and renders them in a process pool,
+storing the result under MEDIA_ROOT/exports/. No broker is needed: claiming is
+a compare-and-set UPDATE on the status column, which is safe on SQLite.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .. import conf
+from ..models import ExportJob
+from .exports import EXPORT_KINDS
+from .export_cache import cached_build_export
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_export(kind: str, params, process=None, user=None) -> ExportJob:
+    """Create a queued ExportJob. ``params`` may be a QueryDict or a plain dict."""
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    if hasattr(params, "lists"):
+        stored = {key: values for key, values in params.lists()}
+    else:
+        stored = {key: value if isinstance(value, list) else [value] for key, value in (params or {}).items()}
+    return ExportJob.objects.create(
+        kind=kind,
+        process=process,
+        params=stored,
+        requested_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def claim_next_job() -> Optional[ExportJob]:
+    """Atomically move the oldest queued job to 'running' and return it."""
+    for job_id in ExportJob.objects.filter(status="queued").order_by("created_at", "id").values_list("id", flat=True)[:5]:
+        claimed = ExportJob.objects.filter(id=job_id, status="queued").update(
+            status="running", attempts=F("attempts") + 1, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            return ExportJob.objects.get(id=job_id)
+    return None
+
+
+def cancel_queued_job(job_id: int, reason: str) -> bool:
+    """Fail a job no worker has claimed yet (the client rendered it inline instead)."""
+    return bool(ExportJob.objects.filter(id=job_id, status="queued").update(
+        status="failed", error=reason, finished_at=timezone.now(), updated_at=timezone.now()
+    ))
+
+
+def touch_running_jobs(job_ids) -> int:
+    """Heartbeat: mark jobs this worker is still rendering as alive."""
+    return ExportJob.objects.filter(id__in=list(job_ids), status="running").update(updated_at=timezone.now())
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Return orphaned 'running' jobs (e.g. worker killed) to the queue. Live
+    workers touch their jobs every EXPORT_JOB_SWEEP_INTERVAL, so only jobs
+    nobody has checked in on for EXPORT_JOB_STALE_AFTER count as orphaned.
+    """
+    cutoff = timezone.now() - timedelta(seconds=conf.EXPORT_JOB_STALE_AFTER)
+    stale = ExportJob.objects.filter(status="running", updated_at__lt=cutoff)
+    requeued = stale.filter(attempts__lt=conf.EXPORT_JOB_MAX_ATTEMPTS).update(
+        status="queued", started_at=None, updated_at=timezone.now()
+    )
+    stale.update(status="failed", error="Export worker stopped while rendering", finished_at=timezone.now(),
+                 updated_at=timezone.now())
+    return requeued
+
+
+def run_export_job(job_id: int) -> str:
+    """Render a claimed job and store the result. Returns the final status."""
+    job = ExportJob.objects.get(id=job_id)
+    try:
+        content, filename, content_type, _key = cached_build_export(
+            job.kind, MultiValueDict(job.params or {}), pk=job.process_id
+        )
+    except Exception as e:
+        logger.exception("Export job %s failed", job_id)
+        job.status = "failed"
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+        return job.status
+    job.result.save(filename, ContentFile(content), save=False)
+    job.filename = filename
+    job.content_type = content_type
+    job.status = "completed"
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["result", "filename", "content_type", "status", "error", "finished_at", "updated_at"])
+    return job.status
+
+
+def purge_export_jobs(older_than_days: int) -> int:
+    """Delete finished jobs (and their result files) older than the given age."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    count = 0
+    for job in ExportJob.objects.filter(status__in=["completed", "failed"], finished_at__lt=cutoff):
+        if job.result:
+            job.result.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+def _worker_init():
+    # Child processes need their own Django setup and DB connections
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _run_in_child(job_id: int) -> str:
+    try:
+        return run_export_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_worker(workers: Optional[int] = None, poll_interval: float = 1.0, once: bool = False, log=None) -> int:
+    """
+    Claim queued jobs and render them across ``workers`` processes.
+
+    With ``once`` the worker drains the current queue and returns; otherwise it
+    polls forever. Every EXPORT_JOB_SWEEP_INTERVAL it touches its own running
+    jobs and re-queues jobs orphaned by workers that died. Returns the number
+    of jobs processed.
+    """
+    workers = max(1, workers or conf.EXPORT_WORKERS)
+    log = log or (lambda msg: logger.info(msg))
+
+    def sweep():
+        touch_running_jobs(in_flight.values())
+        requeued = requeue_stale_jobs()
+        if requeued:
+            log(f"Re-queued {requeued} stale export job(s)")
+        return time.monotonic()
+
+    processed = 0
+    in_flight = {}
+    last_sweep = sweep()
+    # Forked children must not share the parent's DB connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+        while True:
+            while len(in_flight) < workers:
+                job = claim_next_job()
+                if job is None:
+                    break
+                log(f"Rendering {job}")
+                in_flight[pool.submit(_run_in_child, job.id)] = job.id
+
+            for future in [f for f in in_flight if f.done()]:
+                job_id = in_flight.pop(future)
+                try:
+                    status = future.result()
+                except Exception as e:
+                    # The child died before it could record the outcome
+                    ExportJob.objects.filter(id=job_id).update(
+                        status="failed", error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+                    )
+                    status = "failed"
+                processed += 1
+                log(f"Export job {job_id}: {status}")
+
+            if time.monotonic() - last_sweep >= conf.EXPORT_JOB_SWEEP_INTERVAL:
+                last_sweep = sweep()
+            if once and not in_flight and not ExportJob.objects.filter(status="queued").exists():
+                return processed
+            time.sleep(poll_interval if not in_flight else min(poll_interval, 0.2))
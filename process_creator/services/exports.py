@@ -0,0 +1,199 @@
+"""
+Document builders for Process exports (PDF via xhtml2pdf, Word via python-docx,
+Markdown).
+
+These are shared by the synchronous download views and the background export
+worker, so they take plain arguments (a Process or ids plus option flags) and
+return ``(content_bytes, filename, content_type)`` instead of an HttpResponse.
+Each process is parsed once into the document model (services/document.py)
+and handed to the format backends.
+"""
+import json
+import re
+from datetime import datetime
+
+from ..models import Module, Process
+from .document import build_process_doc
+from .export_data import load_bulk_tree, load_process_tree
+from .pdf_pages import raster_options
+from .render_docx import bulk_to_docx, process_to_docx
+from .render_html import bulk_to_html, html_to_pdf, process_to_html
+from .render_markdown import bulk_to_markdown, process_to_markdown
+
+PDF_CONTENT_TYPE = 'application/pdf'
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+MARKDOWN_CONTENT_TYPE = 'text/markdown; charset=utf-8'
+
+# Toggle flags understood by the Word exporters (all default to False)
+EXPORT_TOGGLES = (
+    'show_description',
+    'show_notes',
+    'show_analysis',
+    'show_attachments',
+    'show_summary',
+    'show_pdfs',
+)
+
+
+def read_toggles(params) -> dict:
+    """Read the show_* toggle flags from a QueryDict / MultiValueDict / dict."""
+    return {name: str(params.get(name, 'false')).lower() == 'true' for name in EXPORT_TOGGLES}
+
+
+def read_raster_options(params) -> dict:
+    """Read pdf_dpi / pdf_format / pdf_quality, used when show_pdfs embeds page images."""
+    return raster_options(params.get('pdf_dpi'), params.get('pdf_format'), params.get('pdf_quality'))
+
+
+def read_history_data(params) -> list:
+    """Parse the optional history payload sent along with bulk exports."""
+    if params.get('include_history') != 'true':
+        return []
+    try:
+        return json.loads(params.get('history_data', '[]'))
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+
+def _safe_name(value: str) -> str:
+    return "".join(c for c in value if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '-')
+
+
+def _bulk_processes(process_ids, module_id=None):
+    # Filter by module if specified
+    if module_id:
+        try:
+            selected_module = Module.objects.get(id=module_id)
+            return Process.objects.filter(id__in=process_ids, module=selected_module).order_by('order')
+        except Module.DoesNotExist:
+            pass
+    return Process.objects.filter(id__in=process_ids).order_by('order')
+
+
+def all_process_ids(module_id=None):
+    """Every process the list page shows for ``module_id`` (all modules when empty)."""
+    processes = Process.objects.all()
+    if module_id and str(module_id).isdigit():
+        processes = processes.filter(module_id=module_id)
+    return list(processes.order_by('order', 'id').values_list('id', flat=True))
+
+
+def selected_process_ids(params):
+    """
+    The processes a bulk request is for: its ``ids``, or with ``all=true``
+    every process in ``module``. The list page is paginated, so "Check All"
+    cannot send the ids of cards it has not loaded.
+    """
+    if str(params.get('all', 'false')).lower() == 'true':
+        return all_process_ids(params.get('module'))
+    return params.getlist('ids')
+
+
+def _timestamp():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+_FILENAME_STAMP = re.compile(r"-\d{8}-\d{6}(?=\.\w+$)")
+
+
+def restamp_filename(filename):
+    """Give a previously built export filename the current timestamp."""
+    return _FILENAME_STAMP.sub(lambda _m: f"-{_timestamp()}", filename, count=1)
+
+
+def process_filename(pdoc, ext):
+    """Filename for a single-process export: module (if any), process title and timestamp."""
+    safe_process = _safe_name(pdoc.name)
+    if ext != 'pdf' and pdoc.module_name:
+        return f"{_safe_name(pdoc.module_name)}-{safe_process}-{_timestamp()}.{ext}"
+    return f"Process-{safe_process}-{_timestamp()}.{ext}"
+
+
+def bulk_filename(module_names, ext, module_id=None):
+    """Filename for a multi-process export, named after the module when they share one."""
+    module_name = None
+    if module_id:
+        module_name = Module.objects.filter(id=module_id).values_list('name', flat=True).first()
+    if module_name is None:
+        modules = {name for name in module_names if name}
+        if len(modules) == 1:
+            module_name = modules.pop()
+    if module_name and ext != 'pdf':
+        return f"{_safe_name(module_name)}-{_timestamp()}.{ext}"
+    return f"Bulk-Process-Report-{_timestamp()}.{ext}"
+
+
+def render_process_pdf(pdoc):
+    """Render a single process document to PDF bytes."""
+    return html_to_pdf(process_to_html(pdoc)), process_filename(pdoc, 'pdf'), PDF_CONTENT_TYPE
+
+
+def render_process_word(pdoc, toggles=None, raster=None):
+    """Render a single process document to .docx bytes honoring the show_* toggles."""
+    return process_to_docx(pdoc, toggles, raster), process_filename(pdoc, 'docx'), DOCX_CONTENT_TYPE
+
+
+def render_process_markdown(pdoc, toggles=None):
+    content = process_to_markdown(pdoc, toggles).encode('utf-8')
+    return content, process_filename(pdoc, 'md'), MARKDOWN_CONTENT_TYPE
+
+
+def render_bulk_pdf(pdocs, history_data=None):
+    """Render several process documents into one combined PDF report."""
+    content = html_to_pdf(bulk_to_html(pdocs, history_data))
+    return content, bulk_filename([d.module_name for d in pdocs], 'pdf'), PDF_CONTENT_TYPE
+
+
+def render_bulk_word(pdocs, toggles=None, history_data=None, module_id=None, raster=None):
+    """Render several process documents into one combined Word report."""
+    content = bulk_to_docx(pdocs, toggles, history_data, raster)
+    return content, bulk_filename([d.module_name for d in pdocs], 'docx', module_id), DOCX_CONTENT_TYPE
+
+
+def render_bulk_markdown(pdocs, toggles=None, module_id=None):
+    content = bulk_to_markdown(pdocs, toggles).encode('utf-8')
+    return content, bulk_filename([d.module_name for d in pdocs], 'md', module_id), MARKDOWN_CONTENT_TYPE
+
+
+# Export kinds accepted by the background queue
+EXPORT_KINDS = ('process_pdf', 'process_word', 'bulk_pdf', 'bulk_word')
+# Small text exports are only served directly
+DIRECT_EXPORT_KINDS = EXPORT_KINDS + ('process_markdown', 'bulk_markdown')
+
+
+def load_bulk_docs(params):
+    """Parse the ids/module parameters of a bulk export into process documents."""
+    process_ids = selected_process_ids(params)
+    if not process_ids:
+        raise ValueError('No processes selected')
+    pdocs = [build_process_doc(tree) for tree in load_bulk_tree(_bulk_processes(process_ids, params.get('module')))]
+    if not pdocs:
+        raise ValueError('No valid processes found')
+    return pdocs
+
+
+def build_export(kind, params, pk=None):
+    """
+    Build an export from request-style parameters.
+
+    ``params`` is anything with ``get``/``getlist`` (QueryDict, MultiValueDict).
+    Raises Process.DoesNotExist / ValueError for invalid input.
+    """
+    if kind not in DIRECT_EXPORT_KINDS:
+        raise ValueError(f'Unknown export kind: {kind}')
+    if kind.startswith('process_'):
+        pdoc = build_process_doc(load_process_tree(pk, params.get('focused_step')))
+        if kind == 'process_pdf':
+            return render_process_pdf(pdoc)
+        if kind == 'process_markdown':
+            return render_process_markdown(pdoc, read_toggles(params))
+        return render_process_word(pdoc, read_toggles(params), read_raster_options(params))
+
+    pdocs = load_bulk_docs(params)
+    if kind == 'bulk_pdf':
+        return render_bulk_pdf(pdocs, read_history_data(params))
+    if kind == 'bulk_markdown':
+        return render_bulk_markdown(pdocs, read_toggles(params), params.get('module'))
+    return render_bulk_word(
+        pdocs, read_toggles(params), read_history_data(params), params.get('module'), read_raster_options(params)
+    )
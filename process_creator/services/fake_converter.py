@@ -0,0 +1,62 @@
+"""
+Stand-in for the ODA / Inventor PDF converters, for tests and local development:
+
+    ODA_CONVERTER_PDF = [sys.executable, "/path/to/process_creator/services/fake_converter.py"]
+
+Run as ``fake_converter.py <input> <output>`` it writes a one-page PDF naming the
+input file. Inputs starting with ``FAIL`` exit with status 1 and ``SLOW <seconds>``
+sleeps first, so retries and timeouts can be exercised. Standalone on purpose:
+it is executed as a subprocess and must not import Django.
+"""
+import os
+import sys
+import time
+
+FAKE_CONVERTER = [sys.executable, os.path.abspath(__file__)]
+
+
+def fake_pdf(text: str) -> bytes:
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    stream = f"BT /F1 18 Tf 72 720 Td (Converted {text}) Tj ET".encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def main(argv) -> int:
+    if len(argv) != 3:
+        sys.stderr.write("usage: fake_converter.py <input> <output>\n")
+        return 2
+    src, dest = argv[1], argv[2]
+    with open(src, "rb") as f:
+        head = f.read(64)
+    if head.startswith(b"FAIL"):
+        sys.stderr.write("fake conversion failure\n")
+        return 1
+    if head.startswith(b"SLOW"):
+        try:
+            time.sleep(float(head.split()[1]))
+        except (IndexError, ValueError):
+            time.sleep(1)
+    with open(dest, "wb") as f:
+        f.write(fake_pdf(os.path.basename(src)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
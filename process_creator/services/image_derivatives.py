@@ -0,0 +1,136 @@
+"""
+Resized copies of uploaded screenshots (StepImage / JobStepImage).
+
+For each original a thumbnail and a medium-size image are written next to it
+under ``_derived/``, each in the original's family (PNG or JPEG) plus WebP.
+Names keep the original's extension, so ``shot.png`` and ``shot.jpg`` in the
+same directory never share derivatives:
+
+    process_screenshots/shot.png
+    process_screenshots/_derived/shot.png.thumb.png
+    process_screenshots/_derived/shot.png.thumb.webp
+    process_screenshots/_derived/shot.png.medium.png
+    ...
+
+They are generated at upload time and lazily on first use for older images.
+Editors and detail pages show thumbnails, Word/PDF exports embed the medium
+size. If an original cannot be read, callers fall back to the original file;
+the failure is logged once and remembered in the Django cache for
+IMAGE_DERIVATIVE_MISS_SECONDS, so a missing file is not retried on every use.
+"""
+import logging
+import os
+import posixpath
+from io import BytesIO
+from typing import Dict
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+from .. import conf
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = "_derived"
+MISS_KEY = "image-derivatives:miss:{}:{}"
+
+
+def _variant_ext(name: str, webp: bool) -> str:
+    if webp:
+        return "webp"
+    return "jpg" if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg") else "png"
+
+
+def derivative_name(name: str, size: str, webp: bool = False) -> str:
+    """Storage name of a derivative of the original ``name``."""
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, DERIVED_DIR, f"{filename}.{size}.{_variant_ext(name, webp)}")
+
+
+def _miss_key(field_file) -> str:
+    return MISS_KEY.format(getattr(field_file.storage, "location", ""), field_file.name)
+
+
+def _encode(image, ext: str) -> bytes:
+    out = BytesIO()
+    if ext == "webp":
+        image.save(out, "WEBP", quality=conf.IMAGE_DERIVATIVE_QUALITY, method=4)
+    elif ext == "jpg":
+        image.convert("RGB").save(out, "JPEG", quality=conf.IMAGE_DERIVATIVE_QUALITY, optimize=True)
+    else:
+        image.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def generate_derivatives(field_file) -> Dict[str, str]:
+    """Write every size/format derivative for an ImageField file. Returns {variant: name}."""
+    from PIL import Image, ImageOps
+
+    storage = field_file.storage
+    written = {}
+    with field_file.open("rb") as f:
+        original = Image.open(f)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+    if original.mode not in ("RGB", "RGBA", "L", "LA"):
+        original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    for size, max_px in conf.IMAGE_DERIVATIVE_SIZES.items():
+        resized = original.copy()
+        # thumbnail() never upscales, so small screenshots are stored as-is
+        resized.thumbnail((max_px, max_px), Image.LANCZOS)
+        for webp in (False, True):
+            name = derivative_name(field_file.name, size, webp)
+            if storage.exists(name):
+                storage.delete(name)
+            saved = storage.save(name, ContentFile(_encode(resized, _variant_ext(field_file.name, webp))))
+            written[f"{size}.webp" if webp else size] = saved
+    cache.delete(_miss_key(field_file))
+    return written
+
+
+def derivative(field_file, size: str, webp: bool = False) -> str:
+    """
+    Return the storage name of a derivative, generating all derivatives on first
+    use. Falls back to the original name if the image cannot be processed.
+    """
+    if not field_file or size not in conf.IMAGE_DERIVATIVE_SIZES:
+        return field_file.name if field_file else ""
+    name = derivative_name(field_file.name, size, webp)
+    storage = field_file.storage
+    if storage.exists(name):
+        return name
+    miss_key = _miss_key(field_file)
+    if cache.get(miss_key):
+        return field_file.name
+    try:
+        generate_derivatives(field_file)
+    except FileNotFoundError:
+        logger.warning("Original image %s is missing; serving it without derivatives", field_file.name)
+        cache.set(miss_key, True, conf.IMAGE_DERIVATIVE_MISS_SECONDS)
+        return field_file.name
+    except Exception:
+        logger.warning("Could not build derivatives for %s", field_file.name, exc_info=True)
+        cache.set(miss_key, True, conf.IMAGE_DERIVATIVE_MISS_SECONDS)
+        return field_file.name
+    return name if storage.exists(name) else field_file.name
+
+
+def derivative_url(field_file, size: str, webp: bool = False) -> str:
+    if not field_file:
+        return ""
+    return field_file.storage.url(derivative(field_file, size, webp))
+
+
+def derivative_path(field_file, size: str) -> str:
+    """Filesystem path of the PNG/JPEG derivative (python-docx cannot embed WebP)."""
+    return field_file.storage.path(derivative(field_file, size))
+
+
+def delete_derivatives(name: str, storage) -> None:
+    for size in conf.IMAGE_DERIVATIVE_SIZES:
+        for webp in (False, True):
+            try:
+                storage.delete(derivative_name(name, size, webp))
+            except Exception:
+                pass
@@ -0,0 +1,49 @@
+"""
+Keyset ("cursor") pagination.
+
+Pages are ordered by ``(<field>, pk)`` — ascending, or descending when the
+ordering is given as ``-<field>`` — and the cursor encodes the last row's
+``(field, pk)``, so fetching any page is one indexed range query, however deep
+the caller has scrolled, and rows edited meanwhile are neither skipped nor
+repeated within the snapshot the cursor describes.
+"""
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(obj, field: str) -> str:
+    value = getattr(obj, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f"{value}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, model_field) -> Tuple[Any, int]:
+    """Raises ValueError for anything encode_cursor did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, pk = raw.split("|")
+        return model_field.to_python(value), int(pk)
+    except (TypeError, ValueError, ValidationError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def cursor_page(queryset, cursor: Optional[str], size: int, ordering: str) -> Tuple[List, Optional[str]]:
+    """Return ``(rows, next_cursor)``; ``next_cursor`` is None on the last page."""
+    descending = ordering.startswith("-")
+    field = ordering.lstrip("-")
+    queryset = queryset.order_by(ordering, "-pk" if descending else "pk")
+    if cursor:
+        value, pk = decode_cursor(cursor, queryset.model._meta.get_field(field))
+        after = "lt" if descending else "gt"
+        queryset = queryset.filter(Q(**{f"{field}__{after}": value}) | Q(**{field: value, f"pk__{after}": pk}))
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1], field)
@@ -0,0 +1,271 @@
+"""
+Persistent cache of rasterised PDF pages used when embedding StepFile PDFs in
+Word exports.
+
+Pages are rendered with PyMuPDF and stored as PNG or JPEG files under
+PDF_PAGE_CACHE_DIR/<key>/, where the key hashes the file path, mtime, size and
+raster options (DPI, format, JPEG quality), so a replaced file is picked up
+automatically. Large documents are split into page chunks rendered across a
+process pool, and ``iter_pdf_pages`` yields each page as soon as its chunk is
+done so callers never hold the whole document in memory. The cache is warmed
+when a PDF is uploaded (and by the ``warm_pdf_page_cache`` command) and kept
+under PDF_PAGE_CACHE_MAX_BYTES by evicting the least recently used documents.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+
+from .. import conf
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+RASTER_FORMATS = ("png", "jpeg")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def raster_options(dpi=None, fmt=None, quality=None) -> dict:
+    """Normalise raster options from request parameters, falling back to conf defaults."""
+    try:
+        dpi = int(dpi) if dpi not in (None, "") else conf.PDF_RASTER_DPI
+    except (TypeError, ValueError):
+        dpi = conf.PDF_RASTER_DPI
+    fmt = (fmt or conf.PDF_RASTER_FORMAT).lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in RASTER_FORMATS:
+        fmt = conf.PDF_RASTER_FORMAT
+    try:
+        quality = int(quality) if quality not in (None, "") else conf.PDF_RASTER_JPEG_QUALITY
+    except (TypeError, ValueError):
+        quality = conf.PDF_RASTER_JPEG_QUALITY
+    return {
+        "dpi": min(max(dpi, 50), 300),
+        "fmt": fmt,
+        # Quality only affects JPEG; pin it for PNG so it does not split the cache
+        "quality": min(max(quality, 30), 95) if fmt == "jpeg" else 0,
+    }
+
+
+def _cache_key(pdf_path: str, options: dict) -> str:
+    st = os.stat(pdf_path)
+    raw = (
+        f"{os.path.abspath(pdf_path)}|{st.st_mtime_ns}|{st.st_size}|"
+        f"{options['dpi']}|{options['fmt']}|{options['quality']}"
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:40]
+
+
+def _entry_dir(key: str) -> str:
+    return os.path.join(conf.PDF_PAGE_CACHE_DIR, key)
+
+
+def cached_page_paths(pdf_path: str, **options) -> Optional[List[str]]:
+    """Return the cached page image paths for a PDF, or None on a cache miss."""
+    try:
+        entry = _entry_dir(_cache_key(pdf_path, raster_options(**options)))
+        manifest_path = os.path.join(entry, MANIFEST)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            pages = json.load(f)["pages"]
+        # Touch so eviction treats this entry as recently used
+        os.utime(manifest_path, None)
+    except (OSError, ValueError, KeyError):
+        return None
+    return [os.path.join(entry, name) for name in pages]
+
+
+def _render_chunk(pdf_path: str, out_dir: str, start: int, stop: int, dpi: int, fmt: str, quality: int) -> List[str]:
+    """Render pages [start, stop) into ``out_dir``. Runs in a pool worker."""
+    import fitz  # PyMuPDF
+
+    zoom = dpi / 72.0
+    ext = "jpg" if fmt == "jpeg" else "png"
+    names = []
+    doc = fitz.open(pdf_path)
+    try:
+        for index in range(start, stop):
+            pix = doc[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            name = f"page-{index + 1:04d}.{ext}"
+            if fmt == "jpeg":
+                pix.save(os.path.join(out_dir, name), jpg_quality=quality)
+            else:
+                pix.save(os.path.join(out_dir, name))
+            names.append(name)
+    finally:
+        doc.close()
+    return names
+
+
+def _page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if conf.PDF_RASTER_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=conf.PDF_RASTER_WORKERS)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _rasterise(pdf_path: str, out_dir: str, options: dict) -> Iterator[str]:
+    """Yield page file names in order, rendering chunks in parallel for large documents."""
+    count = _page_count(pdf_path)
+    args = (options["dpi"], options["fmt"], options["quality"])
+    pool = _get_pool() if count >= conf.PDF_RASTER_PARALLEL_MIN_PAGES else None
+    if pool is None:
+        for index in range(count):
+            yield from _render_chunk(pdf_path, out_dir, index, index + 1, *args)
+        return
+
+    size = max(1, conf.PDF_RASTER_CHUNK_PAGES)
+    chunks = [(start, min(start + size, count)) for start in range(0, count, size)]
+    try:
+        futures = [pool.submit(_render_chunk, pdf_path, out_dir, start, stop, *args) for start, stop in chunks]
+    except (BrokenProcessPool, RuntimeError):
+        _reset_pool()
+        futures = None
+    if futures is None:
+        yield from _render_chunk(pdf_path, out_dir, 0, count, *args)
+        return
+    try:
+        for (start, stop), future in zip(chunks, futures):
+            try:
+                names = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge sheet); finish this chunk here
+                _reset_pool()
+                names = _render_chunk(pdf_path, out_dir, start, stop, *args)
+            yield from names
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def iter_pdf_pages(pdf_path: str, **options) -> Iterator[str]:
+    """
+    Yield image paths for every page of ``pdf_path`` in order.
+
+    Cache hits yield straight from disk. On a miss pages are yielded while the
+    document is still being rendered; each path is only valid until the next
+    page is requested, after which the finished set is committed to the cache.
+    Yields nothing if the PDF cannot be rendered.
+    """
+    options = raster_options(**options)
+    pages = cached_page_paths(pdf_path, **options)
+    if pages is not None:
+        yield from pages
+        return
+
+    try:
+        key = _cache_key(pdf_path, options)
+        os.makedirs(conf.PDF_PAGE_CACHE_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=conf.PDF_PAGE_CACHE_DIR, prefix=".tmp-")
+    except OSError:
+        logger.exception("Could not prepare page cache for %s", pdf_path)
+        return
+
+    committed = False
+    try:
+        names = []
+        try:
+            for name in _rasterise(pdf_path, tmp_dir, options):
+                names.append(name)
+                yield os.path.join(tmp_dir, name)
+        except Exception:
+            logger.exception("Could not rasterise %s", pdf_path)
+            return
+        with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.abspath(pdf_path), "options": options, "pages": names}, f)
+        try:
+            os.replace(tmp_dir, _entry_dir(key))
+            committed = True
+        except OSError:
+            # Another worker finished the same document first; keep its copy
+            pass
+    finally:
+        if not committed:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    evict_pdf_pages()
+
+
+def render_pdf_pages(pdf_path: str, **options) -> List[str]:
+    """Render (or fetch) all pages and return their cached paths; empty on failure."""
+    for _path in iter_pdf_pages(pdf_path, **options):
+        pass
+    return cached_page_paths(pdf_path, **options) or []
+
+
+def warm_pdf_pages_async(pdf_path: str, **options) -> threading.Thread:
+    """Render a newly uploaded PDF in the background so the upload returns immediately."""
+    thread = threading.Thread(target=render_pdf_pages, args=(pdf_path,), kwargs=options, daemon=True)
+    thread.start()
+    return thread
+
+
+def discard_pdf_pages(pdf_path: str, **options) -> None:
+    try:
+        shutil.rmtree(_entry_dir(_cache_key(pdf_path, raster_options(**options))), ignore_errors=True)
+    except OSError:
+        pass
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+def evict_pdf_pages(max_bytes: Optional[int] = None) -> int:
+    """Drop least-recently-used documents until the cache fits in ``max_bytes``."""
+    max_bytes = conf.PDF_PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = conf.PDF_PAGE_CACHE_DIR
+    if not os.path.isdir(root):
+        return 0
+    entries = []
+    total = 0
+    for key in os.listdir(root):
+        entry = os.path.join(root, key)
+        manifest_path = os.path.join(entry, MANIFEST)
+        if key.startswith(".") or not os.path.isfile(manifest_path):
+            continue
+        size = _dir_size(entry)
+        entries.append((os.path.getmtime(manifest_path), size, entry))
+        total += size
+    removed = 0
+    for _mtime, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
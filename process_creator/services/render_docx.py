@@ -0,0 +1,411 @@
+"""
+Word (.docx) backend for the document model in services/document.py.
+
+Builds python-docx documents from ProcessDoc / JobDoc trees. Substep images are
+placed in a bordered single-cell table with the bullet text as caption; images
+not tied to a bullet follow the step details.
+"""
+import os
+import re
+from io import BytesIO
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.shared import OxmlElement, qn
+from docx.shared import Inches, Pt
+
+from .pdf_pages import iter_pdf_pages
+
+TIMESTAMP_FORMAT = '%B %d, %Y at %I:%M %p'
+
+
+def add_markdown_to_word_doc(doc, text, level=1):
+    """Add Markdown-formatted text to a Word document with proper formatting"""
+    if not text:
+        return
+
+    lines = text.split('\n')
+    i = 0
+
+    while i < len(lines):
+        line = lines[i].strip()
+
+        if not line:
+            i += 1
+            continue
+
+        # Handle headers
+        if line.startswith('# '):
+            heading = doc.add_heading(line[2:], level=level)
+            heading.paragraph_format.space_after = Inches(0.1)
+        elif line.startswith('## '):
+            heading = doc.add_heading(line[3:], level=level + 1)
+            heading.paragraph_format.space_after = Inches(0.1)
+        elif line.startswith('### '):
+            heading = doc.add_heading(line[4:], level=level + 2)
+            heading.paragraph_format.space_after = Inches(0.1)
+
+        # Handle bullet points
+        elif line.startswith('- ') or line.startswith('* '):
+            # Collect all consecutive bullet points
+            bullet_items = []
+            while i < len(lines) and (lines[i].strip().startswith('- ') or lines[i].strip().startswith('* ')):
+                bullet_text = lines[i].strip()[2:].strip()
+                # Handle bold text in bullets
+                bullet_text = re.sub(r'\*\*(.+?)\*\*', r'\1', bullet_text)
+                bullet_items.append(bullet_text)
+                i += 1
+            i -= 1  # Back up one since we'll increment at the end
+
+            # Add bullet list
+            for item in bullet_items:
+                p = doc.add_paragraph(item, style='List Bullet')
+                p.paragraph_format.space_after = Inches(0.05)
+                p.paragraph_format.line_spacing = 1.15
+
+        # Handle numbered lists
+        elif re.match(r'^\d+\. ', line):
+            # Collect all consecutive numbered items
+            numbered_items = []
+            while i < len(lines) and re.match(r'^\d+\. ', lines[i].strip()):
+                item_text = re.sub(r'^\d+\. ', '', lines[i].strip())
+                # Handle bold text in numbered items
+                item_text = re.sub(r'\*\*(.+?)\*\*', r'\1', item_text)
+                numbered_items.append(item_text)
+                i += 1
+            i -= 1  # Back up one since we'll increment at the end
+
+            # Add numbered list
+            for item in numbered_items:
+                p = doc.add_paragraph(item, style='List Number')
+                p.paragraph_format.space_after = Inches(0.05)
+                p.paragraph_format.line_spacing = 1.15
+
+        # Handle regular paragraphs
+        else:
+            # Handle bold text
+            paragraph_text = re.sub(r'\*\*(.+?)\*\*', r'\1', line)
+
+            # Check if this is part of a multi-line paragraph
+            if i + 1 < len(lines) and lines[i + 1].strip() and not lines[i + 1].strip().startswith(('#', '-', '*')) and not re.match(r'^\d+\. ', lines[i + 1].strip()):
+                # Collect the full paragraph
+                full_paragraph = [line]
+                i += 1
+                while i < len(lines) and lines[i].strip() and not lines[i].strip().startswith(('#', '-', '*')) and not re.match(r'^\d+\. ', lines[i].strip()):
+                    full_paragraph.append(lines[i].strip())
+                    i += 1
+                i -= 1  # Back up one since we'll increment at the end
+                paragraph_text = ' '.join(full_paragraph)
+
+            p = doc.add_paragraph(paragraph_text)
+            p.paragraph_format.space_after = Inches(0.1)
+            p.paragraph_format.line_spacing = 1.15
+
+        i += 1
+
+
+def new_document(title_text):
+    """Create a Document with the blank-first-page workarounds and a centered title."""
+    doc = Document()
+    # Remove default empty first paragraph to avoid accidental blank first page
+    try:
+        if len(doc.paragraphs) and not doc.paragraphs[0].text.strip():
+            p = doc.paragraphs[0]
+            p._element.getparent().remove(p._element)
+    except Exception:
+        pass
+    # Normalize section settings to avoid leading blank due to odd-page starts
+    try:
+        from docx.enum.section import WD_SECTION_START
+        for section in doc.sections:
+            section.start_type = WD_SECTION_START.NEW_PAGE
+            section.different_first_page_header_footer = False
+    except Exception:
+        pass
+
+    # Add title without forcing a title-page behavior
+    title = doc.add_paragraph(title_text, style='Heading 1')
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    try:
+        title.paragraph_format.page_break_before = False
+    except Exception:
+        pass
+    return doc
+
+
+def save_document(doc) -> bytes:
+    doc_io = BytesIO()
+    # Ensure doc starts content immediately (avoid stray leading section break)
+    doc.settings.odd_and_even_pages_header_footer = False
+    doc.save(doc_io)
+    return doc_io.getvalue()
+
+
+def _set_cell_border(cell, size, color):
+    tcPr = cell._tc.get_or_add_tcPr()
+    tcBorders = OxmlElement('w:tcBorders')
+    for border_name in ['top', 'left', 'bottom', 'right']:
+        border = OxmlElement(f'w:{border_name}')
+        border.set(qn('w:val'), 'single')
+        border.set(qn('w:sz'), size)
+        border.set(qn('w:space'), '0')
+        border.set(qn('w:color'), color)
+        tcBorders.append(border)
+    tcPr.append(tcBorders)
+
+
+def add_boxed_image(doc, image, caption=None):
+    """Add an image in a bordered single-cell table, optionally captioned underneath."""
+    if not image.exists:
+        return
+    table = doc.add_table(rows=1, cols=1)
+    table.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    cell = table.cell(0, 0)
+    cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
+    paragraph = cell.paragraphs[0]
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    if caption is None:
+        paragraph.add_run().add_picture(image.path, width=Inches(6))
+        _set_cell_border(cell, '12', '333333')
+        return
+
+    paragraph.paragraph_format.keep_with_next = True
+    paragraph.add_run().add_picture(image.path, width=Inches(6))
+    # Caption paragraph (bullet text beneath image)
+    cap = cell.add_paragraph(caption)
+    cap.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    cap.paragraph_format.space_before = Pt(6)
+    cap.paragraph_format.line_spacing = 1.15
+    cap.paragraph_format.keep_together = True
+    cap.paragraph_format.keep_with_next = False
+    # Prevent table row from splitting across pages
+    trPr = table.rows[0]._tr.get_or_add_trPr()
+    trPr.append(OxmlElement('w:cantSplit'))
+    # Slightly larger font for visibility
+    for r in cap.runs:
+        r.font.size = Pt(12)
+    _set_cell_border(cell, '8', 'CCCCCC')
+
+
+def _add_text(doc, text, space_after=0.1):
+    p = doc.add_paragraph(text)
+    p.paragraph_format.space_after = Inches(space_after)
+    p.paragraph_format.line_spacing = 1.15
+    return p
+
+
+def add_pdf_pages(doc, pdf_files, heading_level, raster=None):
+    """Embed PDF attachments as page images under a 'PDF Documents' heading."""
+    if not pdf_files:
+        return
+    doc.add_heading('PDF Documents', level=heading_level)
+    for pdf_file in pdf_files:
+        try:
+            if os.path.exists(pdf_file.path):
+                # Pages stream in one at a time as they are rendered
+                added = False
+                for img_path in iter_pdf_pages(pdf_file.path, **(raster or {})):
+                    p = doc.add_paragraph()
+                    r = p.add_run()
+                    r.add_picture(img_path, width=Inches(6))
+                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                    added = True
+                if not added:
+                    # Fallback: show filename if rendering unavailable
+                    doc.add_paragraph(f"PDF: {pdf_file.name}")
+        except Exception:
+            # If anything fails, add a reference
+            doc.add_paragraph(f"PDF: {pdf_file.name}")
+
+
+def add_step_body(doc, step, show_attachments):
+    """Render step lines; with attachments, bullets become captions under their images."""
+    for line in step.lines:
+        if line.is_bullet and show_attachments and line.images:
+            for image in line.images:
+                try:
+                    add_boxed_image(doc, image, caption=line.text)
+                except Exception:
+                    pass
+            continue
+        _add_text(doc, line.raw, space_after=0.05)
+
+    if show_attachments:
+        for image in step.loose_images:
+            try:
+                add_boxed_image(doc, image)
+            except Exception:
+                pass
+
+
+def add_history(doc, pdoc, show_attachments, level):
+    """Add the Process History section (process, step and attachment timestamps)."""
+    doc.add_heading('Process History', level=level)
+
+    history_p = doc.add_paragraph()
+    history_p.add_run('Process: ').bold = True
+    history_p.add_run(
+        f'Created {pdoc.created_at.strftime(TIMESTAMP_FORMAT)}, '
+        f'Last Updated {pdoc.updated_at.strftime(TIMESTAMP_FORMAT)}'
+    )
+
+    if not pdoc.steps:
+        return
+    doc.add_heading('Step History', level=level + 1)
+    for step in pdoc.steps:
+        step_p = doc.add_paragraph()
+        step_p.add_run(f'Step {step.order}: {step.title} - ').bold = True
+        step_p.add_run(
+            f'Created {step.created_at.strftime(TIMESTAMP_FORMAT)}, '
+            f'Updated {step.updated_at.strftime(TIMESTAMP_FORMAT)}'
+        )
+        if not show_attachments:
+            continue
+
+        if step.images:
+            doc.add_heading(f'Images for Step {step.order}', level=level + 2)
+            for img in step.images:
+                img_p = doc.add_paragraph()
+                img_p.add_run(f'Image {img.order}: ').bold = True
+                img_p.add_run(
+                    f'{img.name} - Uploaded {img.created_at.strftime(TIMESTAMP_FORMAT)}, '
+                    f'Updated {img.updated_at.strftime(TIMESTAMP_FORMAT)}'
+                )
+                if img.substep_index is not None:
+                    img_p.add_run(f' (Associated with substep {img.substep_index + 1})')
+
+        if step.files:
+            doc.add_heading(f'Files for Step {step.order}', level=level + 2)
+            for file in step.files:
+                file_p = doc.add_paragraph()
+                file_p.add_run(f'File {file.order}: ').bold = True
+                file_p.add_run(
+                    f'{file.name} - Uploaded {file.created_at.strftime(TIMESTAMP_FORMAT)}, '
+                    f'Updated {file.updated_at.strftime(TIMESTAMP_FORMAT)}'
+                )
+
+        if step.links:
+            doc.add_heading(f'Links for Step {step.order}', level=level + 2)
+            for link in step.links:
+                link_p = doc.add_paragraph()
+                link_p.add_run(f'Link {link.order}: ').bold = True
+                link_p.add_run(
+                    f'{link.title} - Created {link.created_at.strftime(TIMESTAMP_FORMAT)}, '
+                    f'Updated {link.updated_at.strftime(TIMESTAMP_FORMAT)}'
+                )
+
+
+def add_process(doc, pdoc, toggles, level=1, raster=None):
+    """
+    Add one process at heading ``level`` (1 for a single export, 2 inside a
+    bulk report) honoring the show_* toggles.
+    """
+    show_attachments = toggles.get('show_attachments', False)
+
+    if toggles.get('show_summary') and pdoc.summary:
+        doc.add_heading('Summary', level=level)
+        add_markdown_to_word_doc(doc, pdoc.summary, level=level + 1)
+
+    if toggles.get('show_description') and pdoc.description:
+        doc.add_heading('Description', level=level)
+        _add_text(doc, pdoc.description)
+
+    if toggles.get('show_pdfs'):
+        add_pdf_pages(doc, pdoc.pdf_files, heading_level=level, raster=raster)
+
+    # Steps are core content and always included
+    if pdoc.steps:
+        doc.add_heading('Steps', level=level)
+        for step in pdoc.steps:
+            doc.add_heading(f'{step.order}. {step.title}', level=level + 1)
+            add_step_body(doc, step, show_attachments)
+
+    if toggles.get('show_notes') and pdoc.notes:
+        doc.add_heading('Notes', level=level)
+        _add_text(doc, pdoc.notes)
+
+    if toggles.get('show_analysis') and pdoc.analysis:
+        doc.add_heading('Process Analysis', level=level)
+        add_markdown_to_word_doc(doc, pdoc.analysis, level=level + 1)
+
+    add_history(doc, pdoc, show_attachments, level=level)
+
+
+def process_to_docx(pdoc, toggles=None, raster=None) -> bytes:
+    doc = new_document(pdoc.name)
+    add_process(doc, pdoc, toggles or {}, level=1, raster=raster)
+    return save_document(doc)
+
+
+def bulk_to_docx(pdocs, toggles=None, history_data=None, raster=None) -> bytes:
+    doc = new_document('Bulk Process Report')
+    for i, pdoc in enumerate(pdocs, 1):
+        if i > 1:
+            doc.add_page_break()
+        doc.add_heading(f'{i}. {pdoc.name}', level=1)
+        add_process(doc, pdoc, toggles or {}, level=2, raster=raster)
+
+    if history_data:
+        doc.add_page_break()
+        doc.add_heading('History', level=1)
+        for i, history_item in enumerate(history_data, 1):
+            doc.add_heading(f'{i}. {history_item.get("type", "Unknown")} - {history_item.get("date", "")}', level=2)
+            content = history_item.get('content', '')
+            if content:
+                add_markdown_to_word_doc(doc, content, level=3)
+    return save_document(doc)
+
+
+def job_to_docx(jdoc, show_attachments=False) -> bytes:
+    doc = new_document(f"{jdoc.label}: {jdoc.name}")
+    doc.add_paragraph(f"Status: {jdoc.status} — Completion: {jdoc.percent}%")
+
+    if jdoc.steps:
+        doc.add_heading('Steps', level=1)
+    for step in jdoc.steps:
+        doc.add_heading(f'{step.order}. {step.title} — {step.percent}%', level=2)
+        for line in step.lines:
+            if line.is_bullet and show_attachments and line.images:
+                for image in line.images:
+                    try:
+                        add_boxed_image(doc, image, caption=line.text)
+                    except Exception:
+                        pass
+                continue
+            _add_text(doc, line.raw, space_after=0.05)
+
+        # Subtasks as checkboxes
+        for text, done in step.checklist:
+            doc.add_paragraph(f"{'☑' if done else '☐'} {text}")
+
+        # Pasted job images (documentation)
+        for image in step.job_images:
+            try:
+                if image.exists:
+                    doc.add_paragraph().add_run().add_picture(image.path, width=Inches(6))
+            except Exception:
+                pass
+
+        # Step notes: emphasized title + boxed area
+        if step.notes:
+            doc.add_heading('NOTES', level=3)
+            table = doc.add_table(rows=1, cols=1)
+            cell = table.cell(0, 0)
+            try:
+                _set_cell_border(cell, '16', '555555')
+            except Exception:
+                pass
+            cell.text = ''
+            for ln in step.notes.split('\n'):
+                if ln.strip().startswith('- '):
+                    cell.add_paragraph(ln.strip()[2:].strip(), style='List Bullet')
+                else:
+                    cell.add_paragraph(ln)
+
+        if show_attachments:
+            for image in step.loose_images:
+                try:
+                    add_boxed_image(doc, image)
+                except Exception:
+                    pass
+    return save_document(doc)
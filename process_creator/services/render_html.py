@@ -0,0 +1,42 @@
+"""
+HTML backend for the document model, used by the print views and (through
+xhtml2pdf) the PDF exports.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+
+def link_callback(uri, rel):
+    """Resolve static/media URLs to filesystem paths for xhtml2pdf."""
+    if uri.startswith(settings.MEDIA_URL):
+        path = os.path.join(settings.MEDIA_ROOT, uri[len(settings.MEDIA_URL):])
+    elif uri.startswith(settings.STATIC_URL) and getattr(settings, 'STATIC_ROOT', None):
+        path = os.path.join(settings.STATIC_ROOT, uri[len(settings.STATIC_URL):])
+    else:
+        return uri
+    return path if os.path.isfile(path) else uri
+
+
+def process_to_html(pdoc, request=None) -> str:
+    return render_to_string('process_creator/print.html', {'doc': pdoc}, request=request)
+
+
+def bulk_to_html(pdocs, history_data=None, request=None) -> str:
+    return render_to_string('process_creator/bulk_print.html', {
+        'docs': pdocs,
+        'history_data': history_data or [],
+    }, request=request)
+
+
+def job_to_html(jdoc, request=None) -> str:
+    return render_to_string('process_creator/job_print.html', {'doc': jdoc}, request=request)
+
+
+def html_to_pdf(html: str) -> bytes:
+    pdf_io = BytesIO()
+    pisa.CreatePDF(src=html, dest=pdf_io, link_callback=link_callback, encoding='utf-8')
+    return pdf_io.getvalue()
@@ -0,0 +1,81 @@
+"""
+Markdown backend for the document model. Summary and analysis are already
+Markdown and are emitted as-is; images link to the original upload's media URL.
+"""
+
+
+def _heading(level: int, text: str) -> str:
+    return f"{'#' * min(level, 6)} {text}"
+
+
+def _image(image, alt: str) -> str:
+    url = image.full_url or image.url
+    return f"![{alt}]({url})" if url else ''
+
+
+def _step_lines(step, show_attachments):
+    out = []
+    for line in step.lines:
+        out.append(line.raw)
+        if line.is_bullet and show_attachments:
+            out.extend(f"  {_image(image, line.text)}" for image in line.images if image.url)
+    if show_attachments:
+        for image in step.loose_images:
+            if image.url:
+                out.extend(['', _image(image, image.name)])
+    return out
+
+
+def _process_lines(pdoc, toggles, level):
+    show_attachments = toggles.get('show_attachments', False)
+    out = []
+
+    def section(title, body):
+        out.extend(['', _heading(level, title), '', body.strip()])
+
+    if toggles.get('show_summary') and pdoc.summary:
+        section('Summary', pdoc.summary)
+    if toggles.get('show_description') and pdoc.description:
+        section('Description', pdoc.description)
+    if toggles.get('show_pdfs') and pdoc.pdf_files:
+        out.extend(['', _heading(level, 'PDF Documents'), ''])
+        out.extend(f"- [{f.name}]({f.url})" for f in pdoc.pdf_files)
+    if pdoc.steps:
+        out.extend(['', _heading(level, 'Steps')])
+        for step in pdoc.steps:
+            out.extend(['', _heading(level + 1, f"{step.order}. {step.title}"), ''])
+            out.extend(_step_lines(step, show_attachments))
+            if step.links:
+                out.append('')
+                out.extend(f"- [{link.title}]({link.url})" for link in step.links)
+    if toggles.get('show_notes') and pdoc.notes:
+        section('Notes', pdoc.notes)
+    if toggles.get('show_analysis') and pdoc.analysis:
+        section('Process Analysis', pdoc.analysis)
+    return out
+
+
+def process_to_markdown(pdoc, toggles=None) -> str:
+    lines = [_heading(1, pdoc.name)] + _process_lines(pdoc, toggles or {}, level=2)
+    return '\n'.join(lines).strip() + '\n'
+
+
+def bulk_to_markdown(pdocs, toggles=None) -> str:
+    lines = [_heading(1, 'Bulk Process Report')]
+    for i, pdoc in enumerate(pdocs, 1):
+        lines.extend(['', _heading(2, f"{i}. {pdoc.name}")])
+        lines.extend(_process_lines(pdoc, toggles or {}, level=3))
+    return '\n'.join(lines).strip() + '\n'
+
+
+def job_to_markdown(jdoc, show_attachments=False) -> str:
+    lines = [_heading(1, f"{jdoc.label}: {jdoc.name}"), '', f"Status: {jdoc.status} — Completion: {jdoc.percent}%"]
+    for step in jdoc.steps:
+        lines.extend(['', _heading(2, f"{step.order}. {step.title} — {step.percent}%"), ''])
+        lines.extend(_step_lines(step, show_attachments))
+        if step.checklist:
+            lines.append('')
+            lines.extend(f"- [{'x' if done else ' '}] {text}" for text, done in step.checklist)
+        if step.notes:
+            lines.extend(['', '**NOTES**', '', step.notes])
+    return '\n'.join(lines).strip() + '\n'
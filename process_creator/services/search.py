@@ -0,0 +1,277 @@
+"""
+Full-text search across processes, steps, template steps and job steps.
+
+Every indexed object has one SearchDocument row (title + body text). On SQLite
+builds with FTS5, migration 0019 creates an external-content FTS5 table over
+those rows, kept in sync by triggers, and queries are ranked with bm25 and
+highlighted with snippet(). Elsewhere (or with PROCESS_CREATOR_SEARCH_BACKEND
+set to "index") a portable inverted index in SearchPosting is used instead,
+ranked by term weight times inverse document frequency.
+
+Documents are refreshed from the post_save/post_delete signals; code that
+bulk-creates indexed objects calls ``index_objects`` itself, and the
+rebuild_search_index command recreates everything. Migration 0022 indexed
+the rows that existed before search did, writing postings only where there
+is no FTS5 table; run rebuild_search_index after switching the backend.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from .. import conf
+from ..models import Job, JobStep, Process, ProcessTemplate, SearchDocument, SearchPosting, Step, TemplateStep
+
+FTS_TABLE = "process_creator_search_fts"
+# Title matches count this much more than body matches (both backends)
+TITLE_WEIGHT = 5
+SNIPPET_WORDS = 16
+MAX_TERMS = 10
+
+# kind -> (model, object -> (parent id, title, body parts))
+SOURCES = {
+    "process": (Process, lambda p: (p.id, p.name, [p.description, p.summary, p.notes])),
+    "step": (Step, lambda s: (s.process_id, s.title, [s.details])),
+    "template_step": (TemplateStep, lambda s: (s.template_id, s.title, [s.details])),
+    "job_step": (JobStep, lambda s: (s.job_id, s.title, [s.details, s.notes])),
+}
+KINDS = {model: kind for kind, (model, _fields) in SOURCES.items()}
+
+_WORD = re.compile(r"\w+")
+_START, _END = "\x02", "\x03"
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    object_id: int
+    parent_id: int
+    title: str
+    snippet: SafeString
+    score: float
+    url: str = ""
+    context: str = ""
+
+    @property
+    def label(self) -> str:
+        return dict(SearchDocument.KIND_CHOICES)[self.kind]
+
+
+def tokenize(text: str) -> List[str]:
+    return [word[:64] for word in _WORD.findall((text or "").lower())]
+
+
+def fts_table_exists(db_connection) -> bool:
+    with db_connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def fts_enabled() -> bool:
+    """Checked once per database connection (reset when one is opened or migrated)."""
+    if conf.SEARCH_BACKEND == "index" or connection.vendor != "sqlite":
+        return False
+    enabled = getattr(connection, "_search_fts_enabled", None)
+    if enabled is None:
+        enabled = connection._search_fts_enabled = fts_table_exists(connection)
+    return enabled
+
+
+@receiver(connection_created)
+@receiver(post_migrate)
+def _forget_fts_check(sender, **kwargs):
+    db_connection = kwargs.get("connection") or connections[kwargs.get("using", DEFAULT_DB_ALIAS)]
+    db_connection._search_fts_enabled = None
+
+
+def document_fields(kind: str, obj):
+    """``(parent_id, title, body)`` to index for ``obj``."""
+    parent_id, title, parts = SOURCES[kind][1](obj)
+    body = "\n\n".join(part.strip() for part in parts if part and part.strip())
+    return parent_id, title[:255], body
+
+
+def term_weights(title: str, body: str) -> Counter:
+    weights = Counter(tokenize(body))
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    return weights
+
+
+def _document(obj) -> SearchDocument:
+    kind = KINDS[obj._meta.concrete_model]
+    parent_id, title, body = document_fields(kind, obj)
+    return SearchDocument(kind=kind, object_id=obj.pk, parent_id=parent_id, title=title, body=body)
+
+
+def _postings(documents: Iterable[SearchDocument]) -> List[SearchPosting]:
+    postings = []
+    for document in documents:
+        weights = term_weights(document.title, document.body)
+        postings.extend(SearchPosting(document=document, term=term, weight=weight) for term, weight in weights.items())
+    return postings
+
+
+@transaction.atomic
+def index_objects(objects: Iterable, replace: bool = True) -> int:
+    """(Re)index saved processes, steps, template steps or job steps."""
+    documents = [_document(obj) for obj in objects]
+    if replace:
+        ids_by_kind = defaultdict(list)
+        for document in documents:
+            ids_by_kind[document.kind].append(document.object_id)
+        for kind, ids in ids_by_kind.items():
+            SearchDocument.objects.filter(kind=kind, object_id__in=ids).delete()
+    SearchDocument.objects.bulk_create(documents)
+    if not fts_enabled():
+        SearchPosting.objects.bulk_create(_postings(documents), batch_size=1000)
+    return len(documents)
+
+
+def index_object(obj) -> None:
+    index_objects([obj])
+
+
+def remove_object(obj) -> None:
+    SearchDocument.objects.filter(kind=KINDS[obj._meta.concrete_model], object_id=obj.pk).delete()
+
+
+def rebuild_index(batch_size: int = 500, log=None) -> Dict[str, int]:
+    """Drop every document and index all sources again. Returns counts per kind."""
+    counts = {}
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for kind, (model, _fields) in SOURCES.items():
+            counts[kind] = 0
+            batch = []
+            for obj in model.objects.order_by("pk").iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    counts[kind] += index_objects(batch, replace=False)
+                    batch = []
+            counts[kind] += index_objects(batch, replace=False)
+            if log:
+                log(f"Indexed {counts[kind]} {kind.replace('_', ' ')}(s)")
+        if fts_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return counts
+
+
+def _highlight(marked: str) -> SafeString:
+    return mark_safe(escape(marked).replace(_START, "<mark>").replace(_END, "</mark>"))
+
+
+def _fts_search(terms, kinds, limit) -> List[SearchHit]:
+    # Every term must match; the last one also matches as a prefix (search-as-you-type)
+    match = " ".join(f'"{term}"' for term in terms) + "*"
+    sql = (
+        f"SELECT d.kind, d.object_id, d.parent_id, d.title, "
+        f"snippet({FTS_TABLE}, -1, %s, %s, '…', {SNIPPET_WORDS}), bm25({FTS_TABLE}, {TITLE_WEIGHT}.0, 1.0) AS rank "
+        f"FROM {FTS_TABLE} JOIN {SearchDocument._meta.db_table} d ON d.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [_START, _END, match]
+    if kinds:
+        sql += f" AND d.kind IN ({', '.join(['%s'] * len(kinds))})"
+        params.extend(kinds)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    # bm25() is lower-is-better; flip it so scores sort the same way in both backends
+    return [SearchHit(kind, object_id, parent_id, title, _highlight(snippet), -rank)
+            for kind, object_id, parent_id, title, snippet, rank in rows]
+
+
+def _snippet(document: SearchDocument, terms: List[str]) -> SafeString:
+    def matches(word):
+        word = word.lower()
+        return word in terms[:-1] or word.startswith(terms[-1])
+
+    text = document.body or document.title
+    words = text.split()
+    first = next((i for i, word in enumerate(words) if any(matches(w) for w in _WORD.findall(word))), 0)
+    start = max(0, first - SNIPPET_WORDS // 4)
+    window = words[start:start + SNIPPET_WORDS]
+    marked = " ".join(_WORD.sub(lambda m: f"{_START}{m.group(0)}{_END}" if matches(m.group(0)) else m.group(0), word)
+                      for word in window)
+    if start > 0:
+        marked = "…" + marked
+    if start + SNIPPET_WORDS < len(words):
+        marked += "…"
+    return _highlight(marked)
+
+
+def _index_search(terms, kinds, limit) -> List[SearchHit]:
+    total = SearchDocument.objects.count() or 1
+    scores = None
+    for position, term in enumerate(terms):
+        postings = SearchPosting.objects.all()
+        if kinds:
+            postings = postings.filter(document__kind__in=kinds)
+        if position == len(terms) - 1:
+            postings = postings.filter(term__startswith=term)
+        else:
+            postings = postings.filter(term=term)
+        weights = defaultdict(int)
+        for document_id, weight in postings.values_list("document_id", "weight"):
+            weights[document_id] += weight
+        idf = math.log(1 + total / max(1, len(weights)))
+        term_scores = {document_id: weight * idf for document_id, weight in weights.items()}
+        if scores is None:
+            scores = term_scores
+        else:
+            scores = {doc: score + term_scores[doc] for doc, score in scores.items() if doc in term_scores}
+        if not scores:
+            return []
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    documents = SearchDocument.objects.in_bulk([document_id for document_id, _score in ranked])
+    return [
+        SearchHit(doc.kind, doc.object_id, doc.parent_id, doc.title, _snippet(doc, terms), score)
+        for doc, score in ((documents[document_id], score) for document_id, score in ranked)
+    ]
+
+
+def _link(hits: List[SearchHit]) -> None:
+    parents = defaultdict(set)
+    for hit in hits:
+        parents[hit.kind].add(hit.parent_id)
+    process_names = dict(Process.objects.filter(id__in=parents["step"]).values_list("id", "name"))
+    template_names = dict(ProcessTemplate.objects.filter(id__in=parents["template_step"]).values_list("id", "name"))
+    job_names = dict(Job.objects.filter(id__in=parents["job_step"]).values_list("id", "name"))
+    for hit in hits:
+        if hit.kind == "process":
+            hit.url = reverse("process_creator:edit", args=[hit.object_id])
+        elif hit.kind == "step":
+            hit.url = reverse("process_creator:edit", args=[hit.parent_id]) + f"#step-{hit.object_id}"
+            hit.context = process_names.get(hit.parent_id, "")
+        elif hit.kind == "template_step":
+            hit.url = reverse("process_creator:template_detail", args=[hit.parent_id])
+            hit.context = template_names.get(hit.parent_id, "")
+        elif hit.kind == "job_step":
+            hit.url = reverse("process_creator:job_detail", args=[hit.parent_id])
+            hit.context = job_names.get(hit.parent_id, "")
+
+
+def search(query: str, kinds: Optional[List[str]] = None, limit: Optional[int] = None) -> List[SearchHit]:
+    """Ranked hits for ``query``; every word must match, the last as a prefix."""
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return []
+    kinds = [kind for kind in (kinds or []) if kind in SOURCES]
+    limit = limit or conf.SEARCH_RESULTS
+    hits = _fts_search(terms, kinds, limit) if fts_enabled() else _index_search(terms, kinds, limit)
+    _link(hits)
+    return hits
@@ -0,0 +1,42 @@
+"""
+Denormalised per-step counters behind process_stats.
+
+Step.save() keeps ``bullet_count`` and ``details_length`` in line with
+``details``; ``image_count`` is recounted from the StepImage save/delete
+signals. ``backfill`` recomputes all three for existing rows (the
+backfill_step_counters command; migration 0021 carries its own frozen copy).
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_bullets(details: str) -> int:
+    """Lines starting with "-" (substeps), as the editor's pills count them."""
+    return sum(1 for line in (details or "").split("\n") if line.strip().startswith("-"))
+
+
+def image_count_expression(image_model):
+    """Per-step screenshot count, for ``Step.objects.update(image_count=...)``."""
+    counts = (image_model.objects.filter(step=OuterRef("pk")).order_by()
+              .values("step").annotate(n=Count("pk")).values("n")[:1])
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill(steps, image_model, batch_size: int = 500) -> int:
+    """Recompute counters for ``steps`` (a Step queryset). Returns rows whose text counters changed."""
+    steps.update(image_count=image_count_expression(image_model))
+    changed, batch = 0, []
+    for step in steps.only("id", "details", "bullet_count", "details_length").iterator(chunk_size=batch_size):
+        counters = (count_bullets(step.details), len(step.details or ""))
+        if counters == (step.bullet_count, step.details_length):
+            continue
+        step.bullet_count, step.details_length = counters
+        batch.append(step)
+        if len(batch) >= batch_size:
+            changed += len(batch)
+            steps.model.objects.bulk_update(batch, ["bullet_count", "details_length"])
+            batch = []
+    if batch:
+        changed += len(batch)
+        steps.model.objects.bulk_update(batch, ["bullet_count", "details_length"])
+    return changed
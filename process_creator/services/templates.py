@@ -3,6 +3,7 @@ from django.utils import timezone
 from typing import Optional
 
 from ..models import Process, Step, ProcessTemplate, TemplateStep
+from .search import index_objects
 
 
 @transaction.atomic
@@ -51,6 +52,8 @@ def sync_process_to_template(process_id: int) -> ProcessTemplate:
     ]
     if tpl_steps:
         TemplateStep.objects.bulk_create(tpl_steps)
+        # bulk_create sends no post_save, so index the new steps here
+        index_objects(tpl_steps)
 
     return template
 
@@ -2,8 +2,13 @@ from django.db.models.signals import post_save, post_delete
 from django.db import transaction
 from django.dispatch import receiver
 
-from .models import Process, Step
+from .models import Process, Step, StepImage, StepFile, StepLink, JobStep, JobStepImage, TemplateStep
 from .services.templates import sync_process_to_template
+from .services.export_cache import invalidate_process_exports
+from .services.pdf_pages import discard_pdf_pages
+from .services.image_derivatives import delete_derivatives
+from .services.search import index_object, remove_object
+from .services.step_counters import image_count_expression
 
 
 def _queue_sync(process_id: int):
@@ -19,14 +24,101 @@ def _queue_sync(process_id: int):
     transaction.on_commit(_do)
 
 
+def _invalidate_exports(process_id: int):
+    try:
+        invalidate_process_exports(process_id)
+    except Exception:
+        # Cache cleanup must never break CRUD ops; stale keys are unreachable anyway
+        pass
+
+
+def _update_search(instance, deleted=False):
+    try:
+        if deleted:
+            remove_object(instance)
+        else:
+            index_object(instance)
+    except Exception:
+        # A stale search entry is fixed by rebuild_search_index; never fail the save
+        pass
+
+
 @receiver(post_save, sender=Process)
 def process_saved(sender, instance: Process, created, **kwargs):
     _queue_sync(instance.id)
+    _invalidate_exports(instance.id)
+    _update_search(instance)
+
+
+@receiver(post_delete, sender=Process)
+def process_deleted(sender, instance: Process, **kwargs):
+    _invalidate_exports(instance.id)
+    _update_search(instance, deleted=True)
 
 
-@receiver(post_delete, sender=Step)
 @receiver(post_save, sender=Step)
-def step_changed(sender, instance: Step, **kwargs):
+def step_saved(sender, instance: Step, **kwargs):
+    _queue_sync(instance.process_id)
+    _invalidate_exports(instance.process_id)
+    _update_search(instance)
+
+
+@receiver(post_delete, sender=Step)
+def step_deleted(sender, instance: Step, **kwargs):
     _queue_sync(instance.process_id)
+    _invalidate_exports(instance.process_id)
+    _update_search(instance, deleted=True)
+
+
+@receiver(post_save, sender=TemplateStep)
+@receiver(post_save, sender=JobStep)
+def search_source_saved(sender, instance, **kwargs):
+    _update_search(instance)
+
+
+@receiver(post_delete, sender=TemplateStep)
+@receiver(post_delete, sender=JobStep)
+def search_source_deleted(sender, instance, **kwargs):
+    _update_search(instance, deleted=True)
+
+
+@receiver(post_delete, sender=StepImage)
+@receiver(post_save, sender=StepImage)
+@receiver(post_delete, sender=StepFile)
+@receiver(post_save, sender=StepFile)
+@receiver(post_delete, sender=StepLink)
+@receiver(post_save, sender=StepLink)
+def step_attachment_changed(sender, instance, **kwargs):
+    try:
+        process_id = Step.objects.filter(id=instance.step_id).values_list("process_id", flat=True).first()
+    except Exception:
+        process_id = None
+    if process_id:
+        _invalidate_exports(process_id)
+
+
+@receiver(post_delete, sender=StepImage)
+@receiver(post_save, sender=StepImage)
+def step_image_counted(sender, instance: StepImage, created=False, **kwargs):
+    # Saves that only move an image (order, substep) leave the count alone
+    if kwargs.get("signal") is post_save and not created:
+        return
+    Step.objects.filter(id=instance.step_id).update(image_count=image_count_expression(StepImage))
+
+
+@receiver(post_delete, sender=StepFile)
+def step_file_deleted(sender, instance: StepFile, **kwargs):
+    # Drop rasterised pages; entries for replaced files are unreachable and age out
+    try:
+        if instance.file and instance.file.name.lower().endswith(".pdf"):
+            discard_pdf_pages(instance.file.path)
+    except Exception:
+        pass
 
 
+@receiver(post_delete, sender=StepImage)
+@receiver(post_delete, sender=JobStepImage)
+def step_image_deleted(sender, instance, **kwargs):
+    # Thumbnail/medium copies are ours to clean up; the original is left alone as before
+    if instance.image:
+        delete_derivatives(instance.image.name, instance.image.storage)
@@ -2,6 +2,8 @@ from django import template
 import re
 import os
 
+from ..services.image_derivatives import derivative_url
+
 register = template.Library()
 
 @register.filter
@@ -80,4 +82,13 @@ def has_sub_images(step, sub_index):
     try:
         return step.images.filter(substep_index=sub_index).exists()
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+@register.filter
+def derived(image_field, variant):
+    """URL of a resized copy of an uploaded image, e.g. ``img.image|derived:"thumb.webp"``."""
+    size, _, fmt = (variant or '').partition('.')
+    try:
+        return derivative_url(image_field, size, webp=(fmt == 'webp'))
+    except Exception:
+        return getattr(image_field, 'url', '')
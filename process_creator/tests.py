@@ -1,3 +1,1393 @@
-from django.test import TestCase
+import glob
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+from zipfile import ZipFile
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import JsonResponse, QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from rbac.models import AppAccess, Role, RoleAppPermission, UserRole
+
+from . import conf
+from .models import (
+    AIInteraction, AIResponseCache, ExportJob, Job, JobStep, JobSubtask, Module, Process, ProcessTemplate,
+    SearchDocument, SearchPosting, Step, StepImage, StepFile, StepLink,
+)
+from .services import export_jobs, image_derivatives, pdf_pages
+from .services.ai import DEFAULT_MODEL, call_openai_api
+from .services.ai_budget import TRIM_MARKER, count_tokens
+from .services.ai_bulk import build_summary_prompt, latest_summary_snapshot, map_reduce, save_summary, summary_prompt
+from .services.conversions import convert_pending, convert_step_file
+from .services.document import DocImage, build_job_doc, build_process_doc, parse_lines
+from .services.export_data import load_process_tree
+from .services.export_cache import export_fingerprint
+from .services.export_jobs import claim_next_job, enqueue_export, purge_export_jobs, requeue_stale_jobs, run_export_job
+from .services.exports import build_export, selected_process_ids
+from .services.fake_converter import FAKE_CONVERTER
+from .services.render_html import process_to_html
+from .services.render_markdown import process_to_markdown
+from .services.search import fts_enabled, rebuild_index, search
+
+
+def use_temp_media(test_case) -> str:
+    """Point MEDIA_ROOT at a throwaway directory for the rest of the test."""
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    test_case.enterContext(override_settings(MEDIA_ROOT=media_root))
+    return media_root
+
+
+def png_upload(name="shot.png", size=(2000, 1000), color=(200, 30, 30)) -> SimpleUploadedFile:
+    out = BytesIO()
+    Image.new("RGB", size, color).save(out, "PNG")
+    return SimpleUploadedFile(name, out.getvalue(), content_type="image/png")
+
+
+def make_pdf(path, pages=3, label="Page") -> str:
+    import fitz  # PyMuPDF
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    doc = fitz.open()
+    for n in range(pages):
+        doc.new_page(width=200, height=120).insert_text((20, 60), f"{label} {n + 1}")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def use_temp_page_cache(test_case) -> str:
+    """Point the PDF page cache at a throwaway directory for the rest of the test."""
+    cache_dir = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+    test_case.enterContext(mock.patch.object(conf, "PDF_PAGE_CACHE_DIR", cache_dir))
+    return cache_dir
+
+
+class ExportQueryCountTests(TestCase):
+    """The export loader must not issue per-step or per-attachment queries."""
+
+    # process (+module), steps, images, files, links
+    EXPECTED_QUERIES = 5
+
+    def setUp(self):
+        use_temp_media(self)
+        # The images are deliberately missing; their one-off warnings are covered by ImageDerivativeTests
+        self.enterContext(mock.patch.object(image_derivatives.logger, "warning"))
+
+    def _make_process(self, name, steps, images_per_step):
+        process = Process.objects.create(name=name)
+        for s in range(steps):
+            step = Step.objects.create(
+                process=process, order=s + 1, title=f"Step {s + 1}",
+                details="\n".join(f"- bullet {b}" for b in range(images_per_step)),
+            )
+            for i in range(images_per_step):
+                # Files need not exist on disk; missing images are skipped by the renderer
+                StepImage.objects.create(step=step, image=f"process_screenshots/missing-{s}-{i}.png",
+                                         order=i, substep_index=i if i % 2 == 0 else None)
+            StepFile.objects.create(step=step, file=f"process_files/missing-{s}.pdf", order=1)
+            StepLink.objects.create(step=step, title="Ref", url="https://example.com", order=1)
+        return process
+
+    def _params(self, **extra):
+        params = {name: ["true"] for name in ("show_attachments", "show_pdfs", "show_summary")}
+        params.update({key: [str(value)] if not isinstance(value, list) else value for key, value in extra.items()})
+        return MultiValueDict(params)
+
+    def test_process_word_query_count_is_constant(self):
+        small = self._make_process("Small", steps=1, images_per_step=1)
+        large = self._make_process("Large", steps=6, images_per_step=4)
+        for process in (small, large):
+            with self.assertNumQueries(self.EXPECTED_QUERIES):
+                content, _filename, _ctype = build_export("process_word", self._params(), pk=process.pk)
+            self.assertTrue(content.startswith(b"PK"))
+
+    def test_bulk_word_query_count_is_constant(self):
+        small = [self._make_process(f"S{i}", steps=1, images_per_step=1) for i in range(2)]
+        large = [self._make_process(f"L{i}", steps=5, images_per_step=3) for i in range(5)]
+        for processes in (small, large):
+            params = self._params(ids=[str(p.pk) for p in processes])
+            with self.assertNumQueries(self.EXPECTED_QUERIES):
+                build_export("bulk_word", params)
+
+    def test_focused_step_only_loads_that_step(self):
+        process = self._make_process("Focused", steps=3, images_per_step=2)
+        focused = process.steps.all()[1]
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            content, _filename, _ctype = build_export(
+                "process_word", self._params(focused_step=focused.pk), pk=process.pk
+            )
+        self.assertTrue(content.startswith(b"PK"))
+
+
+class ExportCacheTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.enterContext(mock.patch.object(conf, "EXPORT_CACHE_DIR", cache_dir))
+        self.enterContext(mock.patch.object(conf, "EXPORT_CACHE_ENABLED", True))
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.process = Process.objects.create(name="Cached")
+        self.step = Step.objects.create(process=self.process, order=1, title="First", details="- original text")
+        self.url = f"/process-creator/{self.process.id}/markdown/"
+
+    def test_hit_skips_rendering_and_restamps_filename(self):
+        with mock.patch("process_creator.services.exports._timestamp", return_value="20260101-080000"):
+            first = self.client.get(self.url)
+        self.assertIn("20260101-080000.md", first["Content-Disposition"])
+        with mock.patch("process_creator.services.export_cache.build_export") as build, \
+                mock.patch("process_creator.services.exports._timestamp", return_value="20260102-090000"):
+            second = self.client.get(self.url)
+        build.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("20260102-090000.md", second["Content-Disposition"])
+        self.assertNotIn("20260101", second["Content-Disposition"])
+
+    def test_if_none_match_returns_304_until_an_edit(self):
+        etag = self.client.get(self.url)["ETag"]
+        with mock.patch("process_creator.services.export_cache.build_export") as build:
+            unchanged = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        build.assert_not_called()
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged["ETag"], etag)
+
+        self.step.details = "- edited text"
+        self.step.save()
+        edited = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        self.assertNotEqual(edited["ETag"], etag)
+        self.assertIn(b"edited text", edited.content)
+
+    def test_bulk_entries_age_out_instead_of_being_scanned_on_save(self):
+        url = "/process-creator/bulk/markdown/"
+        self.client.get(url, {"ids": [self.process.id]})
+        self.client.get(self.url)
+        bulk_entries = glob.glob(os.path.join(conf.EXPORT_CACHE_DIR, "b-*.bin"))
+        self.assertEqual(len(bulk_entries), 1)
+
+        with mock.patch("json.load") as load:
+            self.step.details = "- edited text"
+            self.step.save()
+        load.assert_not_called()
+        self.assertEqual(glob.glob(os.path.join(conf.EXPORT_CACHE_DIR, f"p{self.process.id}-*.bin")), [])
+        self.assertEqual(glob.glob(os.path.join(conf.EXPORT_CACHE_DIR, "b-*.bin")), bulk_entries)
+
+        self.assertIn(b"edited text", self.client.get(url, {"ids": [self.process.id]}).content)
+
+    def test_fingerprint_tracks_options_and_content(self):
+        params = MultiValueDict()
+        key = export_fingerprint("process_word", params, pk=self.process.pk)
+        self.assertTrue(key.startswith(f"p{self.process.pk}-"))
+        self.assertEqual(export_fingerprint("process_word", params, pk=self.process.pk), key)
+        self.assertNotEqual(export_fingerprint("process_pdf", params, pk=self.process.pk), key)
+        self.assertNotEqual(export_fingerprint("process_word", MultiValueDict({"show_pdfs": ["true"]}),
+                                               pk=self.process.pk), key)
+        StepLink.objects.create(step=self.step, title="Ref", url="https://example.com", order=1)
+        self.assertNotEqual(export_fingerprint("process_word", params, pk=self.process.pk), key)
+
+
+class BulkZipExportTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        module = Module.objects.create(name="Assembly")
+        self.processes = [
+            Process.objects.create(name=name, module=module, order=order, summary=f"{name} summary")
+            for order, name in ((1, "Alpha build"), (2, "Beta check"))
+        ]
+        for process in self.processes:
+            Step.objects.create(process=process, order=1, title="Only step", details="- Do the thing")
+
+    def test_archive_is_streamed_with_one_entry_per_process_and_format(self):
+        ids = [str(p.pk) for p in reversed(self.processes)]
+        response = self.client.get("/process-creator/bulk/zip/", {"ids": ids, "format": ["md", "pdf", "md"],
+                                                                  "show_summary": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertRegex(response["Content-Disposition"], r'^attachment; filename="Assembly-\d{8}-\d{6}\.zip"$')
+
+        chunks = iter(response.streaming_content)
+        first = next(chunks)
+        # The manifest's local header goes out before any process is rendered
+        self.assertTrue(first.startswith(b"PK\x03\x04"))
+        rest = list(chunks)
+        self.assertGreater(len(rest), len(self.processes))
+
+        with ZipFile(BytesIO(first + b"".join(rest))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [
+                "manifest.txt", "01-Alpha-build.md", "01-Alpha-build.pdf", "02-Beta-check.md", "02-Beta-check.pdf",
+            ])
+            self.assertIn("Processes: 2\nFormats: md, pdf\n", archive.read("manifest.txt").decode())
+            markdown = archive.read("01-Alpha-build.md").decode()
+            self.assertTrue(markdown.startswith("# Alpha build\n"))
+            self.assertIn("Alpha build summary", markdown)
+            self.assertTrue(archive.read("02-Beta-check.pdf").startswith(b"%PDF"))
+
+    def test_nothing_to_export_is_rejected_before_streaming(self):
+        response = self.client.get("/process-creator/bulk/zip/")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+        response = self.client.get("/process-creator/bulk/zip/", {"ids": ["999999"]})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportQueueTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        self.enterContext(mock.patch.object(conf, "EXPORT_CACHE_ENABLED", False))
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.process = Process.objects.create(name="Queued")
+        Step.objects.create(process=self.process, order=1, title="First", details="- a bullet")
+
+    def _job(self, **fields):
+        job = enqueue_export("process_word", {}, process=self.process)
+        if fields:
+            ExportJob.objects.filter(id=job.id).update(**fields)
+            job.refresh_from_db()
+        return job
+
+    def test_queue_is_opt_in(self):
+        self.assertFalse(conf.EXPORT_QUEUE_ENABLED)
+
+    def test_claim_takes_oldest_queued_job_once(self):
+        first, second = self._job(), self._job()
+        self._job(status="running")
+        claimed = claim_next_job()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (first.id, "running", 1))
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claim_next_job().id, second.id)
+        self.assertIsNone(claim_next_job())
+
+    def test_stale_running_jobs_are_requeued_or_failed(self):
+        long_ago = timezone.now() - timedelta(seconds=conf.EXPORT_JOB_STALE_AFTER + 60)
+        retry = self._job(status="running", started_at=long_ago, updated_at=long_ago, attempts=1)
+        exhausted = self._job(status="running", started_at=long_ago, updated_at=long_ago,
+                              attempts=conf.EXPORT_JOB_MAX_ATTEMPTS)
+        # Started long ago, but its worker is still checking in
+        alive = self._job(status="running", started_at=long_ago, updated_at=long_ago, attempts=1)
+        export_jobs.touch_running_jobs([alive.id])
+        fresh = self._job(status="running", started_at=timezone.now(), attempts=1)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        statuses = dict(ExportJob.objects.values_list("id", "status"))
+        self.assertEqual([statuses[j.id] for j in (retry, exhausted, alive, fresh)],
+                         ["queued", "failed", "running", "running"])
+
+    def test_worker_requeues_orphans_while_it_runs(self):
+        first = self._job()
+        orphan = self._job()
+        long_ago = timezone.now() - timedelta(seconds=conf.EXPORT_JOB_STALE_AFTER + 60)
+
+        class InlinePool:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def submit(self, fn, job_id):
+                if job_id == first.id:
+                    # Another worker claims the second job and dies mid-render
+                    ExportJob.objects.filter(id=orphan.id).update(status="running", attempts=1, updated_at=long_ago)
+                future = Future()
+                future.set_result(run_export_job(job_id))
+                return future
+
+        self.enterContext(mock.patch.object(export_jobs, "ProcessPoolExecutor", InlinePool))
+        self.enterContext(mock.patch.object(export_jobs, "connections"))
+        self.enterContext(mock.patch.object(conf, "EXPORT_JOB_SWEEP_INTERVAL", 0))
+        logs = []
+        self.assertEqual(export_jobs.run_worker(workers=1, poll_interval=0, once=True, log=logs.append), 2)
+        self.assertEqual(ExportJob.objects.get(id=orphan.id).status, "completed")
+        self.assertIn("Re-queued 1 stale export job(s)", logs)
+
+    def test_run_then_purge(self):
+        job = self._job()
+        self.assertEqual(run_export_job(claim_next_job().id), "completed")
+        job.refresh_from_db()
+        self.assertTrue(job.filename.endswith(".docx"))
+        path = job.result.path
+        self.assertTrue(os.path.exists(path))
+
+        recent = self._job(status="failed", finished_at=timezone.now())
+        self._job()  # queued jobs are never purged
+        ExportJob.objects.filter(id=job.id).update(finished_at=timezone.now() - timedelta(days=10))
+        self.assertEqual(purge_export_jobs(older_than_days=7), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(set(ExportJob.objects.values_list("id", flat=True)) & {job.id, recent.id}, {recent.id})
+        self.assertEqual(ExportJob.objects.count(), 2)
+
+    def test_enqueue_status_download_views(self):
+        bad = self.client.post("/process-creator/exports/enqueue/", {"kind": "process_zip"})
+        self.assertEqual(bad.status_code, 400)
+        empty = self.client.post("/process-creator/exports/enqueue/", {"kind": "bulk_word", "query": ""})
+        self.assertEqual(empty.status_code, 400)
+
+        data = self.client.post("/process-creator/exports/enqueue/", {
+            "kind": "process_word", "process_id": self.process.id, "query": "show_summary=true",
+        }).json()
+        self.assertTrue(data["ok"], data)
+        job = ExportJob.objects.get(id=data["id"])
+        self.assertEqual(job.params, {"show_summary": ["true"]})
+        self.assertEqual(self.client.get(data["status_url"]).json()["status"], "queued")
+
+        run_export_job(claim_next_job().id)
+        status = self.client.get(data["status_url"]).json()
+        self.assertEqual(status["status"], "completed")
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+    def test_client_fallback_cancels_the_queued_job(self):
+        data = self.client.post("/process-creator/exports/enqueue/", {
+            "kind": "process_word", "process_id": self.process.id, "query": "",
+        }).json()
+        cancelled = self.client.post(data["cancel_url"]).json()
+        self.assertEqual(cancelled, {"ok": True, "status": "failed"})
+        self.assertIsNone(claim_next_job())
+        self.assertIn("Cancelled", ExportJob.objects.get(id=data["id"]).error)
+
+        running = self._job(status="running")
+        self.assertFalse(self.client.post(f"/process-creator/exports/{running.id}/cancel/").json()["ok"])
+        self.assertEqual(ExportJob.objects.get(id=running.id).status, "running")
+
+    def test_jobs_are_private_to_their_requester(self):
+        role = Role.objects.create(name="Drafter")
+        RoleAppPermission.objects.create(role=role, app_access=AppAccess.objects.get(app_name="process_creator"))
+        owner, other = (User.objects.create_user(name, password="pw") for name in ("owner", "other"))
+        for user in (owner, other):
+            UserRole.objects.create(user=user, role=role)
+        job = enqueue_export("process_word", {}, process=self.process, user=owner)
+        run_export_job(claim_next_job().id)
+        status_url = f"/process-creator/exports/{job.id}/"
+
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+        self.assertEqual(self.client.get(f"{status_url}download/").status_code, 404)
+        self.assertEqual(self.client.post(f"{status_url}cancel/").status_code, 404)
+
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get(status_url).json()["status"], "completed")
+        self.assertEqual(self.client.get(f"{status_url}download/").status_code, 200)
+        # Staff can look at anyone's job
+        self.client.force_login(User.objects.get(username="admin"))
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+
+
+class PdfPageCacheTests(TestCase):
+    def setUp(self):
+        self.media_root = use_temp_media(self)
+        self.cache_dir = use_temp_page_cache(self)
+        self.pdf = make_pdf(os.path.join(self.media_root, "process_files", "drawing.pdf"))
+
+    def test_pages_are_rendered_once_then_served_from_disk(self):
+        pages = pdf_pages.render_pdf_pages(self.pdf)
+        self.assertEqual([os.path.basename(p) for p in pages], ["page-0001.png", "page-0002.png", "page-0003.png"])
+        self.assertTrue(all(p.startswith(self.cache_dir) and os.path.getsize(p) for p in pages))
+        with mock.patch.object(pdf_pages, "_rasterise") as rasterise:
+            self.assertEqual(list(pdf_pages.iter_pdf_pages(self.pdf)), pages)
+        rasterise.assert_not_called()
+
+    def test_key_follows_file_and_options(self):
+        png = pdf_pages.render_pdf_pages(self.pdf)
+        jpeg = pdf_pages.render_pdf_pages(self.pdf, fmt="jpeg", quality=60)
+        self.assertNotEqual(os.path.dirname(png[0]), os.path.dirname(jpeg[0]))
+        self.assertTrue(jpeg[0].endswith(".jpg"))
+        # Quality only matters for JPEG, so it does not split the PNG entry
+        self.assertEqual(pdf_pages.cached_page_paths(self.pdf, quality=40), png)
+
+        make_pdf(self.pdf, pages=2, label="Revised")
+        os.utime(self.pdf, ns=(0, os.stat(self.pdf).st_mtime_ns + 10**9))
+        self.assertIsNone(pdf_pages.cached_page_paths(self.pdf))
+        self.assertEqual(len(pdf_pages.render_pdf_pages(self.pdf)), 2)
+
+    def test_least_recently_used_documents_are_evicted(self):
+        other = make_pdf(os.path.join(self.media_root, "process_files", "other.pdf"), pages=1)
+        old = os.path.dirname(pdf_pages.render_pdf_pages(self.pdf)[0])
+        new = os.path.dirname(pdf_pages.render_pdf_pages(other)[0])
+        os.utime(os.path.join(old, pdf_pages.MANIFEST), (1, 1))
+        pdf_pages.cached_page_paths(other)  # touched: most recently used
+        size = sum(os.path.getsize(os.path.join(new, name)) for name in os.listdir(new))
+        self.assertEqual(pdf_pages.evict_pdf_pages(max_bytes=size), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+        self.assertEqual(pdf_pages.evict_pdf_pages(max_bytes=0), 1)
+
+    def test_upload_warms_the_cache_in_the_background(self):
+        pdf_pages.warm_pdf_pages_async(self.pdf).join(timeout=30)
+        self.assertEqual(len(pdf_pages.cached_page_paths(self.pdf)), 3)
+
+    def test_second_word_export_reuses_cached_pages(self):
+        step = Step.objects.create(process=Process.objects.create(name="Drawings"), order=1, title="Check")
+        StepFile.objects.create(step=step, file=os.path.relpath(self.pdf, self.media_root))
+        params = MultiValueDict({"show_pdfs": ["true"]})
+        first, _filename, _ctype = build_export("process_word", params, pk=step.process_id)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with mock.patch.object(pdf_pages, "_rasterise") as rasterise:
+            second, _filename, _ctype = build_export("process_word", params, pk=step.process_id)
+        rasterise.assert_not_called()
+        with ZipFile(BytesIO(second)) as docx:
+            images = [name for name in docx.namelist() if name.startswith("word/media/")]
+        self.assertEqual(len(images), 3)
+
+
+class ParallelRasterTests(TestCase):
+    OPTIONS = {"dpi": 72, "fmt": "png", "quality": 0}
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.pdf = make_pdf(os.path.join(self.tmp, "sheets.pdf"), pages=5)
+        for name, value in (("PDF_RASTER_WORKERS", 2), ("PDF_RASTER_PARALLEL_MIN_PAGES", 2), ("PDF_RASTER_CHUNK_PAGES", 2)):
+            self.enterContext(mock.patch.object(conf, name, value))
+        self.addCleanup(pdf_pages._reset_pool)
+
+    def _render(self, label):
+        out_dir = os.path.join(self.tmp, label)
+        os.makedirs(out_dir)
+        names = list(pdf_pages._rasterise(self.pdf, out_dir, self.OPTIONS))
+        return names, [open(os.path.join(out_dir, name), "rb").read() for name in names]
+
+    def test_parallel_output_matches_serial(self):
+        parallel = self._render("parallel")
+        self.assertIsNotNone(pdf_pages._pool)
+        with mock.patch.object(conf, "PDF_RASTER_WORKERS", 1):
+            serial = self._render("serial")
+        self.assertEqual(parallel[0], [f"page-{n:04d}.png" for n in range(1, 6)])
+        self.assertEqual(parallel, serial)
+
+    def test_broken_pool_falls_back_to_serial(self):
+        serial = self._render("serial")
+
+        class DeadPool:
+            def submit(self, *args):
+                raise BrokenProcessPool("worker died")
+
+        with mock.patch.object(pdf_pages, "_get_pool", return_value=DeadPool()):
+            self.assertEqual(self._render("dead"), serial)
+
+        class DyingPool:
+            """Second chunk's worker dies; that chunk is rendered in-process instead."""
+            def __init__(self):
+                self.calls = 0
+
+            def submit(self, fn, *args):
+                self.calls += 1
+                future = Future()
+                if self.calls == 2:
+                    future.set_exception(BrokenProcessPool("worker died"))
+                else:
+                    future.set_result(fn(*args))
+                return future
+
+        with mock.patch.object(pdf_pages, "_get_pool", return_value=DyingPool()):
+            self.assertEqual(self._render("dying"), serial)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        step = Step.objects.create(process=Process.objects.create(name="Shots"), order=1, title="One")
+        self.image = StepImage.objects.create(step=step, image=png_upload())
+
+    def test_sizes_are_generated_once_and_reused(self):
+        field = self.image.image
+        medium = image_derivatives.derivative(field, "medium")
+        self.assertEqual(medium, image_derivatives.derivative_name(field.name, "medium"))
+        for size, max_px in conf.IMAGE_DERIVATIVE_SIZES.items():
+            for webp in (False, True):
+                name = image_derivatives.derivative_name(field.name, size, webp)
+                with field.storage.open(name) as f, Image.open(f) as derived:
+                    self.assertEqual(derived.format, "WEBP" if webp else "PNG")
+                    self.assertEqual(derived.size, (max_px, max_px // 2))
+        with mock.patch.object(image_derivatives, "generate_derivatives") as generate:
+            self.assertEqual(image_derivatives.derivative(field, "thumb", webp=True),
+                             image_derivatives.derivative_name(field.name, "thumb", webp=True))
+        generate.assert_not_called()
+
+    def test_small_images_are_not_upscaled(self):
+        small = StepImage.objects.create(step=self.image.step, image=png_upload("small.png", size=(100, 40)))
+        with small.image.storage.open(image_derivatives.derivative(small.image, "medium")) as f, Image.open(f) as derived:
+            self.assertEqual(derived.size, (100, 40))
+
+    def test_originals_sharing_a_stem_keep_separate_derivatives(self):
+        png = self.image.image
+        jpg = StepImage.objects.create(step=self.image.step, image=png_upload("shot.jpg")).image
+        self.assertEqual(os.path.splitext(png.name)[0], os.path.splitext(jpg.name)[0])
+        png_thumb = image_derivatives.derivative(png, "thumb", webp=True)
+        jpg_thumb = image_derivatives.derivative(jpg, "thumb", webp=True)
+        self.assertNotEqual(png_thumb, jpg_thumb)
+
+        StepImage.objects.get(image=jpg.name).delete()
+        self.assertFalse(jpg.storage.exists(jpg_thumb))
+        self.assertTrue(png.storage.exists(png_thumb))
+        self.assertTrue(png.storage.exists(image_derivatives.derivative_name(png.name, "medium")))
+
+    def test_missing_original_is_logged_once_and_not_retried(self):
+        field = self.image.image
+        field.storage.delete(field.name)
+        with self.assertLogs(image_derivatives.logger, "WARNING") as logs:
+            self.assertEqual(image_derivatives.derivative(field, "medium"), field.name)
+            with mock.patch.object(image_derivatives, "generate_derivatives") as generate:
+                self.assertEqual(image_derivatives.derivative(field, "thumb"), field.name)
+            generate.assert_not_called()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIsNone(logs.records[0].exc_info)
+        self.assertIn("is missing", logs.records[0].getMessage())
+
+
+class DocumentModelTests(TestCase):
+    """Bullet parsing, image matching and job progress in the shared document model."""
+
+    # Body of print.html for _fixture_process() as rendered before the document model (whitespace-normalised).
+    # The one intended change is the "Description" heading the document template now adds.
+    PRE_CHANGE_PRINT_BODY = """
+<h1>Gearbox build</h1>
+<div class="summary-section">
+<h2>Summary</h2>
+<div class="formatted-text"><strong>Summary</strong> text.</div>
+</div>
+<p>Build the gearbox.</p>
+<h2>Steps</h2>
+<ol>
+<li>
+<div class="step-title">Prepare housing</div>
+<div class="step-details">
+<div>Intro line</div>
+<div>- Clean the housing</div>
+<div>- Fit the seal</div>
+<div>Plain middle line</div>
+<div>- Torque bolts to 45 Nm</div>
+</div>
+</li>
+<li>
+<div class="step-title">Inspect</div>
+<div class="step-details">
+<div>Look for leaks.</div>
+</div>
+</li>
+</ol>
+<div class="notes">
+<h2>Notes</h2>
+<p>Keep it clean.</p>
+</div>
+<div class="analysis-section">
+<h2>Process Analysis</h2>
+<div class="formatted-text">Looks fine.</div>
+</div>
+<div class="history-section">
+<h2>Process History</h2>
+<p><strong>Process:</strong> Created January 05, 2026 at 8:30 AM, Last Updated January 05, 2026 at 8:30 AM</p>
+<h3>Step History</h3>
+<p><strong>Step 1: Prepare housing -</strong> Created January 05, 2026 at 8:30 AM, Updated January 05, 2026 at 8:30 AM</p>
+<p><strong>Step 2: Inspect -</strong> Created January 05, 2026 at 8:30 AM, Updated January 05, 2026 at 8:30 AM</p>
+<h4>Files for Step 2</h4>
+<p><strong>File 1:</strong> spec.pdf - Uploaded January 05, 2026 at 8:30 AM, Updated January 05, 2026 at 8:30 AM</p>
+<h4>Links for Step 2</h4>
+<p><strong>Link 1:</strong> Torque table - Created January 05, 2026 at 8:30 AM, Updated January 05, 2026 at 8:30 AM</p>
+</div>
+"""
+
+    # Markdown export arrived with the document model, so this pins its output rather than a pre-change one
+    MARKDOWN_SNAPSHOT = """\
+# Gearbox build
+
+## Summary
+
+**Summary** text.
+
+## Description
+
+Build the gearbox.
+
+## PDF Documents
+
+- [spec.pdf](/media/process_files/{process}/step_{step}/spec.pdf)
+
+## Steps
+
+### 1. Prepare housing
+
+Intro line
+- Clean the housing
+  ![Clean the housing](/media/process_screenshots/fx-1.png)
+- Fit the seal
+Plain middle line
+- Torque bolts to 45 Nm
+  ![Torque bolts to 45 Nm](/media/process_screenshots/fx-2.png)
+
+![fx-4.png](/media/process_screenshots/fx-4.png)
+
+![fx-3.png](/media/process_screenshots/fx-3.png)
+
+### 2. Inspect
+
+Look for leaks.
+
+- [Torque table](https://example.com/torque)
+
+## Notes
+
+Keep it clean.
+
+## Process Analysis
+
+Looks fine.
+"""
+
+    DETAILS = "Intro line\n- Clean the housing\n- Fit the seal\nPlain middle line\n- Torque bolts to 45 Nm"
+
+    def setUp(self):
+        use_temp_media(self)
+
+    def _fixture_process(self):
+        stamp = timezone.make_aware(datetime(2026, 1, 5, 8, 30))
+        process = Process.objects.create(
+            name="Gearbox build", module=Module.objects.create(name="Assembly"), description="Build the gearbox.",
+            summary="**Summary** text.", notes="Keep it clean.", analysis="Looks fine.",
+        )
+        Step.objects.create(process=process, order=1, title="Prepare housing", details=self.DETAILS)
+        inspect = Step.objects.create(process=process, order=2, title="Inspect", details="Look for leaks.")
+        StepFile.objects.create(step=inspect, order=1, file=SimpleUploadedFile("spec.pdf", b"%PDF-1.4 fixture"))
+        StepLink.objects.create(step=inspect, order=1, title="Torque table", url="https://example.com/torque")
+        for model in (Process, Step, StepLink):
+            model.objects.update(created_at=stamp, updated_at=stamp)
+        StepFile.objects.update(uploaded_at=stamp, updated_at=stamp)
+        return process
+
+    def _add_images(self, step):
+        # Bullets 0 and 2, a bullet that no longer exists, and one never tied to a bullet
+        for order, substep_index in ((1, 0), (2, 2), (3, 7), (4, None)):
+            StepImage.objects.create(step=step, order=order, substep_index=substep_index,
+                                     image=png_upload(f"fx-{order}.png", size=(40, 20)))
+
+    def _doc_image(self, name, substep_index):
+        return DocImage(path="", url=f"/media/{name}", name=name, substep_index=substep_index)
+
+    @staticmethod
+    def _body(html):
+        body = html.split("<body>", 1)[1].split("</body>", 1)[0]
+        return [line.strip() for line in body.splitlines() if line.strip()]
+
+    def test_images_attach_to_bullets_by_bullet_index(self):
+        first, third = self._doc_image("first.png", 0), self._doc_image("third.png", 2)
+        lines, loose = parse_lines(self.DETAILS, [third, first])
+        self.assertEqual([line.is_bullet for line in lines], [False, True, True, False, True])
+        self.assertEqual([line.text for line in lines if line.is_bullet],
+                         ["Clean the housing", "Fit the seal", "Torque bolts to 45 Nm"])
+        # Plain lines do not count towards the bullet index
+        self.assertEqual([line.images for line in lines], [[], [first], [], [], [third]])
+        self.assertEqual(loose, [])
+
+    def test_images_of_deleted_bullets_become_loose(self):
+        unindexed = self._doc_image("unindexed.png", None)
+        gone_far, gone_near = self._doc_image("far.png", 9), self._doc_image("near.png", 3)
+        lines, loose = parse_lines("- Only bullet\r\nTrailing note", [gone_far, unindexed, gone_near])
+        self.assertEqual([line.raw for line in lines], ["- Only bullet", "Trailing note"])
+        self.assertTrue(all(not line.images for line in lines))
+        # Unindexed images first, then orphans in bullet order
+        self.assertEqual(loose, [unindexed, gone_near, gone_far])
+        self.assertEqual(parse_lines("", [unindexed]), ([], [unindexed]))
+
+    def test_build_process_doc_matches_images_from_the_tree(self):
+        process = self._fixture_process()
+        self._add_images(process.steps.get(order=1))
+        pdoc = build_process_doc(load_process_tree(process.id))
+        self.assertEqual((pdoc.name, pdoc.module_name), ("Gearbox build", "Assembly"))
+        self.assertEqual([f.name for f in pdoc.pdf_files], ["spec.pdf"])
+        housing, inspect = pdoc.steps
+        self.assertEqual([[image.name for image in line.images] for line in housing.lines],
+                         [[], ["fx-1.png"], [], [], ["fx-2.png"]])
+        self.assertEqual([image.name for image in housing.loose_images], ["fx-4.png", "fx-3.png"])
+        self.assertEqual(len(housing.images), 4)
+        for image in housing.images:
+            self.assertTrue(image.exists)
+            self.assertIn("/_derived/", image.url)
+            self.assertTrue(image.full_url.endswith(image.name))
+        self.assertEqual([link.title for link in inspect.links], ["Torque table"])
+
+    def test_print_html_matches_pre_change_output(self):
+        process = self._fixture_process()
+        html = process_to_html(build_process_doc(load_process_tree(process.id)))
+        expected = self.PRE_CHANGE_PRINT_BODY.strip().splitlines()
+        expected.insert(expected.index("<p>Build the gearbox.</p>"), "<h2>Description</h2>")
+        self.assertEqual(self._body(html), expected)
+
+    def test_print_html_places_bullet_and_loose_images(self):
+        process = self._fixture_process()
+        self._add_images(process.steps.get(order=1))
+        body = self._body(process_to_html(build_process_doc(load_process_tree(process.id))))
+        images = [line for line in body if line.startswith("<img ")]
+        self.assertEqual(len(images), 4)
+        self.assertIn('alt="Step 1: Clean the housing"', images[0])
+        self.assertIn('alt="Step 1: Torque bolts to 45 Nm"', images[1])
+        self.assertEqual(body[body.index("<div>- Clean the housing</div>") + 2], images[0])
+        self.assertEqual(body[body.index("<div>- Torque bolts to 45 Nm</div>") + 2], images[1])
+        self.assertIn("fx-4.", images[2])
+        self.assertIn("fx-3.", images[3])
+
+    def test_markdown_output(self):
+        process = self._fixture_process()
+        self._add_images(process.steps.get(order=1))
+        toggles = dict.fromkeys(("show_attachments", "show_pdfs", "show_summary", "show_description",
+                                 "show_notes", "show_analysis"), True)
+        markdown = process_to_markdown(build_process_doc(load_process_tree(process.id)), toggles)
+        expected = self.MARKDOWN_SNAPSHOT.format(process=process.pk, step=process.steps.get(order=2).pk)
+        self.assertEqual(markdown, expected)
+
+    def test_job_percent_from_subtasks_and_status(self):
+        process = self._fixture_process()
+        self._add_images(process.steps.get(order=1))
+        template = ProcessTemplate.objects.create(name="Gearbox", source_process=process)
+        job = Job.objects.create(template=template, name="Unit 7")
+        housing = JobStep.objects.create(job=job, order=1, title="Prepare housing", details=self.DETAILS)
+        for order, completed in ((1, True), (2, True), (3, False)):
+            JobSubtask.objects.create(job_step=housing, order=order, text=f"Task {order}", completed=completed)
+        JobStep.objects.create(job=job, order=2, title="Inspect", status="completed")
+
+        jdoc = build_job_doc(job, "Job")
+        self.assertEqual([step.percent for step in jdoc.steps], [67, 100])
+        # Overall progress counts subtasks once any step has them
+        self.assertEqual(jdoc.percent, 67)
+        self.assertEqual(jdoc.steps[0].checklist, [("Task 1", True), ("Task 2", True), ("Task 3", False)])
+        self.assertEqual([image.name for image in jdoc.steps[0].lines[1].images], ["fx-1.png"])
+        self.assertEqual(jdoc.status, "Not Started")
+
+        JobSubtask.objects.filter(job_step=housing).delete()
+        JobStep.objects.create(job=job, order=3, title="Ship")
+        jdoc = build_job_doc(job, "Job")
+        self.assertEqual([step.percent for step in jdoc.steps], [0, 100, 0])
+        self.assertEqual(jdoc.percent, 33)
+        empty = Job.objects.create(template=template, name="Empty")
+        self.assertEqual(build_job_doc(empty, "Job").percent, 0)
+
+
+class StepFileConversionTests(TestCase):
+    """DWG/IDW uploads return immediately and are converted by the background pool."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, ODA_CONVERTER_PDF=FAKE_CONVERTER)
+        media.enable()
+        self.addCleanup(media.disable)
+        # Keep page rasterising out of the real cache and off a thread that outlives the test
+        self.enterContext(mock.patch.object(conf, "PDF_PAGE_CACHE_DIR", os.path.join(self.media_root, "pdf_pages")))
+        self.warm = self.enterContext(mock.patch("process_creator.services.pdf_pages.warm_pdf_pages_async"))
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.process = Process.objects.create(name="Drawings")
+        self.step = Step.objects.create(process=self.process, order=1, title="Check drawing")
+
+    def _upload(self, content=b"AC1032 drawing", name="part.dwg"):
+        url = f"/process-creator/{self.process.id}/steps/{self.step.id}/files/upload/"
+        # Run the on_commit hook ourselves so the conversion happens synchronously
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            data = self.client.post(url, {"file": SimpleUploadedFile(name, content)}).json()
+        self.assertTrue(data["ok"], data)
+        self.assertEqual(len(callbacks), 1)
+        return data
+
+    def test_upload_returns_converting_row_then_pdf(self):
+        data = self._upload()
+        self.assertEqual(data["status"], "converting")
+        self.assertTrue(data["name"].endswith(".dwg"))
+
+        self.assertEqual(convert_step_file(data["id"]), "ready")
+        status = self.client.get(data["status_url"]).json()
+        self.assertEqual(status["status"], "ready")
+        self.assertTrue(status["name"].endswith(".pdf"))
+        sf = StepFile.objects.get(id=data["id"])
+        self.assertTrue(sf.source.name.endswith(".dwg"))
+        with sf.file.open("rb") as f:
+            self.assertTrue(f.read().startswith(b"%PDF"))
+        self.warm.assert_called_once_with(sf.file.path)
+        # The converter output was moved into storage, not copied
+        leftovers = [n for n in os.listdir(os.path.dirname(sf.file.path)) if n.startswith(".converting-")]
+        self.assertEqual(leftovers, [])
+
+    def test_failed_conversion_retries_then_keeps_original(self):
+        data = self._upload(content=b"FAIL please")
+        with self.assertLogs("process_creator.services.conversions", "WARNING") as logs:
+            for _attempt in range(conf.CONVERSION_MAX_ATTEMPTS - 1):
+                self.assertEqual(convert_step_file(data["id"]), "converting")
+            self.assertEqual(convert_step_file(data["id"]), "failed")
+        self.assertEqual(len(logs.records), conf.CONVERSION_MAX_ATTEMPTS)
+        self.warm.assert_not_called()
+        sf = StepFile.objects.get(id=data["id"])
+        self.assertEqual(sf.conversion_attempts, conf.CONVERSION_MAX_ATTEMPTS)
+        self.assertIn("status 1", sf.conversion_error)
+        self.assertTrue(sf.file.name.endswith(".dwg"))
+
+    def test_pending_conversions_are_finished_by_command_helper(self):
+        data = self._upload()
+        self.assertEqual(convert_pending(stale_after=0), 1)
+        self.assertEqual(StepFile.objects.get(id=data["id"]).status, "ready")
+
+    def test_without_converter_drawing_is_stored_as_is(self):
+        url = f"/process-creator/{self.process.id}/steps/{self.step.id}/files/upload/"
+        with override_settings(INVENTOR_IDW_TO_PDF=""):
+            data = self.client.post(url, {"file": SimpleUploadedFile("sheet.idw", b"idw")}).json()
+        self.assertEqual(data["status"], "ready")
+        self.assertTrue(data["name"].endswith(".idw"))
+
+
+class StubChatClient:
+    """Stands in for openai.OpenAI: records prompts and answers with a numbered reply."""
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, max_tokens, temperature):
+        self.prompts.append(messages[-1]["content"])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"reply {len(self.prompts)}"))],
+            usage=SimpleNamespace(prompt_tokens=30, completion_tokens=12, total_tokens=42),
+        )
+
+
+class AIResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client_stub = StubChatClient()
+
+    def test_identical_prompt_is_served_from_cache(self):
+        first = call_openai_api("Summarise this", client=self.client_stub)
+        second = call_openai_api("Summarise this", client=self.client_stub)
+        self.assertEqual(len(self.client_stub.prompts), 1)
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["content"], "reply 1")
+        self.assertEqual(second["cost"], 0)
+        self.assertEqual(AIResponseCache.objects.get().hits, 1)
+
+    def test_key_includes_model_and_limits(self):
+        call_openai_api("Summarise this", client=self.client_stub)
+        call_openai_api("Summarise this", max_tokens=500, client=self.client_stub)
+        call_openai_api("Summarise this", model="gpt-4o", client=self.client_stub)
+        call_openai_api("Summarise this", temperature=0.2, client=self.client_stub)
+        self.assertEqual(len(self.client_stub.prompts), 4)
+
+    def test_bypass_refreshes_stored_response(self):
+        call_openai_api("Analyse this", client=self.client_stub)
+        refreshed = call_openai_api("Analyse this", use_cache=False, client=self.client_stub)
+        self.assertEqual(refreshed["content"], "reply 2")
+        self.assertEqual(call_openai_api("Analyse this", client=self.client_stub)["content"], "reply 2")
+        self.assertEqual(len(self.client_stub.prompts), 2)
+
+    def test_expired_entries_are_not_served(self):
+        call_openai_api("Analyse this", client=self.client_stub)
+        AIResponseCache.objects.update(created_at=timezone.now() - timedelta(seconds=conf.AI_CACHE_TTL + 1))
+        self.assertFalse(call_openai_api("Analyse this", client=self.client_stub)["cached"])
+        self.assertEqual(AIResponseCache.objects.count(), 1)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append((self.client_address, body["messages"][-1]["content"]))
+        if server.fail_next:
+            server.fail_next -= 1
+            self._reply(500, {"error": {"message": "try again", "type": "server_error"}})
+            return
+        if body.get("stream"):
+            self._stream(body["model"], ["Streamed", " summary"])
+            return
+        self._reply(200, {
+            "id": "chatcmpl-local", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"echo {len(server.requests)}"}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+        })
+
+    def _stream(self, model, pieces):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        base = {"id": "chatcmpl-local", "object": "chat.completion.chunk", "created": 0, "model": model}
+        for piece in pieces:
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        usage = dict(base, choices=[], usage={"prompt_tokens": 20, "completion_tokens": 2, "total_tokens": 22})
+        self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+        self.close_connection = True
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenAIClientTests(TestCase):
+    """The shared client talks to a local OpenAI-compatible stand-in server."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self.server.requests = []
+        self.server.fail_next = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        overrides = override_settings(OPENAI_API_KEY="", OPENAI_BASE_URL=base_url)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_calls_reuse_one_connection(self):
+        for n in range(3):
+            result = call_openai_api(f"prompt {n}", use_cache=False)
+            self.assertTrue(result["success"], result)
+        self.assertEqual(result["content"], "echo 3")
+        self.assertEqual(len({address for address, _prompt in self.server.requests}), 1)
+
+    async def test_summary_stream_sends_tokens_then_saves(self):
+        await AppAccess.objects.acreate(app_name="process_creator", is_enabled=True)
+        user = await sync_to_async(User.objects.create_superuser)("admin", "admin@example.com", "pw")
+        await self.async_client.aforce_login(user)
+        process = await Process.objects.acreate(name="Streamed")
+        await Step.objects.acreate(process=process, order=1, title="Only step")
+        response = await self.async_client.post(f"/process-creator/{process.id}/ai/summary/stream/",
+                                                {"instructions": "Summarise"}, content_type="application/json")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: token\ndata: "Streamed"', body)
+        self.assertIn('event: token\ndata: " summary"', body)
+        self.assertIn("event: done", body)
+        await process.arefresh_from_db()
+        self.assertEqual(process.summary, "Streamed summary")
+        interaction = await AIInteraction.objects.aget(process=process)
+        self.assertEqual(interaction.tokens_used, 22)
+
+    async def test_editor_streams_only_when_served_by_asgi(self):
+        await AppAccess.objects.acreate(app_name="process_creator", is_enabled=True)
+        user = await sync_to_async(User.objects.create_superuser)("admin", "admin@example.com", "pw")
+        process = await Process.objects.acreate(name="Edited")
+        url = f"/process-creator/{process.id}/"
+        await self.async_client.aforce_login(user)
+        self.assertTrue((await self.async_client.get(url)).context["ai_streaming"])
+        await sync_to_async(self.client.force_login)(user)
+        page = await sync_to_async(self.client.get)(url)
+        self.assertFalse(page.context["ai_streaming"])
+        self.assertContains(page, "const AI_STREAMING = false;")
+
+    def test_server_errors_are_retried(self):
+        self.server.fail_next = 1
+        result = call_openai_api("flaky", use_cache=False)
+        self.assertTrue(result["success"], result)
+        self.assertEqual([prompt for _address, prompt in self.server.requests], ["flaky", "flaky"])
+
+
+class BulkMapReduceTests(TestCase):
+    def setUp(self):
+        self.client_stub = StubChatClient()
+        self.processes = []
+        for n in range(3):
+            process = Process.objects.create(name=f"Process {n}", order=n)
+            Step.objects.create(process=process, order=1, title="Only step", details=f"- detail {n}")
+            self.processes.append(process)
+        self.ids = [p.id for p in self.processes]
+
+    def test_each_process_is_summarised_then_reduced(self):
+        result = map_reduce(self.ids, "Combine these", client=self.client_stub)
+        self.assertTrue(result["success"], result)
+        self.assertEqual(len(self.client_stub.prompts), 4)
+        reduce_prompt = self.client_stub.prompts[-1]
+        self.assertTrue(reduce_prompt.startswith("Combine these"))
+        for process in self.processes:
+            process.refresh_from_db()
+            self.assertTrue(process.summary.startswith("reply"))
+            self.assertIn(f"## {process.name}\n{process.summary}", reduce_prompt)
+        self.assertEqual(AIInteraction.objects.filter(interaction_type="summary").count(), 3)
+
+    def test_stored_summaries_are_reused(self):
+        map_reduce(self.ids, "Combine these", client=self.client_stub)
+        again = map_reduce(self.ids, "Combine these", client=self.client_stub)
+        self.assertEqual(again["reused"], 3)
+        self.assertTrue(again["cached"])
+        self.assertEqual(len(self.client_stub.prompts), 4)
+
+        step = self.processes[1].steps.get()
+        step.details = "- changed"
+        step.save()
+        changed = map_reduce(self.ids, "Combine these", client=self.client_stub)
+        self.assertEqual(changed["reused"], 2)
+        self.assertEqual(len(self.client_stub.prompts), 6)
+        self.assertIn("- changed", self.client_stub.prompts[4])
+
+    def test_refresh_and_incremental_are_independent(self):
+        map_reduce(self.ids, "Combine these", client=self.client_stub)
+        # A forced refresh still reuses unchanged summaries; only the reduce call is resent
+        refreshed = map_reduce(self.ids, "Combine these", use_cache=False, client=self.client_stub)
+        self.assertEqual(refreshed["reused"], 3)
+        self.assertEqual(len(self.client_stub.prompts), 5)
+        # Turning incremental off resummarises everything, from the cache where possible
+        full = map_reduce(self.ids, "Combine these", incremental=False, client=self.client_stub)
+        self.assertEqual(full["reused"], 0)
+        self.assertEqual(len(self.client_stub.prompts), 5)
+        full = map_reduce(self.ids, "Combine these", use_cache=False, incremental=False, client=self.client_stub)
+        self.assertEqual(len(self.client_stub.prompts), 9)
+
+
+class TokenBudgetTests(TestCase):
+    def setUp(self):
+        self.client_stub = StubChatClient()
+
+    def test_prompt_and_completion_tokens_are_priced_separately(self):
+        process = Process.objects.create(name="Priced")
+        prompt = build_summary_prompt(process, "Summarise")
+        save_summary(process, prompt, call_openai_api(prompt, client=self.client_stub))
+        interaction = AIInteraction.objects.get()
+        self.assertEqual((interaction.prompt_tokens, interaction.completion_tokens), (30, 12))
+        # gpt-4o-mini: $0.00015 per 1K input, $0.0006 per 1K output
+        self.assertEqual(interaction.cost, Decimal("0.000012"))
+
+    def test_long_step_details_are_trimmed_to_budget(self):
+        process = Process.objects.create(name="Long")
+        Step.objects.create(process=process, order=1, title="Short", details="check the drawing")
+        Step.objects.create(process=process, order=2, title="Long", details="word " * 5000)
+        with mock.patch.object(conf, "AI_PROMPT_TOKEN_BUDGET", 400):
+            prompt = build_summary_prompt(process, "Summarise")
+        self.assertLessEqual(count_tokens(prompt, DEFAULT_MODEL), 400)
+        self.assertIn("Details: check the drawing\n", prompt)
+        self.assertIn(TRIM_MARKER, prompt)
+        # Within budget the prompt is left untouched
+        self.assertNotIn(TRIM_MARKER, build_summary_prompt(process, "Summarise"))
+
+    def test_usage_report(self):
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        process = Process.objects.create(name="Reported")
+        AIInteraction.objects.create(process=process, interaction_type="summary", prompt_sent="p",
+                                     response_received="r", tokens_used=42, prompt_tokens=30,
+                                     completion_tokens=12, cost=Decimal("0.000012"))
+        response = self.client.get("/process-creator/ai/usage/?days=7")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["prompt_tokens"], 30)
+        self.assertEqual(list(response.context["by_process"])[0]["process__name"], "Reported")
+
+
+class IncrementalSummaryTests(TestCase):
+    def setUp(self):
+        self.client_stub = StubChatClient()
+        self.process = Process.objects.create(name="Incremental")
+        for n in range(1, 7):
+            Step.objects.create(process=self.process, order=n, title=f"Step {n}", details=f"detail {n} " * 40)
+
+    def _summarise(self, instructions="Summarise"):
+        snapshot = latest_summary_snapshot(self.process)
+        prompt, snapshot = summary_prompt(self.process, instructions, snapshot)
+        if prompt is not None:
+            save_summary(self.process, prompt, call_openai_api(prompt, client=self.client_stub),
+                         instructions=instructions, snapshot=snapshot)
+        return prompt
+
+    def test_only_changed_steps_are_sent(self):
+        self._summarise()
+        self.assertIn("detail 1", self.client_stub.prompts[0])
+        step = self.process.steps.get(order=3)
+        step.details = "now checked twice"
+        step.save()
+        self.process.steps.get(order=6).delete()
+
+        prompt = self._summarise()
+        self.assertIn("Current Summary:\nreply 1", prompt)
+        self.assertIn("3. Step 3\n   Details: now checked twice", prompt)
+        self.assertIn("Removed Steps:\n- Step 6", prompt)
+        self.assertNotIn("detail 1", prompt)
+        self.assertEqual(self.process.summary, "reply 2")
+
+    def test_unchanged_process_is_not_resent(self):
+        self._summarise()
+        self.assertIsNone(self._summarise())
+        self.assertEqual(len(self.client_stub.prompts), 1)
+
+    def test_new_instructions_resend_every_step(self):
+        self._summarise()
+        prompt = self._summarise("Summarise briefly")
+        self.assertIn("detail 1", prompt)
+        self.assertNotIn("Current Summary", prompt)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.process = Process.objects.create(name="Gearbox assembly", summary="Assemble and inspect the gearbox.")
+        self.step = Step.objects.create(process=self.process, order=1, title="Fasten housing",
+                                        details="Torque the housing bolts to 45 Nm in a star pattern.")
+        Step.objects.create(process=self.process, order=2, title="Inspect seals", details="Check for leaks.")
+
+    def _check_backend(self):
+        hits = search("torque bolts")
+        self.assertEqual([(hit.kind, hit.object_id) for hit in hits], [("step", self.step.id)])
+        self.assertIn("<mark>Torque</mark>", hits[0].snippet)
+        self.assertEqual(hits[0].context, "Gearbox assembly")
+        self.assertTrue(hits[0].url.endswith(f"/process-creator/{self.process.id}/#step-{self.step.id}"))
+        # Last word matches as a prefix; titles outrank bodies
+        self.assertEqual(search("gearb")[0].kind, "process")
+        self.assertEqual(search("gearbox", kinds=["step"]), [])
+
+        self.step.details = "Hand-tighten only."
+        self.step.save()
+        self.assertEqual(search("torque"), [])
+        self.assertEqual(len(search("tighten")), 1)
+        self.step.delete()
+        self.assertEqual(search("tighten"), [])
+
+    def test_fts5_backend(self):
+        self.assertTrue(fts_enabled())
+        self._check_backend()
+
+    def test_inverted_index_backend(self):
+        with mock.patch.object(conf, "SEARCH_BACKEND", "index"):
+            self.assertFalse(fts_enabled())
+            rebuild_index()
+            self.assertTrue(SearchPosting.objects.exists())
+            self._check_backend()
+
+    def test_rebuild_covers_bulk_created_rows(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(search("leaks"), [])
+        counts = rebuild_index()
+        self.assertEqual(counts["step"], 2)
+        self.assertEqual(search("leaks")[0].title, "Inspect seals")
+
+    def test_fts_check_runs_once_per_connection(self):
+        fts_enabled()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(fts_enabled())
+            self.step.save()
+        self.assertFalse([q for q in queries.captured_queries if "sqlite_master" in q["sql"]])
+
+    def test_migration_indexes_existing_rows(self):
+        migration = import_module("process_creator.migrations.0022_backfill_search_index")
+        # The migration decides from the FTS5 table alone, never from settings
+        for has_fts, backend in ((True, "auto"), (False, "index")):
+            with self.subTest(backend=backend), mock.patch.object(conf, "SEARCH_BACKEND", backend), \
+                    mock.patch.object(migration, "fts_table_exists", return_value=has_fts):
+                SearchDocument.objects.all().delete()
+                self.assertEqual(search("leaks"), [])
+                migration.index_existing(django_apps, SimpleNamespace(connection=connection))
+                self.assertEqual(search("leaks")[0].title, "Inspect seals")
+                self.assertEqual(SearchDocument.objects.count(), 3)
+                self.assertEqual(SearchPosting.objects.exists(), not has_fts)
+
+    def test_search_view(self):
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        page = self.client.get("/process-creator/search/", {"q": "seals"})
+        self.assertContains(page, "Inspect seals")
+        data = self.client.get("/process-creator/search/", {"q": "star pattern", "format": "json"}).json()
+        self.assertEqual([hit["id"] for hit in data["results"]], [self.step.id])
+
+
+@mock.patch("process_creator.views.PROCESS_LIST_PAGE_SIZE", 2)
+class ProcessListPaginationTests(TestCase):
+    def setUp(self):
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        # Listed in the user's order, so the last one created comes first
+        self.processes = [Process.objects.create(name=f"Process {n}", order=5 - n) for n in range(5)]
+        Step.objects.create(process=self.processes[-1], order=1, title="One")
+
+    def _listed_ids(self):
+        page = self.client.get("/process-creator/")
+        ids = [p.id for p in page.context["processes"]]
+        cursor = page.context["next_cursor"]
+        while cursor:
+            data = self.client.get("/process-creator/page/", {"cursor": cursor}).json()
+            ids += [int(i) for i in re.findall(r'class="card[^"]*" data-id="(\d+)"', data["html"])]
+            cursor = data["next"]
+        return ids
+
+    def test_pages_cover_every_process_once(self):
+        page = self.client.get("/process-creator/")
+        seen = [p.id for p in page.context["processes"]]
+        self.assertEqual(seen, [p.id for p in reversed(self.processes)][:2])
+        self.assertEqual(page.context["processes"][0].step_count, 1)
+
+        cursor = page.context["next_cursor"]
+        while cursor:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get("/process-creator/page/", {"cursor": cursor}).json()
+            # One query per page however deep: rows, module and counts together
+            self.assertEqual(len([q for q in queries if "process_creator_" in q["sql"]]), 1)
+            seen += [int(i) for i in re.findall(r'class="card[^"]*" data-id="(\d+)"', data["html"])]
+            cursor = data["next"]
+        self.assertEqual(sorted(seen), sorted(p.id for p in self.processes))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/process-creator/page/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        # Well-formed, but not an order value
+        response = self.client.get("/process-creator/page/", {"cursor": "bm90LWEtbnVtYmVyfDE"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reordering_loaded_cards_keeps_unloaded_ones_in_place(self):
+        p0, p1, p2, p3, p4 = self.processes
+        stamps = dict(Process.objects.values_list("id", "updated_at"))
+        # Only the first page is loaded: swap its two cards
+        response = self.client.post("/process-creator/reorder/", {"order[]": [p3.id, p4.id]})
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(self._listed_ids(), [p3.id, p4.id, p2.id, p1.id, p0.id])
+        self.assertEqual(dict(Process.objects.values_list("id", "updated_at")), stamps)
+
+    def test_check_all_is_resolved_on_the_server(self):
+        module = Module.objects.create(name="Assembly")
+        p0, p1, p2, p3, p4 = self.processes
+        Process.objects.filter(id__in=[p1.id, p3.id]).update(module=module)
+        everything = [p4.id, p3.id, p2.id, p1.id, p0.id]
+        self.assertEqual(self.client.get("/process-creator/").context["process_count"], 5)
+        self.assertEqual(self.client.get("/process-creator/", {"module": module.id}).context["process_count"], 2)
+        self.assertEqual(selected_process_ids(QueryDict("all=true")), everything)
+        self.assertEqual(selected_process_ids(QueryDict(f"all=true&module={module.id}")), [p3.id, p1.id])
+        self.assertEqual(selected_process_ids(QueryDict(f"ids={p0.id}")), [str(p0.id)])
+
+        content, _filename, _ctype = build_export("bulk_markdown", QueryDict("all=true"))
+        self.assertEqual(content.decode().count("\n## "), 5)
+        response = self.client.get("/process-creator/bulk/zip/", {"all": "true", "module": module.id, "format": "md"})
+        with ZipFile(BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ["manifest.txt", "01-Process-3.md", "02-Process-1.md"])
+        page = self.client.get("/process-creator/print-all/", {"all": "true", "module": module.id})
+        self.assertEqual([p.id for p in page.context["processes"]], [p3.id, p1.id])
+
+        with mock.patch("process_creator.views._bulk_map_reduce",
+                        return_value=JsonResponse({"success": True})) as bulk:
+            self.client.post("/process-creator/bulk/summary/", {"all": True, "mode": "map_reduce"},
+                             content_type="application/json")
+        self.assertEqual(bulk.call_args.args[0], everything)
+
+    def test_reordering_processes_that_share_an_order_value(self):
+        Process.objects.update(order=1)
+        p0, p1, p2, p3, p4 = self.processes
+        self.assertEqual(self._listed_ids(), [p0.id, p1.id, p2.id, p3.id, p4.id])
+        self.client.post("/process-creator/reorder/", {"order[]": [p2.id, p0.id, p3.id, p1.id, "999999"]})
+        self.assertEqual(self._listed_ids(), [p2.id, p0.id, p3.id, p1.id, p4.id])
+
+
+@mock.patch("process_creator.views.EDITOR_LAZY_STEPS", 2)
+class LazyEditorTests(TestCase):
+    def setUp(self):
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.process = Process.objects.create(name="Long SOP")
+        self.steps = [Step.objects.create(process=self.process, order=n, title=f"Step {n}") for n in range(1, 5)]
+        for step in self.steps:
+            StepLink.objects.create(step=step, title=f"Link for {step.title}", url="https://example.com/")
+
+    def test_long_process_ships_headers_only(self):
+        html = self.client.get(f"/process-creator/{self.process.id}/").content.decode()
+        self.assertEqual(html.count('data-lazy="1"'), 4)
+        self.assertIn('value="Step 4"', html)
+        self.assertNotIn("Link for Step 1", html)
+
+        eager = self.client.get(f"/process-creator/{self.process.id}/", {"lazy": "0"}).content.decode()
+        self.assertNotIn('data-lazy="1"', eager)
+        self.assertIn("Link for Step 1", eager)
+
+    def test_fragments_load_in_one_batch(self):
+        ids = ",".join(str(step.id) for step in self.steps)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f"/process-creator/{self.process.id}/steps/fragments/", {"ids": ids}).json()
+        # Process, steps, then one prefetch each for links, files and images
+        self.assertEqual(len([q for q in queries if "process_creator_" in q["sql"]]), 5)
+        self.assertEqual(sorted(int(i) for i in data["fragments"]), [step.id for step in self.steps])
+        self.assertIn("Link for Step 2", data["fragments"][str(self.steps[1].id)])
+
+        single = self.client.get(f"/process-creator/{self.process.id}/steps/{self.steps[0].id}/fragment/")
+        self.assertContains(single, f'id="links-{self.steps[0].id}"')
+        other = Process.objects.create(name="Other")
+        self.assertEqual(self.client.get(f"/process-creator/{other.id}/steps/{self.steps[0].id}/fragment/").status_code, 404)
+        self.assertEqual(self.client.get(f"/process-creator/{self.process.id}/steps/fragments/", {"ids": "x"}).status_code, 400)
+
+    def test_update_returns_timestamp_for_header(self):
+        data = self.client.post(f"/process-creator/{self.process.id}/steps/{self.steps[0].id}/update/", {"details": "- a"}).json()
+        self.assertTrue(data["ok"])
+        self.assertTrue(data["updated"])
+
+
+class StepCounterTests(TestCase):
+    def setUp(self):
+        AppAccess.objects.create(app_name="process_creator", is_enabled=True)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.process = Process.objects.create(name="Counted", description="abcd")
+        self.first = Step.objects.create(process=self.process, order=1, title="First", details="Intro\n- one\n  - two")
+        self.second = Step.objects.create(process=self.process, order=2, title="Second", details="- three")
+        for n in range(3):
+            StepImage.objects.create(step=self.first, image=f"process_screenshots/missing-counter-{n}.png", order=n + 1)
+
+    def stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f"/process-creator/{self.process.id}/stats/").json()
+        # The process row plus one aggregate over the step counters
+        self.assertEqual(len([q for q in queries if "process_creator_" in q["sql"]]), 2)
+        return data
+
+    def test_counters_follow_edits(self):
+        data = self.stats()
+        self.assertEqual((data["step_count"], data["substep_count"], data["total_steps"]), (2, 3, 5))
+        self.assertEqual(data["image_count"], 3)
+        self.assertEqual(data["step_details_length"], len(self.first.details) + len(self.second.details))
+        self.assertEqual(data["total_text_length"], 4 + data["step_details_length"])
+
+        self.first.images.first().delete()
+        self.second.details = "no bullets"
+        self.second.save(update_fields=["details"])
+        data = self.stats()
+        self.assertEqual((data["substep_count"], data["image_count"]), (2, 2))
+
+    def test_backfill_command(self):
+        Step.objects.update(bullet_count=0, details_length=0, image_count=0)
+        call_command("backfill_step_counters", stdout=StringIO())
+        first = Step.objects.get(pk=self.first.pk)
+        self.assertEqual((first.bullet_count, first.details_length, first.image_count), (2, len(self.first.details), 3))
+        self.assertEqual(self.stats()["substep_count"], 3)
+
+    def test_backfill_migration(self):
+        Step.objects.update(bullet_count=0, details_length=0, image_count=0)
+        migration = import_module("process_creator.migrations.0021_step_counters")
+        migration.backfill_counters(django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual(list(Step.objects.order_by("order").values_list("bullet_count", "details_length", "image_count")),
+                         [(2, len(self.first.details), 3), (1, len(self.second.details), 0)])
@@ -5,6 +5,7 @@ app_name = "process_creator"
 
 urlpatterns = [
     path("", views.process_list, name="list"),
+    path("page/", views.process_list_page, name="list_page"),
     path("create/", views.process_create, name="create"),
     path("<int:pk>/", views.process_edit, name="edit"),
     path("<int:pk>/update/", views.process_update, name="update"),
@@ -13,15 +14,20 @@ urlpatterns = [
     path("<int:pk>/copy/", views.process_copy_prompt, name="copy"),
     path("<int:pk>/pdf/", views.process_pdf, name="pdf"),
     path("<int:pk>/word/", views.process_word, name="word"),
+    path("<int:pk>/markdown/", views.process_markdown, name="markdown"),
     path("<int:pk>/stats/", views.process_stats, name="stats"),
     # AI endpoints
     path("<int:pk>/ai/summary/", views.ai_generate_summary, name="ai_summary"),
     path("<int:pk>/ai/analyze/", views.ai_analyze_process, name="ai_analyze"),
+    path("<int:pk>/ai/summary/stream/", views.ai_summary_stream, name="ai_summary_stream"),
+    path("<int:pk>/ai/analyze/stream/", views.ai_analyze_stream, name="ai_analyze_stream"),
     # AJAX endpoints
     path("reorder/", views.processes_reorder, name="reorder"),
     path("<int:pk>/steps/reorder/", views.steps_reorder, name="steps_reorder"),
     path("<int:pk>/steps/add/", views.step_add, name="step_add"),
     path("<int:pk>/steps/<int:step_id>/insert/<str:direction>/", views.step_insert, name="step_insert"),
+    path("<int:pk>/steps/fragments/", views.step_fragments, name="step_fragments"),
+    path("<int:pk>/steps/<int:step_id>/fragment/", views.step_fragment, name="step_fragment"),
     path("<int:pk>/steps/<int:step_id>/update/", views.step_update, name="step_update"),
     path("<int:pk>/steps/<int:step_id>/delete/", views.step_delete, name="step_delete"),
     path("<int:pk>/steps/<int:step_id>/images/upload/", views.step_image_upload, name="step_image_upload"),
@@ -33,9 +39,12 @@ urlpatterns = [
     path("<int:pk>/steps/<int:step_id>/links/<int:link_id>/delete/", views.step_link_delete, name="step_link_delete"),
     path("<int:pk>/steps/<int:step_id>/files/upload/", views.step_file_upload, name="step_file_upload"),
     path("<int:pk>/steps/<int:step_id>/files/<int:file_id>/delete/", views.step_file_delete, name="step_file_delete"),
+    path("<int:pk>/steps/<int:step_id>/files/<int:file_id>/status/", views.step_file_status, name="step_file_status"),
     path("<int:pk>/steps/<int:step_id>/images/reorder/", views.step_images_reorder, name="step_images_reorder"),
     path("print-all/", views.process_print_all, name="print_all"),
     # Module management
+    path("ai/usage/", views.ai_usage_report, name="ai_usage"),
+    path("search/", views.process_search, name="search"),
     path("modules/", views.module_manage, name="module_manage"),
     path("modules/create/", views.module_create, name="module_create"),
     path("modules/<int:module_id>/update/", views.module_update, name="module_update"),
@@ -45,6 +54,13 @@ urlpatterns = [
     path("bulk/analyze/", views.bulk_analyze, name="bulk_analyze"),
     path("bulk/pdf/", views.bulk_pdf, name="bulk_pdf"),
     path("bulk/word/", views.bulk_word, name="bulk_word"),
+    path("bulk/markdown/", views.bulk_markdown, name="bulk_markdown"),
+    path("bulk/zip/", views.bulk_zip, name="bulk_zip"),
+    # Background exports
+    path("exports/enqueue/", views.export_enqueue, name="export_enqueue"),
+    path("exports/<int:job_id>/", views.export_job_status, name="export_job_status"),
+    path("exports/<int:job_id>/download/", views.export_job_download, name="export_job_download"),
+    path("exports/<int:job_id>/cancel/", views.export_job_cancel, name="export_job_cancel"),
     # Templates
     path("templates/", views.template_list, name="template_list"),
     path("templates/<int:tpl_id>/", views.template_detail, name="template_detail"),
@@ -1,47 +1,76 @@
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import JsonResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404, QueryDict, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.http import require_POST
 from django.db import transaction
 from django.contrib.auth.decorators import login_required
 from rbac.decorators import require_app_access
 from django.db import models
-from django.template.loader import render_to_string
-from django.conf import settings
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
-from .models import Module, Process, Step, StepImage, StepLink, StepFile, AIInteraction, ProcessTemplate, TemplateStep, Job, JobStep, JobSubtask, JobStepImage
-from .conf import JOB_LABEL
+from django.template.defaultfilters import date as format_date
+from django.db.models.functions import Coalesce, TruncDate
+from datetime import timedelta
+from .models import Module, Process, Step, StepImage, StepLink, StepFile, AIInteraction, ProcessTemplate, TemplateStep, Job, JobStep, JobSubtask, JobStepImage, ExportJob, SearchDocument
+from .conf import JOB_LABEL, EXPORT_QUEUE_ENABLED, AI_BULK_MODE, AI_INCREMENTAL_SUMMARY, PROCESS_LIST_PAGE_SIZE, EDITOR_LAZY_STEPS, EDITOR_FRAGMENT_BATCH
 from .services.templates import sync_process_to_template
-from xhtml2pdf import pisa
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from .services.exports import (
+    EXPORT_KINDS, DOCX_CONTENT_TYPE, all_process_ids, read_raster_options, read_toggles, selected_process_ids,
+)
+from .services.export_zip import ZIP_CONTENT_TYPE, iter_zip_export, read_zip_formats, zip_export_plan
+from .services.export_data import load_process_tree
+from .services.document import build_job_doc, build_process_doc
+from .services.render_docx import job_to_docx
+from .services.render_html import html_to_pdf, job_to_html, process_to_html
+from .services.export_jobs import cancel_queued_job, enqueue_export
+from .services.export_cache import cached_build_export, export_fingerprint
+from .services.pdf_pages import warm_pdf_pages_async
+from .services.image_derivatives import derivative_url
+from .services.conversions import converter_command, is_convertible, schedule_conversion
+from .services.ai import DEFAULT_MODEL, ai_configured, call_openai_api
+from .services.ai_budget import fits
+from .services.ai_bulk import (
+    ANALYSIS_MAX_TOKENS, SUMMARY_MAX_TOKENS, build_analysis_prompt, latest_summary_snapshot, map_reduce,
+    save_analysis, save_summary, summary_prompt,
+)
+from .services.ai_stream import replay, stream_completion
+from .services.search import index_objects, search
+from .services.pagination import cursor_page
 import os
 import json
-import openai
 import re
-from decimal import Decimal
-from io import BytesIO
 from urllib.parse import quote
-import subprocess
-import tempfile
 
-# Optional PDF rendering (to embed PDF pages as images in Word)
-def _render_pdf_pages_to_images(pdf_path: str):
-    images = []
-    try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(pdf_path)
-        try:
-            for page in doc:
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
-                img_bytes = pix.tobytes("png")
-                bio = BytesIO(img_bytes)
-                images.append(bio)
-        finally:
-            doc.close()
-    except Exception:
-        return []
-    return images
+
+def _export_response(content, filename, content_type, etag=None):
+    """Wrap rendered export bytes in an attachment response.
+
+    With an ``etag`` the browser may keep the file but must revalidate it;
+    otherwise the response is marked as not storable.
+    """
+    response = HttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
+    if etag:
+        response['ETag'] = quote_etag(etag)
+        response['Cache-Control'] = 'private, no-cache'
+    else:
+        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        response['Pragma'] = 'no-cache'
+        response['Expires'] = '0'
+    return response
+
+
+def _cached_export_response(request, kind, params, pk=None):
+    """Serve an export from the revision-keyed cache, rendering it on a miss."""
+    key = export_fingerprint(kind, params, pk=pk)
+    if quote_etag(key) in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = quote_etag(key)
+        return response
+    content, filename, content_type, key = cached_build_export(kind, params, pk=pk, key=key)
+    return _export_response(content, filename, content_type, etag=key)
 
 
 def markdown_to_plain_text(text):
@@ -73,89 +102,14 @@ def markdown_to_plain_text(text):
     return text.strip()
 
 
-def add_markdown_to_word_doc(doc, text, level=1):
-    """Add Markdown-formatted text to a Word document with proper formatting"""
-    if not text:
-        return
-    
-    lines = text.split('\n')
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if not line:
-            i += 1
-            continue
-            
-        # Handle headers
-        if line.startswith('# '):
-            heading = doc.add_heading(line[2:], level=level)
-            heading.paragraph_format.space_after = Inches(0.1)
-        elif line.startswith('## '):
-            heading = doc.add_heading(line[3:], level=level + 1)
-            heading.paragraph_format.space_after = Inches(0.1)
-        elif line.startswith('### '):
-            heading = doc.add_heading(line[4:], level=level + 2)
-            heading.paragraph_format.space_after = Inches(0.1)
-        
-        # Handle bullet points
-        elif line.startswith('- ') or line.startswith('* '):
-            # Collect all consecutive bullet points
-            bullet_items = []
-            while i < len(lines) and (lines[i].strip().startswith('- ') or lines[i].strip().startswith('* ')):
-                bullet_text = lines[i].strip()[2:].strip()
-                # Handle bold text in bullets
-                bullet_text = re.sub(r'\*\*(.+?)\*\*', r'\1', bullet_text)
-                bullet_items.append(bullet_text)
-                i += 1
-            i -= 1  # Back up one since we'll increment at the end
-            
-            # Add bullet list
-            for item in bullet_items:
-                p = doc.add_paragraph(item, style='List Bullet')
-                p.paragraph_format.space_after = Inches(0.05)
-                p.paragraph_format.line_spacing = 1.15
-        
-        # Handle numbered lists
-        elif re.match(r'^\d+\. ', line):
-            # Collect all consecutive numbered items
-            numbered_items = []
-            while i < len(lines) and re.match(r'^\d+\. ', lines[i].strip()):
-                item_text = re.sub(r'^\d+\. ', '', lines[i].strip())
-                # Handle bold text in numbered items
-                item_text = re.sub(r'\*\*(.+?)\*\*', r'\1', item_text)
-                numbered_items.append(item_text)
-                i += 1
-            i -= 1  # Back up one since we'll increment at the end
-            
-            # Add numbered list
-            for item in numbered_items:
-                p = doc.add_paragraph(item, style='List Number')
-                p.paragraph_format.space_after = Inches(0.05)
-                p.paragraph_format.line_spacing = 1.15
-        
-        # Handle regular paragraphs
-        else:
-            # Handle bold text
-            paragraph_text = re.sub(r'\*\*(.+?)\*\*', r'\1', line)
-            
-            # Check if this is part of a multi-line paragraph
-            if i + 1 < len(lines) and lines[i + 1].strip() and not lines[i + 1].strip().startswith(('#', '-', '*')) and not re.match(r'^\d+\. ', lines[i + 1].strip()):
-                # Collect the full paragraph
-                full_paragraph = [line]
-                i += 1
-                while i < len(lines) and lines[i].strip() and not lines[i].strip().startswith(('#', '-', '*')) and not re.match(r'^\d+\. ', lines[i].strip()):
-                    full_paragraph.append(lines[i].strip())
-                    i += 1
-                i -= 1  # Back up one since we'll increment at the end
-                paragraph_text = ' '.join(full_paragraph)
-            
-            p = doc.add_paragraph(paragraph_text)
-            p.paragraph_format.space_after = Inches(0.1)
-            p.paragraph_format.line_spacing = 1.15
-        
-        i += 1
+def _process_rows(module_id=None):
+    processes = Process.objects.select_related('module').annotate(
+        step_count=models.Count('steps', distinct=True),
+        image_count=models.Count('steps__images', distinct=True),
+    )
+    if module_id:
+        processes = processes.filter(module_id=module_id)
+    return processes
 
 
 @login_required
@@ -169,18 +123,62 @@ def process_list(request):
     selected_module = None
     
     if selected_module_id:
-        try:
-            selected_module = Module.objects.get(id=selected_module_id)
-            processes = Process.objects.filter(module=selected_module).order_by('-updated_at', '-created_at')
-        except Module.DoesNotExist:
-            processes = Process.objects.all().order_by('-updated_at', '-created_at')
-    else:
-        processes = Process.objects.all().order_by('-updated_at', '-created_at')
+        selected_module = Module.objects.filter(id=selected_module_id).first() if selected_module_id.isdigit() else None
+
+    # First page only; the rest is fetched by process_list_page as the user scrolls
+    processes, next_cursor = cursor_page(
+        _process_rows(selected_module.id if selected_module else None), None, PROCESS_LIST_PAGE_SIZE, 'order'
+    )
+    # What "Check All" selects, counting the pages not loaded yet
+    process_count = len(processes)
+    if next_cursor:
+        process_count = Process.objects.filter(module=selected_module).count() if selected_module else Process.objects.count()
     
     return render(request, "process_creator/list.html", {
         "processes": processes,
+        "next_cursor": next_cursor,
+        "process_count": process_count,
         "modules": modules,
-        "selected_module": selected_module
+        "selected_module": selected_module,
+        "export_queue_enabled": EXPORT_QUEUE_ENABLED,
+    })
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+def process_list_page(request):
+    """Infinite-scroll JSON: the next page of process cards after ``cursor``."""
+    module_id = request.GET.get('module')
+    try:
+        processes, next_cursor = cursor_page(
+            _process_rows(module_id if module_id and module_id.isdigit() else None),
+            request.GET.get('cursor'),
+            PROCESS_LIST_PAGE_SIZE,
+            'order',
+        )
+    except ValueError as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+    html = render_to_string("process_creator/partials/process_cards.html", {"processes": processes}, request=request)
+    return JsonResponse({"ok": True, "html": html, "count": len(processes), "next": next_cursor})
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+def process_search(request):
+    """Ranked full-text search over processes, steps, template steps and job steps."""
+    query = (request.GET.get('q') or '').strip()
+    kinds = request.GET.getlist('kind')
+    hits = search(query, kinds) if query else []
+    if request.GET.get('format') == 'json':
+        return JsonResponse({"ok": True, "results": [{
+            "kind": hit.kind, "id": hit.object_id, "title": hit.title, "context": hit.context,
+            "snippet": hit.snippet, "url": hit.url, "score": hit.score,
+        } for hit in hits]})
+    return render(request, 'process_creator/search.html', {
+        "query": query,
+        "kinds": kinds,
+        "kind_choices": SearchDocument.KIND_CHOICES,
+        "hits": hits,
     })
 
 
@@ -248,12 +246,67 @@ def process_create(request):
     return redirect("process_creator:edit", pk=process.pk)
 
 
+STEP_BODY_PREFETCH = ("links", "files", "images")
+
+
 @login_required
 @require_app_access('process_creator', action='edit')
 def process_edit(request, pk: int):
     process = get_object_or_404(Process, pk=pk)
     modules = Module.objects.all()
-    return render(request, "process_creator/edit.html", {"process": process, "modules": modules})
+    # Long processes ship step headers only and fetch bodies from step_fragments as
+    # they scroll into view; ?lazy=1 / ?lazy=0 overrides the threshold
+    lazy = request.GET.get("lazy")
+    if lazy in ("0", "1"):
+        lazy_steps = lazy == "1"
+    else:
+        lazy_steps = bool(EDITOR_LAZY_STEPS) and process.steps.count() > EDITOR_LAZY_STEPS
+    steps = process.steps.all()
+    if not lazy_steps:
+        steps = steps.prefetch_related(*STEP_BODY_PREFETCH)
+    return render(request, "process_creator/edit.html", {
+        "process": process,
+        "steps": steps,
+        "lazy_steps": lazy_steps,
+        "fragment_batch": EDITOR_FRAGMENT_BATCH,
+        "modules": modules,
+        "export_queue_enabled": EXPORT_QUEUE_ENABLED,
+        # Server-sent events only stream under ASGI; WSGI buffers them, so use the JSON endpoints there
+        "ai_streaming": isinstance(request, ASGIRequest),
+    })
+
+
+def _step_bodies(request, process, step_ids):
+    steps = process.steps.filter(id__in=step_ids).prefetch_related(*STEP_BODY_PREFETCH)
+    return {
+        step.id: render_to_string("process_creator/partials/step_body.html", {"process": process, "step": step}, request=request)
+        for step in steps
+    }
+
+
+@login_required
+@require_app_access('process_creator', action='edit')
+def step_fragment(request, pk: int, step_id: int):
+    """One step's body (details, links, documents, images) as HTML."""
+    process = get_object_or_404(Process, pk=pk)
+    bodies = _step_bodies(request, process, [step_id])
+    if step_id not in bodies:
+        raise Http404("Step not found")
+    return HttpResponse(bodies[step_id])
+
+
+@login_required
+@require_app_access('process_creator', action='edit')
+def step_fragments(request, pk: int):
+    """Bodies for ``?ids=1,2,3`` in one round trip: {"ok", "fragments": {id: html}}."""
+    process = get_object_or_404(Process, pk=pk)
+    try:
+        step_ids = [int(value) for value in request.GET.get("ids", "").split(",") if value.strip()]
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Invalid step ids."}, status=400)
+    if len(step_ids) > EDITOR_FRAGMENT_BATCH:
+        return JsonResponse({"ok": False, "error": f"At most {EDITOR_FRAGMENT_BATCH} steps per request."}, status=400)
+    return JsonResponse({"ok": True, "fragments": _step_bodies(request, process, step_ids)})
 
 
 @login_required
@@ -324,12 +377,8 @@ def process_print(request, pk: int):
         process = Process.objects.get(pk=pk)
     except Process.DoesNotExist:
         return redirect("process_creator:list")
-    focused_step_id = request.GET.get('focused_step')
-    try:
-        steps = process.steps.all() if not focused_step_id else process.steps.filter(id=int(focused_step_id))
-    except (TypeError, ValueError):
-        steps = process.steps.all()
-    return render(request, "process_creator/print.html", {"process": process, "steps": steps})
+    pdoc = build_process_doc(load_process_tree(process.pk, request.GET.get('focused_step')))
+    return HttpResponse(process_to_html(pdoc, request))
 
 
 @login_required
@@ -358,21 +407,32 @@ def process_copy_prompt(request, pk: int):
 @require_app_access('process_creator', action='edit')
 @require_POST
 def processes_reorder(request):
-    order_list = request.POST.getlist("order[]")
+    """
+    Put the posted processes, in the posted order, into the list positions they
+    already occupy. The list is paginated, so only the loaded cards are posted;
+    every other process keeps its place. Reordering is not an edit, so
+    ``updated_at`` is left alone.
+    """
+    posted = [int(pk) for pk in request.POST.getlist("order[]") if pk.isdigit()]
     with transaction.atomic():
-        for index, process_id in enumerate(order_list, start=1):
-            Process.objects.filter(id=process_id).update(order=index, updated_at=timezone.now())
+        current = dict(Process.objects.select_for_update().order_by('order', 'id').values_list('id', 'order'))
+        moved = [pk for pk in dict.fromkeys(posted) if pk in current]
+        moved_set = set(moved)
+        moved_iter = iter(moved)
+        sequence = [next(moved_iter) if pk in moved_set else pk for pk in current]
+        # Renumber 1..n so processes that shared an order value can be told apart
+        changed = [Process(id=pk, order=index) for index, pk in enumerate(sequence, start=1) if current[pk] != index]
+        Process.objects.bulk_update(changed, ['order'], batch_size=500)
     return JsonResponse({"ok": True})
 
 
 @login_required
 @require_app_access('process_creator', action='view')
 def process_print_all(request):
-    # ids parameter optional; if provided, filter
-    ids = request.GET.getlist('ids')
+    # ids (or all=true with an optional module) are optional; if provided, filter
     processes = Process.objects.all()
-    if ids:
-        processes = processes.filter(id__in=ids)
+    if request.GET.getlist('ids') or request.GET.get('all') == 'true':
+        processes = processes.filter(id__in=selected_process_ids(request.GET))
     return render(request, "process_creator/print_all.html", {"processes": processes})
 
 
@@ -439,7 +499,7 @@ def step_update(request, pk: int, step_id: int):
     if details is not None:
         step.details = details
     step.save()
-    return JsonResponse({"ok": True})
+    return JsonResponse({"ok": True, "updated": format_date(step.updated_at, "M d, Y g:i A")})
 
 
 @login_required
@@ -475,7 +535,9 @@ def step_image_upload(request, pk: int, step_id: int):
         substep_index = None
     max_order = step.images.aggregate(models.Max('order')).get('order__max') or 0
     img = StepImage.objects.create(step=step, image=file, order=max_order + 1, substep_index=substep_index)
-    return JsonResponse({"ok": True, "id": img.id, "url": img.image.url, "order": img.order, "substep_index": img.substep_index})
+    # Builds the thumbnail/medium derivatives now so the editor and exports don't have to
+    thumb_url = derivative_url(img.image, 'thumb')
+    return JsonResponse({"ok": True, "id": img.id, "url": img.image.url, "thumb_url": thumb_url, "order": img.order, "substep_index": img.substep_index})
 
 
 @login_required
@@ -551,6 +613,14 @@ def step_link_delete(request, pk: int, step_id: int, link_id: int):
     return JsonResponse({"ok": True})
 
 
+def _warm_pdf_pages(step_file):
+    # Rasterise pages now so Word exports with show_pdfs hit the page cache
+    try:
+        warm_pdf_pages_async(step_file.file.path)
+    except Exception:
+        pass
+
+
 @login_required
 @require_app_access('process_creator', action='edit')
 @require_POST
@@ -567,68 +637,40 @@ def step_file_upload(request, pk: int, step_id: int):
         # Direct PDF: save as-is
         if (file.content_type == 'application/pdf' or name_lower.endswith('.pdf')):
             sf = StepFile.objects.create(step=step, file=file, order=max_order + 1)
-            return JsonResponse({"ok": True, "id": sf.id, "url": sf.file.url, "name": os.path.basename(sf.file.name)})
+            _warm_pdf_pages(sf)
+            return JsonResponse(_step_file_payload(sf))
 
-        # DWG / IDW: try local conversion to PDF
-        is_dwg = name_lower.endswith('.dwg')
-        is_idw = name_lower.endswith('.idw')
-        if not (is_dwg or is_idw):
+        # DWG / IDW: store the drawing now and convert it to PDF in the background
+        if not is_convertible(file.name):
             return JsonResponse({"ok": False, "error": "Only PDF, DWG or IDW files are supported"}, status=200)
+        converting = converter_command(file.name) is not None
+        # Without a converter the drawing is stored as-is so it can be linked/downloaded
+        sf = StepFile.objects.create(step=step, file=file, order=max_order + 1,
+                                     status="converting" if converting else "ready")
+        if converting:
+            schedule_conversion(sf.id)
+        return JsonResponse(_step_file_payload(sf))
+    except Exception as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=200)
 
-        # Persist the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.name)[1]) as tmp_in:
-            for chunk in file.chunks():
-                tmp_in.write(chunk)
-            tmp_in_path = tmp_in.name
-
-        tmp_out_fd, tmp_out_path = tempfile.mkstemp(suffix='.pdf')
-        os.close(tmp_out_fd)
-
-        if is_dwg:
-            exe = getattr(settings, 'ODA_CONVERTER_PDF', '')
-            if not exe or not os.path.exists(exe):
-                # Fallback: store the DWG as-is so it can be linked/downloaded
-                sf = StepFile.objects.create(step=step, file=file, order=max_order + 1)
-                return JsonResponse({"ok": True, "id": sf.id, "url": sf.file.url, "name": os.path.basename(sf.file.name)})
-            cmd = [exe, tmp_in_path, tmp_out_path]
-        else:
-            exe = getattr(settings, 'INVENTOR_IDW_TO_PDF', '')
-            if not exe or not os.path.exists(exe):
-                sf = StepFile.objects.create(step=step, file=file, order=max_order + 1)
-                return JsonResponse({"ok": True, "id": sf.id, "url": sf.file.url, "name": os.path.basename(sf.file.name)})
-            cmd = [exe, tmp_in_path, tmp_out_path]
-
-        completed = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False, timeout=120)
-        if completed.returncode != 0 or not os.path.exists(tmp_out_path) or os.path.getsize(tmp_out_path) == 0:
-            # On conversion failure, store original so user still gets a downloadable file
-            try:
-                os.unlink(tmp_out_path)
-            except Exception:
-                pass
-            sf = StepFile.objects.create(step=step, file=file, order=max_order + 1)
-            return JsonResponse({"ok": True, "id": sf.id, "url": sf.file.url, "name": os.path.basename(sf.file.name)})
 
-        with open(tmp_out_path, 'rb') as f_out:
-            from django.core.files.base import ContentFile
-            pdf_bytes = f_out.read()
-            pdf_name = os.path.splitext(file.name)[0] + '.pdf'
-            sf = StepFile.objects.create(step=step, order=max_order + 1)
-            sf.file.save(pdf_name, ContentFile(pdf_bytes), save=True)
+def _step_file_payload(sf):
+    return {
+        "ok": True,
+        "id": sf.id,
+        "url": sf.file.url,
+        "name": os.path.basename(sf.file.name),
+        "status": sf.status,
+        "error": sf.conversion_error,
+        "status_url": reverse("process_creator:step_file_status", args=[sf.step.process_id, sf.step_id, sf.id]),
+    }
 
-        return JsonResponse({"ok": True, "id": sf.id, "url": sf.file.url, "name": os.path.basename(sf.file.name)})
-    except Exception as e:
-        return JsonResponse({"ok": False, "error": str(e)}, status=200)
-    finally:
-        try:
-            if 'tmp_in_path' in locals() and os.path.exists(tmp_in_path):
-                os.unlink(tmp_in_path)
-        except Exception:
-            pass
-        try:
-            if 'tmp_out_path' in locals() and os.path.exists(tmp_out_path):
-                os.unlink(tmp_out_path)
-        except Exception:
-            pass
+
+@login_required
+@require_app_access('process_creator', action='view')
+def step_file_status(request, pk: int, step_id: int, file_id: int):
+    sf = get_object_or_404(StepFile.objects.select_related('step'), pk=file_id, step_id=step_id, step__process_id=pk)
+    return JsonResponse(_step_file_payload(sf))
 
 
 @login_required
@@ -658,335 +700,23 @@ def step_images_reorder(request, pk: int, step_id: int):
 @login_required
 @require_app_access('process_creator', action='view')
 def process_pdf(request, pk: int):
-    process = get_object_or_404(Process, pk=pk)
-    # Optional focused step
-    focused_step_id = request.GET.get('focused_step')
-    try:
-        steps = process.steps.all() if not focused_step_id else process.steps.filter(id=int(focused_step_id))
-    except (TypeError, ValueError):
-        steps = process.steps.all()
-    # Render the print template to HTML
-    html_string = render_to_string('process_creator/print.html', {'process': process, 'steps': steps})
-
-    # Helper to resolve static/media URLs for xhtml2pdf
-    def link_callback(uri, rel):
-        if uri.startswith('/media/'):
-            path = os.path.join(settings.MEDIA_ROOT, uri.replace('/media/', ''))
-            return path
-        if uri.startswith('/static/'):
-            # If STATIC_ROOT is set, prefer it; otherwise try finders
-            static_root = getattr(settings, 'STATIC_ROOT', None)
-            if static_root:
-                return os.path.join(static_root, uri.replace('/static/', ''))
-        return uri
-
-    # Generate PDF via xhtml2pdf
-    from io import BytesIO
-    pdf_io = BytesIO()
-    pisa.CreatePDF(src=html_string, dest=pdf_io, link_callback=link_callback, encoding='utf-8')
-    pdf_io.seek(0)
-
-    # Generate filename with process title and timestamp
-    from datetime import datetime
-    from urllib.parse import quote
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    safe_title = "".join(c for c in process.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-    safe_title = safe_title.replace(' ', '-')
-    filename = f"Process-{safe_title}-{timestamp}.pdf"
-    
-    response = HttpResponse(pdf_io.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    get_object_or_404(Process, pk=pk)
+    return _cached_export_response(request, 'process_pdf', request.GET, pk=pk)
 
 
 @login_required
 @require_app_access('process_creator', action='view')
 def process_word(request, pk: int):
-    process = get_object_or_404(Process, pk=pk)
-    # Optional focused step
-    focused_step_id = request.GET.get('focused_step')
-    try:
-        steps = process.steps.all() if not focused_step_id else process.steps.filter(id=int(focused_step_id))
-    except (TypeError, ValueError):
-        steps = process.steps.all()
-    
-    # Get toggle states from request parameters
-    # Default to False if not explicitly provided; frontend will pass current toggle states
-    show_description = request.GET.get('show_description', 'false').lower() == 'true'
-    show_notes = request.GET.get('show_notes', 'false').lower() == 'true'
-    show_analysis = request.GET.get('show_analysis', 'false').lower() == 'true'
-    show_attachments = request.GET.get('show_attachments', 'false').lower() == 'true'
-    show_summary = request.GET.get('show_summary', 'false').lower() == 'true'
-    show_pdfs = request.GET.get('show_pdfs', 'false').lower() == 'true'
-    
-    # Create a new Word document
-    doc = Document()
-    # Remove default empty first paragraph to avoid accidental blank first page
-    try:
-        if len(doc.paragraphs) and not doc.paragraphs[0].text.strip():
-            p = doc.paragraphs[0]
-            p._element.getparent().remove(p._element)
-    except Exception:
-        pass
-    # Normalize section settings to avoid leading blank due to odd-page starts
-    try:
-        from docx.enum.section import WD_SECTION_START
-        for section in doc.sections:
-            section.start_type = WD_SECTION_START.NEW_PAGE
-            section.different_first_page_header_footer = False
-    except Exception:
-        pass
-    
-    # Add title without forcing a title-page behavior
-    title = doc.add_paragraph(process.name, style='Heading 1')
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    try:
-        title.paragraph_format.page_break_before = False
-    except Exception:
-        pass
-    
-    # Add summary (respect toggle)
-    if show_summary and process.summary:
-        doc.add_heading('Summary', level=1)
-        # Use the new Markdown converter for proper formatting
-        add_markdown_to_word_doc(doc, process.summary, level=2)
-    
-    # Add description (if toggle is on)
-    if show_description and process.description:
-        doc.add_heading('Description', level=1)
-        p = doc.add_paragraph(process.description)
-        p.paragraph_format.space_after = Inches(0.1)
-        p.paragraph_format.line_spacing = 1.15
-    
-    # Add PDFs before steps if toggle is on
-    if show_pdfs:
-        pdf_files = []
-        for step in steps:
-            for file in step.files.all():
-                if file.file.name.lower().endswith('.pdf'):
-                    pdf_files.append(file)
-        
-        if pdf_files:
-            doc.add_heading('PDF Documents', level=1)
-            for pdf_file in pdf_files:
-                try:
-                    pdf_path = os.path.join(settings.MEDIA_ROOT, str(pdf_file.file))
-                    if os.path.exists(pdf_path):
-                        pages = _render_pdf_pages_to_images(pdf_path)
-                        if pages:
-                            for img_io in pages:
-                                p = doc.add_paragraph()
-                                r = p.add_run()
-                                r.add_picture(img_io, width=Inches(6))
-                                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        else:
-                            # Fallback: show filename if rendering unavailable
-                            doc.add_paragraph(f"PDF: {os.path.basename(pdf_file.file.name)}")
-                except Exception:
-                    # If anything fails, add a reference
-                    doc.add_paragraph(f"PDF: {os.path.basename(pdf_file.file.name)}")
-    
-    # Add steps (always show steps as they are core content)
-    if steps.exists():
-        doc.add_heading('Steps', level=1)
-        for step in steps:
-            # Add step title
-            step_heading = doc.add_heading(f'{step.order}. {step.title}', level=2)
-            
-            # Add step details, and for bullets place images with caption under each image
-            if step.details:
-                lines = step.details.split('\n')
-                bullet_idx = -1
-                for raw in lines:
-                    line = raw.rstrip('\r')
-                    is_bullet = bool(re.match(r'^\s*-\s+', line))
-                    if is_bullet:
-                        bullet_idx += 1
-                    bullet_text_match = re.match(r'^\s*-\s+(.*)$', line)
-                    bullet_text = bullet_text_match.group(1) if bullet_text_match else line
-                    # If bullet and we should include attachments, render images with caption (caption under image)
-                    if is_bullet and show_attachments and step.images.exists():
-                        related = [img for img in step.images.all() if img.substep_index == bullet_idx]
-                        if related:
-                            for img in related:
-                                try:
-                                    img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                                    if os.path.exists(img_path):
-                                        table = doc.add_table(rows=1, cols=1)
-                                        table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                        cell = table.cell(0, 0)
-                                        cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                        # Image paragraph
-                                        paragraph = cell.paragraphs[0]
-                                        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                        paragraph.paragraph_format.keep_with_next = True
-                                        run = paragraph.add_run()
-                                        run.add_picture(img_path, width=Inches(6))
-                                        # Caption paragraph (bullet text beneath image)
-                                        cap = cell.add_paragraph(bullet_text)
-                                        cap.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                        cap.paragraph_format.space_before = Pt(6)
-                                        cap.paragraph_format.line_spacing = 1.15
-                                        cap.paragraph_format.keep_together = True
-                                        cap.paragraph_format.keep_with_next = False
-                                        # Prevent table row from splitting across pages
-                                        from docx.oxml.shared import OxmlElement, qn
-                                        tr = table.rows[0]._tr
-                                        trPr = tr.get_or_add_trPr()
-                                        cantSplit = OxmlElement('w:cantSplit')
-                                        trPr.append(cantSplit)
-                                        # Slightly larger font for visibility
-                                        for r in cap.runs:
-                                            r.font.size = Pt(12)
-                                        # Add thin border around the image container cell to separate visually
-                                        tc = cell._tc
-                                        tcPr = tc.get_or_add_tcPr()
-                                        tcBorders = OxmlElement('w:tcBorders')
-                                        for border_name in ['top', 'left', 'bottom', 'right']:
-                                            border = OxmlElement(f'w:{border_name}')
-                                            border.set(qn('w:val'), 'single')
-                                            border.set(qn('w:sz'), '8')
-                                            border.set(qn('w:space'), '0')
-                                            border.set(qn('w:color'), 'CCCCCC')
-                                            tcBorders.append(border)
-                                        tcPr.append(tcBorders)
-                                except Exception:
-                                    pass
-                            # We have rendered bullets as captions under each image; skip separate bullet paragraph
-                            continue
-                    # Default: render the line as normal paragraph
-                    p = doc.add_paragraph(line)
-                    p.paragraph_format.space_after = Inches(0.05)
-                    p.paragraph_format.line_spacing = 1.15
-            
-            # Any remaining images without substep_index: render after details (respect attachments toggle)
-            if show_attachments and step.images.exists():
-                for img in step.images.all():
-                    if img.substep_index is None:
-                        try:
-                            img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                            if os.path.exists(img_path):
-                                table = doc.add_table(rows=1, cols=1)
-                                table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                cell = table.cell(0, 0)
-                                cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                paragraph = cell.paragraphs[0]
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                run = paragraph.add_run()
-                                run.add_picture(img_path, width=Inches(6))
-                                from docx.oxml.shared import OxmlElement, qn
-                                tc = cell._tc
-                                tcPr = tc.get_or_add_tcPr()
-                                tcBorders = OxmlElement('w:tcBorders')
-                                for border_name in ['top', 'left', 'bottom', 'right']:
-                                    border = OxmlElement(f'w:{border_name}')
-                                    border.set(qn('w:val'), 'single')
-                                    border.set(qn('w:sz'), '12')
-                                    border.set(qn('w:space'), '0')
-                                    border.set(qn('w:color'), '333333')
-                                    tcBorders.append(border)
-                                tcPr.append(tcBorders)
-                        except Exception:
-                            pass
-    
-    # Add notes (if toggle is on)
-    if show_notes and process.notes:
-        doc.add_heading('Notes', level=1)
-        p = doc.add_paragraph(process.notes)
-        p.paragraph_format.space_after = Inches(0.1)
-        p.paragraph_format.line_spacing = 1.15
-    
-    # Add analysis (if toggle is on)
-    if show_analysis and process.analysis:
-        doc.add_heading('Process Analysis', level=1)
-        # Use the new Markdown converter for proper formatting
-        add_markdown_to_word_doc(doc, process.analysis, level=2)
-    
-    # Add Process History section with timestamps
-    doc.add_heading('Process History', level=1)
-    
-    # Process timestamps
-    from django.utils import timezone
-    process_created = process.created_at.strftime('%B %d, %Y at %I:%M %p')
-    process_updated = process.updated_at.strftime('%B %d, %Y at %I:%M %p')
-    
-    history_p = doc.add_paragraph()
-    history_p.add_run('Process: ').bold = True
-    history_p.add_run(f'Created {process_created}, Last Updated {process_updated}')
-    
-    # Step timestamps
-    if steps.exists():
-        doc.add_heading('Step History', level=2)
-        for step in steps:
-            step_created = step.created_at.strftime('%B %d, %Y at %I:%M %p')
-            step_updated = step.updated_at.strftime('%B %d, %Y at %I:%M %p')
-            
-            step_p = doc.add_paragraph()
-            step_p.add_run(f'Step {step.order}: {step.title} - ').bold = True
-            step_p.add_run(f'Created {step_created}, Updated {step_updated}')
-            
-            # Substep timestamps (for images and files)
-            if show_attachments:
-                # Image timestamps
-                if step.images.exists():
-                    doc.add_heading(f'Images for Step {step.order}', level=3)
-                    for img in step.images.all():
-                        img_uploaded = img.uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-                        img_updated = img.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                        img_p = doc.add_paragraph()
-                        img_p.add_run(f'Image {img.order}: ').bold = True
-                        img_p.add_run(f'{os.path.basename(img.image.name)} - Uploaded {img_uploaded}, Updated {img_updated}')
-                        if img.substep_index is not None:
-                            img_p.add_run(f' (Associated with substep {img.substep_index + 1})')
-                
-                # File timestamps
-                if step.files.exists():
-                    doc.add_heading(f'Files for Step {step.order}', level=3)
-                    for file in step.files.all():
-                        file_uploaded = file.uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-                        file_updated = file.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                        file_p = doc.add_paragraph()
-                        file_p.add_run(f'File {file.order}: ').bold = True
-                        file_p.add_run(f'{os.path.basename(file.file.name)} - Uploaded {file_uploaded}, Updated {file_updated}')
-                
-                # Link timestamps
-                if step.links.exists():
-                    doc.add_heading(f'Links for Step {step.order}', level=3)
-                    for link in step.links.all():
-                        link_created = link.created_at.strftime('%B %d, %Y at %I:%M %p')
-                        link_updated = link.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                        link_p = doc.add_paragraph()
-                        link_p.add_run(f'Link {link.order}: ').bold = True
-                        link_p.add_run(f'{link.title} - Created {link_created}, Updated {link_updated}')
-    
-    # Save to BytesIO
-    from io import BytesIO
-    doc_io = BytesIO()
-    # Ensure doc starts content immediately (avoid stray leading section break)
-    doc.settings.odd_and_even_pages_header_footer = False
-    doc.save(doc_io)
-    doc_io.seek(0)
-    
-    # Generate filename with module (if any), process title and timestamp
-    from datetime import datetime
-    from urllib.parse import quote
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    safe_process = "".join(c for c in process.name if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '-')
-    if process.module:
-        safe_module = "".join(c for c in process.module.name if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '-')
-        filename = f"{safe_module}-{safe_process}-{timestamp}.docx"
-    else:
-        filename = f"Process-{safe_process}-{timestamp}.docx"
-    
-    response = HttpResponse(doc_io.getvalue(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    get_object_or_404(Process, pk=pk)
+    # Toggle states default to False if not explicitly provided; frontend passes current toggle states
+    return _cached_export_response(request, 'process_word', request.GET, pk=pk)
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+def process_markdown(request, pk: int):
+    get_object_or_404(Process, pk=pk)
+    return _cached_export_response(request, 'process_markdown', request.GET, pk=pk)
 
 
 @login_required
@@ -994,31 +724,25 @@ def process_word(request, pk: int):
 def process_stats(request, pk: int):
     process = get_object_or_404(Process, pk=pk)
     
-    # Calculate statistics
-    step_count = process.steps.count()
-    
-    # Count substeps (lines starting with -)
-    substep_count = 0
-    for step in process.steps.all():
-        if step.details:
-            # Count lines that start with - (substeps)
-            substep_count += len([line for line in step.details.split('\n') if line.strip().startswith('-')])
-    
+    # One aggregate over the counters Step keeps up to date (services/step_counters.py)
+    totals = process.steps.aggregate(
+        step_count=models.Count("id"),
+        substep_count=Coalesce(models.Sum("bullet_count"), 0),
+        image_count=Coalesce(models.Sum("image_count"), 0),
+        step_details_length=Coalesce(models.Sum("details_length"), 0),
+    )
+    step_count = totals["step_count"]
+    substep_count = totals["substep_count"]
     total_steps = step_count + substep_count
-    image_count = sum(step.images.count() for step in process.steps.all())
-    
+    image_count = totals["image_count"]
+    step_details_length = totals["step_details_length"]
+
     # Calculate text lengths
     description_length = len(process.description) if process.description else 0
     notes_length = len(process.notes) if process.notes else 0
     summary_length = len(process.summary) if process.summary else 0
     analysis_length = len(process.analysis) if process.analysis else 0
-    
-    # Calculate total text length from all step details
-    step_details_length = 0
-    for step in process.steps.all():
-        if step.details:
-            step_details_length += len(step.details)
-    
+
     # Total text length (all text content combined)
     total_text_length = description_length + notes_length + summary_length + analysis_length + step_details_length
     
@@ -1045,56 +769,10 @@ def process_stats(request, pk: int):
     return JsonResponse(stats)
 
 
-def call_openai_api(prompt, model="gpt-4o-mini", max_tokens=2000):
-    """Helper function to call OpenAI API and track usage"""
-    try:
-        if not settings.OPENAI_API_KEY:
-            return {
-                'success': False,
-                'error': 'OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.',
-                'tokens_used': 0,
-                'cost': Decimal('0.00')
-            }
-        
-        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=0.7
-        )
-        
-        return {
-            'success': True,
-            'content': response.choices[0].message.content,
-            'tokens_used': response.usage.total_tokens,
-            'cost': calculate_cost(response.usage.total_tokens, model)
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'tokens_used': 0,
-            'cost': Decimal('0.00')
-        }
-
-
-def calculate_cost(tokens, model):
-    """Calculate cost based on token usage and model"""
-    # Pricing per 1K tokens (as of 2024)
-    pricing = {
-        'gpt-4o-mini': {'input': 0.00015, 'output': 0.0006},
-        'gpt-4o': {'input': 0.005, 'output': 0.015},
-        'gpt-3.5-turbo': {'input': 0.0015, 'output': 0.002}
-    }
-    
-    if model not in pricing:
-        model = 'gpt-4o-mini'
-    
-    # Rough estimate - assume 50/50 input/output split
-    cost_per_token = (pricing[model]['input'] + pricing[model]['output']) / 2
-    return Decimal(str(tokens * cost_per_token / 1000)).quantize(Decimal('0.000001'))
+def _summary_prompt(process, instructions, data):
+    incremental = data.get('incremental', AI_INCREMENTAL_SUMMARY) and not data.get('refresh')
+    snapshot = latest_summary_snapshot(process) if incremental else None
+    return summary_prompt(process, instructions, snapshot, incremental=incremental)
 
 
 @login_required
@@ -1105,7 +783,7 @@ def ai_generate_summary(request, pk: int):
     process = get_object_or_404(Process, pk=pk)
     
     # Debug: Check if API key is available
-    if not settings.OPENAI_API_KEY:
+    if not ai_configured():
         return JsonResponse({
             'success': False, 
             'error': 'OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.'
@@ -1115,47 +793,18 @@ def ai_generate_summary(request, pk: int):
     data = json.loads(request.body)
     instructions = data.get('instructions', process.summary_instructions)
     
-    # Build prompt with process data
-    prompt = f"""{instructions}
-
-Process Details:
-Name: {process.name}
-Description: {process.description or 'No description provided'}
+    # Build prompt with process data (only the changed steps when updating an existing summary)
+    prompt, snapshot = _summary_prompt(process, instructions, data)
+    if prompt is None:
+        return JsonResponse({'success': True, 'summary': process.summary, 'unchanged': True})
 
-Steps:
-"""
-    
-    for step in process.steps.all():
-        prompt += f"{step.order}. {step.title}\n"
-        if step.details:
-            prompt += f"   Details: {step.details}\n"
-        if step.images.exists():
-            prompt += f"   Images: {step.images.count()} screenshot(s)\n"
-        prompt += "\n"
-    
-    if process.notes:
-        prompt += f"Notes: {process.notes}\n"
-    
     # Call OpenAI API
-    result = call_openai_api(prompt, max_tokens=500)
-    
+    result = call_openai_api(prompt, max_tokens=SUMMARY_MAX_TOKENS, use_cache=not data.get('refresh'))
+
     if result['success']:
-        # Update process
-        process.summary = result['content']
-        process.summary_instructions = instructions
-        process.last_ai_update = timezone.now()
-        process.save()
-        
-        # Log interaction
-        AIInteraction.objects.create(
-            process=process,
-            interaction_type='summary',
-            prompt_sent=prompt,
-            response_received=result['content'],
-            tokens_used=result['tokens_used'],
-            cost=result['cost']
-        )
-        
+        # Update process and log interaction
+        save_summary(process, prompt, result, instructions=instructions, snapshot=snapshot)
+
         return JsonResponse({
             'success': True,
             'summary': result['content']
@@ -1175,7 +824,7 @@ def ai_analyze_process(request, pk: int):
     process = get_object_or_404(Process, pk=pk)
     
     # Debug: Check if API key is available
-    if not settings.OPENAI_API_KEY:
+    if not ai_configured():
         return JsonResponse({
             'success': False, 
             'error': 'OpenAI API key not configured. Please set OPENAI_API_KEY environment variable.'
@@ -1186,52 +835,15 @@ def ai_analyze_process(request, pk: int):
     instructions = data.get('instructions', process.analysis_instructions)
     
     # Build comprehensive prompt
-    prompt = f"""You are a business process improvement consultant. {instructions}
+    prompt = build_analysis_prompt(process, instructions)
 
-Process Details:
-Name: {process.name}
-Description: {process.description or 'No description provided'}
-
-Current Process Steps:
-"""
-    
-    for step in process.steps.all():
-        prompt += f"{step.order}. {step.title}\n"
-        if step.details:
-            prompt += f"   Details: {step.details}\n"
-        if step.images.exists():
-            prompt += f"   Images: {step.images.count()} screenshot(s)\n"
-        prompt += "\n"
-    
-    if process.notes:
-        prompt += f"Additional Notes: {process.notes}\n"
-    
-    prompt += f"\nCurrent Summary: {process.summary or 'No summary available'}\n"
-    
-    prompt += """
-Please provide a detailed analysis following the instructions above. Structure your response with clear headings and actionable recommendations.
-"""
-    
     # Call OpenAI API
-    result = call_openai_api(prompt, max_tokens=2000)
-    
+    result = call_openai_api(prompt, max_tokens=ANALYSIS_MAX_TOKENS, use_cache=not data.get('refresh'))
+
     if result['success']:
-        # Update process
-        process.analysis = result['content']
-        process.analysis_instructions = instructions
-        process.last_ai_update = timezone.now()
-        process.save()
-        
-        # Log interaction
-        AIInteraction.objects.create(
-            process=process,
-            interaction_type='analysis',
-            prompt_sent=prompt,
-            response_received=result['content'],
-            tokens_used=result['tokens_used'],
-            cost=result['cost']
-        )
-        
+        # Update process and log interaction
+        save_analysis(process, prompt, result, instructions=instructions)
+
         return JsonResponse({
             'success': True,
             'analysis': result['content']
@@ -1242,7 +854,89 @@ Please provide a detailed analysis following the instructions above. Structure y
             'error': result['error']
         })
 
+def _sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@require_app_access('process_creator', action='edit')
+@require_POST
+def ai_summary_stream(request, pk: int):
+    """Server-sent-events variant of ai_generate_summary; saves the summary when the stream completes"""
+    process = get_object_or_404(Process, pk=pk)
+    data = json.loads(request.body or '{}')
+    instructions = data.get('instructions', process.summary_instructions)
+    prompt, snapshot = _summary_prompt(process, instructions, data)
+    if prompt is None:
+        return _sse_response(replay(process.summary))
+    return _sse_response(stream_completion(
+        prompt,
+        lambda result: save_summary(process, prompt, result, instructions=instructions, snapshot=snapshot),
+        max_tokens=SUMMARY_MAX_TOKENS,
+        use_cache=not data.get('refresh'),
+    ))
+
+
+@login_required
+@require_app_access('process_creator', action='edit')
+@require_POST
+def ai_analyze_stream(request, pk: int):
+    """Server-sent-events variant of ai_analyze_process; saves the analysis when the stream completes"""
+    process = get_object_or_404(Process, pk=pk)
+    data = json.loads(request.body or '{}')
+    instructions = data.get('instructions', process.analysis_instructions)
+    prompt = build_analysis_prompt(process, instructions)
+    return _sse_response(stream_completion(
+        prompt,
+        lambda result: save_analysis(process, prompt, result, instructions=instructions),
+        max_tokens=ANALYSIS_MAX_TOKENS,
+        use_cache=not data.get('refresh'),
+    ))
+
+@login_required
+@require_app_access('process_creator', action='view')
+def ai_usage_report(request):
+    """OpenAI spend and token usage grouped by process, module and day."""
+    try:
+        days = max(0, int(request.GET.get('days', 30)))
+    except ValueError:
+        days = 30
+    interactions = AIInteraction.objects.all()
+    if days:
+        interactions = interactions.filter(created_at__gte=timezone.now() - timedelta(days=days))
+
+    usage = dict(
+        calls=models.Count('id'),
+        prompt_tokens=models.Sum('prompt_tokens'),
+        completion_tokens=models.Sum('completion_tokens'),
+        tokens=models.Sum('tokens_used'),
+        cost=models.Sum('cost'),
+    )
+    return render(request, 'process_creator/ai_usage.html', {
+        'days': days,
+        'totals': interactions.aggregate(**usage),
+        'by_process': (interactions.values('process_id', 'process__name', 'process__module__name')
+                       .annotate(**usage).order_by('-cost', 'process__name')),
+        'by_module': interactions.values('process__module__name').annotate(**usage).order_by('-cost'),
+        'by_day': (interactions.annotate(day=TruncDate('created_at')).values('day')
+                   .annotate(**usage).order_by('-day')),
+    })
+
+
 # Bulk Operations
+def _bulk_map_reduce(process_ids, instructions, data, key):
+    result = map_reduce(process_ids, instructions, use_cache=not data.get('refresh'),
+                        incremental=data.get('incremental', AI_INCREMENTAL_SUMMARY))
+    if result['success']:
+        return JsonResponse({'success': True, key: result['content'],
+                             'processes': result['processes'], 'reused': result['reused']})
+    return JsonResponse({'success': False, 'error': result['error']})
+
+
 @login_required
 @require_app_access('process_creator', action='edit')
 @require_POST
@@ -1250,11 +944,18 @@ def bulk_summary(request):
     """Generate summary for multiple processes"""
     try:
         data = json.loads(request.body)
-        process_ids = data.get('process_ids', [])
+        # "Check All" on the paginated list sends all/module instead of ids
+        process_ids = all_process_ids(data.get('module')) if data.get('all') else data.get('process_ids', [])
         
         if not process_ids:
             return JsonResponse({'success': False, 'error': 'No processes selected'})
         
+        # Use the default summary instructions
+        summary_instructions = "You are given a list of steps, bullet points, or fragmented notes. Your task is to transform them into a single professional, coherent paragraph. Do not repeat the steps as a list. Instead, weave them into smooth, natural prose that reads as if written by a skilled professional writer. Maintain accuracy, logical flow, and clarity. The output must always be a polished paragraph summary, never a bullet list."
+
+        if data.get('mode', AI_BULK_MODE) == 'map_reduce':
+            return _bulk_map_reduce(process_ids, summary_instructions, data, 'summary')
+
         # Get all selected processes
         processes = Process.objects.filter(id__in=process_ids).order_by('order')
         if not processes.exists():
@@ -1278,14 +979,15 @@ def bulk_summary(request):
             
             combined_data.append(process_info)
         
-        # Use the default summary instructions
-        summary_instructions = "You are given a list of steps, bullet points, or fragmented notes. Your task is to transform them into a single professional, coherent paragraph. Do not repeat the steps as a list. Instead, weave them into smooth, natural prose that reads as if written by a skilled professional writer. Maintain accuracy, logical flow, and clarity. The output must always be a polished paragraph summary, never a bullet list."
-        
         # Create comprehensive prompt
         prompt = f"{summary_instructions}\n\nProcess Data:\n{json.dumps(combined_data, indent=2)}"
         
+        if not fits(prompt, DEFAULT_MODEL, 2000):
+            # Too large for a single prompt: summarise each process first, then combine
+            return _bulk_map_reduce(process_ids, summary_instructions, data, 'summary')
+
         # Call OpenAI API
-        result = call_openai_api(prompt, model='gpt-4o-mini')
+        result = call_openai_api(prompt, model='gpt-4o-mini', use_cache=not data.get('refresh'))
         
         if result['success']:
             return JsonResponse({
@@ -1312,35 +1014,12 @@ def bulk_analyze(request):
     """Generate analysis for multiple processes"""
     try:
         data = json.loads(request.body)
-        process_ids = data.get('process_ids', [])
+        # "Check All" on the paginated list sends all/module instead of ids
+        process_ids = all_process_ids(data.get('module')) if data.get('all') else data.get('process_ids', [])
         
         if not process_ids:
             return JsonResponse({'success': False, 'error': 'No processes selected'})
         
-        # Get all selected processes
-        processes = Process.objects.filter(id__in=process_ids).order_by('order')
-        if not processes.exists():
-            return JsonResponse({'success': False, 'error': 'No valid processes found'})
-        
-        # Combine all process data
-        combined_data = []
-        for process in processes:
-            process_info = {
-                'name': process.name,
-                'description': process.description,
-                'notes': process.notes,
-                'steps': []
-            }
-            
-            for step in process.steps.all().order_by('order'):
-                step_info = {
-                    'title': step.title,
-                    'details': step.details
-                }
-                process_info['steps'].append(step_info)
-            
-            combined_data.append(process_info)
-        
         # Use the default analysis instructions
         analysis_instructions = """You are a senior operations analyst. You will receive a business process as input (steps, notes, and context). Produce a professional report titled "Training Analysis" that managers and frontline staff can act on.
 Follow these rules:
@@ -1386,12 +1065,43 @@ A 4–6 sentence closing paragraph summarizing the case for change, expected ben
 - Use paragraph form for the narrative sections; bullets only where specified.
 - Quantify benefits or ranges when plausible. Avoid vague claims.
 - Do not include meta-commentary or instructions in the output."""
+
+        if data.get('mode', AI_BULK_MODE) == 'map_reduce':
+            return _bulk_map_reduce(process_ids, analysis_instructions, data, 'analysis')
+
+        # Get all selected processes
+        processes = Process.objects.filter(id__in=process_ids).order_by('order')
+        if not processes.exists():
+            return JsonResponse({'success': False, 'error': 'No valid processes found'})
+        
+        # Combine all process data
+        combined_data = []
+        for process in processes:
+            process_info = {
+                'name': process.name,
+                'description': process.description,
+                'notes': process.notes,
+                'steps': []
+            }
+            
+            for step in process.steps.all().order_by('order'):
+                step_info = {
+                    'title': step.title,
+                    'details': step.details
+                }
+                process_info['steps'].append(step_info)
+            
+            combined_data.append(process_info)
         
         # Create comprehensive prompt
         prompt = f"{analysis_instructions}\n\nProcess Data:\n{json.dumps(combined_data, indent=2)}"
         
+        if not fits(prompt, DEFAULT_MODEL, 2000):
+            # Too large for a single prompt: summarise each process first, then combine
+            return _bulk_map_reduce(process_ids, analysis_instructions, data, 'analysis')
+
         # Call OpenAI API
-        result = call_openai_api(prompt, model='gpt-4o-mini')
+        result = call_openai_api(prompt, model='gpt-4o-mini', use_cache=not data.get('refresh'))
         
         if result['success']:
             return JsonResponse({
@@ -1415,389 +1125,115 @@ A 4–6 sentence closing paragraph summarizing the case for change, expected ben
 @require_app_access('process_creator', action='view')
 def bulk_pdf(request):
     """Generate PDF for multiple processes"""
-    process_ids = request.GET.getlist('ids')
-    if not process_ids:
-        return HttpResponse('No processes selected', status=400)
-    
-    # Filter by module if specified
-    selected_module_id = request.GET.get('module')
-    if selected_module_id:
-        try:
-            selected_module = Module.objects.get(id=selected_module_id)
-            processes = Process.objects.filter(id__in=process_ids, module=selected_module).order_by('order')
-        except Module.DoesNotExist:
-            processes = Process.objects.filter(id__in=process_ids).order_by('order')
-    else:
-        processes = Process.objects.filter(id__in=process_ids).order_by('order')
-    
-    if not processes.exists():
-        return HttpResponse('No valid processes found', status=400)
-    
-    # Get history data if included
-    history_data = []
-    if request.GET.get('include_history') == 'true':
-        try:
-            history_json = request.GET.get('history_data', '[]')
-            history_data = json.loads(history_json)
-        except (json.JSONDecodeError, TypeError):
-            history_data = []
-    
-    # Render template
-    html_string = render_to_string('process_creator/bulk_print.html', {
-        'processes': processes,
-        'history_data': history_data
-    })
-    
-    def link_callback(uri, rel):
-        sUrl = settings.STATIC_URL
-        sRoot = settings.STATIC_ROOT
-        mUrl = settings.MEDIA_URL
-        mRoot = settings.MEDIA_ROOT
-
-        if uri.startswith(mUrl):
-            path = os.path.join(mRoot, uri.replace(mUrl, ""))
-        elif uri.startswith(sUrl):
-            path = os.path.join(sRoot, uri.replace(sUrl, ""))
-        else:
-            path = os.path.join(settings.BASE_DIR, uri)
+    try:
+        return _cached_export_response(request, 'bulk_pdf', request.GET)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
+
 
-        if not os.path.isfile(path):
-            return uri
-        return path
+@login_required
+@require_app_access('process_creator', action='view')
+def bulk_word(request):
+    """Generate Word document for multiple processes"""
+    try:
+        return _cached_export_response(request, 'bulk_word', request.GET)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
 
-    response = HttpResponse(content_type='application/pdf')
-    pdf_io = BytesIO()
-    pisa.CreatePDF(src=html_string, dest=pdf_io, link_callback=link_callback, encoding='utf-8')
-    pdf_io.seek(0)
 
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    filename = f"Bulk-Process-Report-{timestamp}.pdf"
-    
-    response = HttpResponse(pdf_io.getvalue(), content_type='application/pdf')
+@login_required
+@require_app_access('process_creator', action='view')
+def bulk_zip(request):
+    """Stream a ZIP with one file per selected process (format=pdf|docx|md, repeatable)"""
+    try:
+        process_ids, filename = zip_export_plan(request.GET)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
+    response = StreamingHttpResponse(
+        iter_zip_export(process_ids, read_zip_formats(request.GET), read_toggles(request.GET), read_raster_options(request.GET)),
+        content_type=ZIP_CONTENT_TYPE,
+    )
     response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
     response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
+    # Ask reverse proxies not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
     return response
 
 
 @login_required
 @require_app_access('process_creator', action='view')
-def bulk_word(request):
-    """Generate Word document for multiple processes"""
-    process_ids = request.GET.getlist('ids')
-    if not process_ids:
-        return HttpResponse('No processes selected', status=400)
-    
-    # Filter by module if specified
-    selected_module_id = request.GET.get('module')
-    if selected_module_id:
-        try:
-            selected_module = Module.objects.get(id=selected_module_id)
-            processes = Process.objects.filter(id__in=process_ids, module=selected_module).order_by('order')
-        except Module.DoesNotExist:
-            processes = Process.objects.filter(id__in=process_ids).order_by('order')
-    else:
-        processes = Process.objects.filter(id__in=process_ids).order_by('order')
-    
-    if not processes.exists():
-        return HttpResponse('No valid processes found', status=400)
-    
-    # Get history data if included
-    history_data = []
-    if request.GET.get('include_history') == 'true':
-        try:
-            history_json = request.GET.get('history_data', '[]')
-            history_data = json.loads(history_json)
-        except (json.JSONDecodeError, TypeError):
-            history_data = []
-    
-    doc = Document()
-    # Remove default empty first paragraph to avoid accidental blank first page
-    try:
-        if len(doc.paragraphs) and not doc.paragraphs[0].text.strip():
-            p = doc.paragraphs[0]
-            p._element.getparent().remove(p._element)
-    except Exception:
-        pass
-    # Normalize section settings to avoid leading blank due to odd-page starts
-    try:
-        from docx.enum.section import WD_SECTION_START
-        for section in doc.sections:
-            section.start_type = WD_SECTION_START.NEW_PAGE
-            section.different_first_page_header_footer = False
-    except Exception:
-        pass
-    
-    # Add title without using the Title style (which can create a title page)
-    title = doc.add_paragraph('Bulk Process Report', style='Heading 1')
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+def bulk_markdown(request):
+    """Generate a Markdown document for multiple processes"""
     try:
-        title.paragraph_format.page_break_before = False
-    except Exception:
-        pass
-    
-    # Read toggle states (module-level controls)
-    show_description = request.GET.get('show_description', 'false').lower() == 'true'
-    show_notes = request.GET.get('show_notes', 'false').lower() == 'true'
-    show_analysis = request.GET.get('show_analysis', 'false').lower() == 'true'
-    show_summary = request.GET.get('show_summary', 'false').lower() == 'true'
-    show_attachments = request.GET.get('show_attachments', 'false').lower() == 'true'
-    show_pdfs = request.GET.get('show_pdfs', 'false').lower() == 'true'
+        return _cached_export_response(request, 'bulk_markdown', request.GET)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
 
-    # Add each process
-    for i, process in enumerate(processes, 1):
-        if i > 1:
-            doc.add_page_break()
-        
-        # Process name
-        process_heading = doc.add_heading(f'{i}. {process.name}', level=1)
-        
-        # Add PDFs before steps if toggle is on
-        if show_pdfs:
-            pdf_files = []
-            for step in process.steps.all():
-                for file in step.files.all():
-                    if file.file.name.lower().endswith('.pdf'):
-                        pdf_files.append(file)
-            
-            if pdf_files:
-                doc.add_heading('PDF Documents', level=2)
-                for pdf_file in pdf_files:
-                    try:
-                        pdf_path = os.path.join(settings.MEDIA_ROOT, str(pdf_file.file))
-                        if os.path.exists(pdf_path):
-                            pages = _render_pdf_pages_to_images(pdf_path)
-                            if pages:
-                                for img_io in pages:
-                                    p = doc.add_paragraph()
-                                    r = p.add_run()
-                                    r.add_picture(img_io, width=Inches(6))
-                                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            else:
-                                doc.add_paragraph(f"PDF: {os.path.basename(pdf_file.file.name)}")
-                    except Exception:
-                        # If PDF can't be embedded, add a reference
-                        doc.add_paragraph(f"PDF: {os.path.basename(pdf_file.file.name)}")
-        
-        # Summary (Markdown -> Word)
-        if show_summary and process.summary:
-            doc.add_heading('Summary', level=2)
-            add_markdown_to_word_doc(doc, process.summary, level=3)
-        
-        # Description
-        if show_description and process.description:
-            doc.add_heading('Description', level=2)
-            p = doc.add_paragraph(process.description)
-            p.paragraph_format.space_after = Inches(0.1)
-            p.paragraph_format.line_spacing = 1.15
-        
-        # Steps
-        if process.steps.exists():
-            doc.add_heading('Steps', level=2)
-            for step in process.steps.all():
-                step_heading = doc.add_heading(f'{step.order}. {step.title}', level=3)
-                
-                if step.details:
-                    lines = step.details.split('\n')
-                    bullet_idx = -1
-                    for raw in lines:
-                        line = raw.rstrip('\r')
-                        is_bullet = bool(re.match(r'^\s*-\s+', line))
-                        if is_bullet:
-                            bullet_idx += 1
-                        bullet_text_match = re.match(r'^\s*-\s+(.*)$', line)
-                        bullet_text = bullet_text_match.group(1) if bullet_text_match else line
-                        if is_bullet and show_attachments and step.images.exists():
-                            related = [img for img in step.images.all() if img.substep_index == bullet_idx]
-                            if related:
-                                for img in related:
-                                    try:
-                                        img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                                        if os.path.exists(img_path):
-                                            table = doc.add_table(rows=1, cols=1)
-                                            table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            cell = table.cell(0, 0)
-                                            cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            paragraph = cell.paragraphs[0]
-                                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            paragraph.paragraph_format.keep_with_next = True
-                                            run = paragraph.add_run()
-                                            run.add_picture(img_path, width=Inches(6))
-                                            cap = cell.add_paragraph(bullet_text)
-                                            cap.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            cap.paragraph_format.space_before = Pt(6)
-                                            cap.paragraph_format.line_spacing = 1.15
-                                            cap.paragraph_format.keep_together = True
-                                            cap.paragraph_format.keep_with_next = False
-                                            # Prevent table row from splitting across pages
-                                            from docx.oxml.shared import OxmlElement, qn
-                                            tr = table.rows[0]._tr
-                                            trPr = tr.get_or_add_trPr()
-                                            cantSplit = OxmlElement('w:cantSplit')
-                                            trPr.append(cantSplit)
-                                            for r in cap.runs:
-                                                r.font.size = Pt(12)
-                                            tc = cell._tc
-                                            tcPr = tc.get_or_add_tcPr()
-                                            tcBorders = OxmlElement('w:tcBorders')
-                                            for border_name in ['top', 'left', 'bottom', 'right']:
-                                                border = OxmlElement(f'w:{border_name}')
-                                                border.set(qn('w:val'), 'single')
-                                                border.set(qn('w:sz'), '8')
-                                                border.set(qn('w:space'), '0')
-                                                border.set(qn('w:color'), 'CCCCCC')
-                                                tcBorders.append(border)
-                                            tcPr.append(tcBorders)
-                                    except Exception:
-                                        pass
-                                continue
-                        p = doc.add_paragraph(line)
-                        p.paragraph_format.space_after = Inches(0.05)
-                        p.paragraph_format.line_spacing = 1.15
-                # Any remaining images without substep_index
-                if show_attachments and step.images.exists():
-                    for img in step.images.all():
-                        if img.substep_index is None:
-                            try:
-                                img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                                if os.path.exists(img_path):
-                                    table = doc.add_table(rows=1, cols=1)
-                                    table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    cell = table.cell(0, 0)
-                                    cell.vertical_alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    paragraph = cell.paragraphs[0]
-                                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    run = paragraph.add_run()
-                                    run.add_picture(img_path, width=Inches(6))
-                                    from docx.oxml.shared import OxmlElement, qn
-                                    tc = cell._tc
-                                    tcPr = tc.get_or_add_tcPr()
-                                    tcBorders = OxmlElement('w:tcBorders')
-                                    for border_name in ['top', 'left', 'bottom', 'right']:
-                                        border = OxmlElement(f'w:{border_name}')
-                                        border.set(qn('w:val'), 'single')
-                                        border.set(qn('w:sz'), '12')
-                                        border.set(qn('w:space'), '0')
-                                        border.set(qn('w:color'), '333333')
-                                        tcBorders.append(border)
-                                    tcPr.append(tcBorders)
-                            except Exception:
-                                pass
-        
-        # Notes
-        if show_notes and process.notes:
-            doc.add_heading('Notes', level=2)
-            p = doc.add_paragraph(process.notes)
-            p.paragraph_format.space_after = Inches(0.1)
-            p.paragraph_format.line_spacing = 1.15
-        
-        # Analysis (Markdown -> Word)
-        if show_analysis and process.analysis:
-            doc.add_heading('Process Analysis', level=2)
-            add_markdown_to_word_doc(doc, process.analysis, level=3)
-        
-        # Add Process History section with timestamps for this process
-        doc.add_heading('Process History', level=2)
-        
-        # Process timestamps
-        from django.utils import timezone
-        process_created = process.created_at.strftime('%B %d, %Y at %I:%M %p')
-        process_updated = process.updated_at.strftime('%B %d, %Y at %I:%M %p')
-        
-        history_p = doc.add_paragraph()
-        history_p.add_run('Process: ').bold = True
-        history_p.add_run(f'Created {process_created}, Last Updated {process_updated}')
-        
-        # Step timestamps
-        if process.steps.exists():
-            doc.add_heading('Step History', level=3)
-            for step in process.steps.all():
-                step_created = step.created_at.strftime('%B %d, %Y at %I:%M %p')
-                step_updated = step.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                
-                step_p = doc.add_paragraph()
-                step_p.add_run(f'Step {step.order}: {step.title} - ').bold = True
-                step_p.add_run(f'Created {step_created}, Updated {step_updated}')
-                
-                # Substep timestamps (for images and files)
-                if show_attachments:
-                    # Image timestamps
-                    if step.images.exists():
-                        doc.add_heading(f'Images for Step {step.order}', level=4)
-                        for img in step.images.all():
-                            img_uploaded = img.uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-                            img_updated = img.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                            img_p = doc.add_paragraph()
-                            img_p.add_run(f'Image {img.order}: ').bold = True
-                            img_p.add_run(f'{os.path.basename(img.image.name)} - Uploaded {img_uploaded}, Updated {img_updated}')
-                            if img.substep_index is not None:
-                                img_p.add_run(f' (Associated with substep {img.substep_index + 1})')
-                    
-                    # File timestamps
-                    if step.files.exists():
-                        doc.add_heading(f'Files for Step {step.order}', level=4)
-                        for file in step.files.all():
-                            file_uploaded = file.uploaded_at.strftime('%B %d, %Y at %I:%M %p')
-                            file_updated = file.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                            file_p = doc.add_paragraph()
-                            file_p.add_run(f'File {file.order}: ').bold = True
-                            file_p.add_run(f'{os.path.basename(file.file.name)} - Uploaded {file_uploaded}, Updated {file_updated}')
-                    
-                    # Link timestamps
-                    if step.links.exists():
-                        doc.add_heading(f'Links for Step {step.order}', level=4)
-                        for link in step.links.all():
-                            link_created = link.created_at.strftime('%B %d, %Y at %I:%M %p')
-                            link_updated = link.updated_at.strftime('%B %d, %Y at %I:%M %p')
-                            link_p = doc.add_paragraph()
-                            link_p.add_run(f'Link {link.order}: ').bold = True
-                            link_p.add_run(f'{link.title} - Created {link_created}, Updated {link_updated}')
-    
-    # Add history section if history data is provided
-    if history_data:
-        doc.add_page_break()
-        doc.add_heading('History', level=1)
-        
-        for i, history_item in enumerate(history_data, 1):
-            # History item title
-            history_heading = doc.add_heading(f'{i}. {history_item.get("type", "Unknown")} - {history_item.get("date", "")}', level=2)
-            
-            # History content (Markdown -> Word)
-            content = history_item.get('content', '')
-            if content:
-                add_markdown_to_word_doc(doc, content, level=3)
-    
-    doc_io = BytesIO()
-    doc.settings.odd_and_even_pages_header_footer = False
-    doc.save(doc_io)
-    doc_io.seek(0)
-    
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    # Prefer module name in filename if all processes share one module or module filter provided
-    module_name = None
-    selected_module_id = request.GET.get('module')
-    if selected_module_id:
-        try:
-            module_obj = Module.objects.get(id=selected_module_id)
-            module_name = module_obj.name
-        except Module.DoesNotExist:
-            module_name = None
-    if module_name is None:
-        # Derive common module if all selected processes share same module
-        modules = list({p.module.name for p in processes if p.module is not None})
-        if len(modules) == 1:
-            module_name = modules[0]
-    if module_name:
-        safe_module = "".join(c for c in module_name if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '-')
-        filename = f"{safe_module}-{timestamp}.docx"
-    else:
-        filename = f"Bulk-Process-Report-{timestamp}.docx"
-    
-    response = HttpResponse(doc_io.getvalue(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
+
+@login_required
+@require_app_access('process_creator', action='view')
+@require_POST
+def export_enqueue(request):
+    """Queue a PDF/Word export for the background worker.
+
+    Expects ``kind`` (process_pdf, process_word, bulk_pdf, bulk_word), an optional
+    ``process_id`` and ``query`` holding the same querystring the direct
+    download URL would receive.
+    """
+    kind = request.POST.get('kind', '')
+    if kind not in EXPORT_KINDS:
+        return JsonResponse({"ok": False, "error": "Unknown export type"}, status=400)
+    process = None
+    if kind.startswith('process_'):
+        process = get_object_or_404(Process, pk=request.POST.get('process_id') or 0)
+    params = QueryDict(request.POST.get('query', ''))
+    if kind.startswith('bulk_') and not selected_process_ids(params):
+        return JsonResponse({"ok": False, "error": "No processes selected"}, status=400)
+    job = enqueue_export(kind, params, process=process, user=request.user)
+    return JsonResponse({
+        "ok": True,
+        "id": job.id,
+        "status": job.status,
+        "status_url": reverse('process_creator:export_job_status', args=[job.id]),
+        "cancel_url": reverse('process_creator:export_job_cancel', args=[job.id]),
+    })
+
+
+def _export_jobs_for(user):
+    """Export jobs ``user`` may see: their own, or any for staff."""
+    jobs = ExportJob.objects.all()
+    return jobs if user.is_staff else jobs.filter(requested_by=user)
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+@require_POST
+def export_job_cancel(request, job_id: int):
+    """Called when the browser gives up waiting for a worker and downloads directly."""
+    job = get_object_or_404(_export_jobs_for(request.user), id=job_id)
+    cancelled = cancel_queued_job(job.id, "Cancelled: no export worker picked it up; rendered directly instead")
+    return JsonResponse({"ok": cancelled, "status": "failed" if cancelled else job.status})
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+def export_job_status(request, job_id: int):
+    job = get_object_or_404(_export_jobs_for(request.user), id=job_id)
+    data = {"ok": True, "id": job.id, "status": job.status, "error": job.error}
+    if job.status == 'completed':
+        data["download_url"] = reverse('process_creator:export_job_download', args=[job.id])
+        data["filename"] = job.filename
+    return JsonResponse(data)
+
+
+@login_required
+@require_app_access('process_creator', action='view')
+def export_job_download(request, job_id: int):
+    job = get_object_or_404(_export_jobs_for(request.user), id=job_id, status='completed')
+    if not job.result:
+        raise Http404("Export file missing")
+    response = FileResponse(job.result.open('rb'), content_type=job.content_type or 'application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{quote(job.filename)}"'
     response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response['Pragma'] = 'no-cache'
     response['Expires'] = '0'
@@ -1869,7 +1305,8 @@ def job_create(request, tpl_id: int):
         with transaction.atomic():
             job = Job.objects.create(template=template, name=name, assigned_to=assignee, template_version_at_create=template.version)
             steps = list(template.steps.all().order_by('order', 'id'))
-            JobStep.objects.bulk_create([JobStep(job=job, order=s.order, title=s.title, details=s.details or '') for s in steps])
+            # bulk_create sends no post_save, so index the new steps here
+            index_objects(JobStep.objects.bulk_create([JobStep(job=job, order=s.order, title=s.title, details=s.details or '') for s in steps]))
             # Create bullet-level subtasks
             from .models import JobSubtask
             job_steps = {js.order: js for js in job.steps.all()}
@@ -1991,203 +1428,35 @@ def job_step_unblock(request, job_id: int, job_step_id: int):
 @login_required
 @require_app_access('process_creator', action='view')
 def job_print(request, job_id: int):
-    job = get_object_or_404(Job.objects.select_related('template', 'template__source_process'), id=job_id)
-    steps = job.steps.all().order_by('order', 'id')
-    return render(request, 'process_creator/job_print.html', {'job': job, 'steps': steps, 'JOB_LABEL': JOB_LABEL})
+    job = get_object_or_404(Job.objects.select_related('template'), id=job_id)
+    return HttpResponse(job_to_html(build_job_doc(job, JOB_LABEL), request))
 
 
 @login_required
 @require_app_access('process_creator', action='view')
 def job_pdf(request, job_id: int):
-    job = get_object_or_404(Job.objects.select_related('template', 'template__source_process'), id=job_id)
-    steps = job.steps.all().order_by('order', 'id')
-    html_string = render_to_string('process_creator/job_print.html', {'job': job, 'steps': steps, 'JOB_LABEL': JOB_LABEL})
-    def link_callback(uri, rel):
-        if uri.startswith('/media/'):
-            path = os.path.join(settings.MEDIA_ROOT, uri.replace('/media/', ''))
-            return path
-        if uri.startswith('/static/'):
-            static_root = getattr(settings, 'STATIC_ROOT', None)
-            if static_root:
-                return os.path.join(static_root, uri.replace('/static/', ''))
-        return uri
-    pdf_io = BytesIO()
-    pisa.CreatePDF(src=html_string, dest=pdf_io, link_callback=link_callback, encoding='utf-8')
-    pdf_io.seek(0)
+    job = get_object_or_404(Job.objects.select_related('template'), id=job_id)
+    content = html_to_pdf(job_to_html(build_job_doc(job, JOB_LABEL), request))
     from datetime import datetime
     timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
     safe_title = ''.join(c for c in job.name if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '-')
     filename = f"{JOB_LABEL}-{safe_title}-{timestamp}.pdf"
-    response = HttpResponse(pdf_io.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    return _export_response(content, filename, 'application/pdf')
 
 
 @login_required
 @require_app_access('process_creator', action='view')
 def job_word(request, job_id: int):
-    job = get_object_or_404(Job.objects.select_related('template', 'template__source_process'), id=job_id)
-    steps = job.steps.all().order_by('order', 'id')
+    job = get_object_or_404(Job.objects.select_related('template'), id=job_id)
     show_attachments = request.GET.get('show_attachments', 'false').lower() == 'true'
-    doc = Document()
-    try:
-        if len(doc.paragraphs) and not doc.paragraphs[0].text.strip():
-            p = doc.paragraphs[0]
-            p._element.getparent().remove(p._element)
-    except Exception:
-        pass
-    try:
-        from docx.enum.section import WD_SECTION_START
-        for section in doc.sections:
-            section.start_type = WD_SECTION_START.NEW_PAGE
-            section.different_first_page_header_footer = False
-    except Exception:
-        pass
-    title = doc.add_paragraph(f"{JOB_LABEL}: {job.name}", style='Heading 1')
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    try:
-        title.paragraph_format.page_break_before = False
-    except Exception:
-        pass
-    # Overall percent based on subtasks
-    total_subtasks = 0
-    done_subtasks = 0
-    for s in steps:
-        total_subtasks += s.subtasks.count()
-        done_subtasks += s.subtasks.filter(completed=True).count()
-    overall_percent = int(round((done_subtasks / total_subtasks) * 100)) if total_subtasks else int(round((sum(1 for s in steps if s.status=='completed') / (steps.count() or 1)) * 100))
-
-    # Status summary
-    doc.add_paragraph(f"Status: {job.get_status_display()} — Completion: {overall_percent}%")
-
-    if steps.exists():
-        doc.add_heading('Steps', level=1)
-        source_steps = list(job.template.source_process.steps.all()) if job.template and job.template.source_process_id else []
-        source_by_order = {s.order: s for s in source_steps}
-        for step in steps:
-            st_total = step.subtasks.count()
-            st_done = step.subtasks.filter(completed=True).count()
-            st_pct = int(round((st_done / st_total) * 100)) if st_total else (100 if step.status == 'completed' else 0)
-            doc.add_heading(f'{step.order}. {step.title} — {st_pct}%', level=2)
-            if step.details:
-                lines = step.details.split('\n')
-                bullet_idx = -1
-                for raw in lines:
-                    line = raw.rstrip('\r')
-                    is_bullet = bool(re.match(r'^\s*-\s+', line))
-                    if is_bullet:
-                        bullet_idx += 1
-                    bullet_text_match = re.match(r'^\s*-\s+(.*)$', line)
-                    bullet_text = bullet_text_match.group(1) if bullet_text_match else line
-                    if is_bullet and show_attachments:
-                        src = source_by_order.get(step.order)
-                        if src and src.images.exists():
-                            related = [img for img in src.images.all() if img.substep_index == bullet_idx]
-                            if related:
-                                for img in related:
-                                    try:
-                                        img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                                        if os.path.exists(img_path):
-                                            table = doc.add_table(rows=1, cols=1)
-                                            table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            cell = table.cell(0, 0)
-                                            paragraph = cell.paragraphs[0]
-                                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                            run = paragraph.add_run()
-                                            run.add_picture(img_path, width=Inches(6))
-                                            cap = cell.add_paragraph(bullet_text)
-                                            cap.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    except Exception:
-                                        pass
-                                continue
-                    p = doc.add_paragraph(line)
-                    p.paragraph_format.space_after = Inches(0.05)
-                    p.paragraph_format.line_spacing = 1.15
-            # Subtasks as checkboxes
-            if step.subtasks.exists():
-                for t in step.subtasks.all().order_by('order', 'id'):
-                    box = '☑' if t.completed else '☐'
-                    doc.add_paragraph(f'{box} {t.text}')
-
-            # Include pasted job images (documentation)
-            if step.images.exists():
-                for jim in step.images.all().order_by('order', 'id'):
-                    try:
-                        img_path = os.path.join(settings.MEDIA_ROOT, str(jim.image))
-                        if os.path.exists(img_path):
-                            p = doc.add_paragraph()
-                            r = p.add_run()
-                            r.add_picture(img_path, width=Inches(6))
-                    except Exception:
-                        pass
-
-            # Include step notes (emphasized title + boxed area)
-            if step.notes:
-                doc.add_heading('NOTES', level=3)
-                # Box container using single-cell table with borders
-                table = doc.add_table(rows=1, cols=1)
-                cell = table.cell(0, 0)
-                # Apply borders
-                try:
-                    from docx.oxml.shared import OxmlElement, qn
-                    tc = cell._tc
-                    tcPr = tc.get_or_add_tcPr()
-                    tcBorders = OxmlElement('w:tcBorders')
-                    for border_name in ['top', 'left', 'bottom', 'right']:
-                        border = OxmlElement(f'w:{border_name}')
-                        border.set(qn('w:val'), 'single')
-                        border.set(qn('w:sz'), '16')
-                        border.set(qn('w:space'), '0')
-                        border.set(qn('w:color'), '555555')
-                        tcBorders.append(border)
-                    tcPr.append(tcBorders)
-                except Exception:
-                    pass
-                # Add notes content inside the box
-                # Clear default empty paragraph
-                cell.text = ''
-                for ln in step.notes.split('\n'):
-                    if ln.strip().startswith('- '):
-                        p = cell.add_paragraph(ln.strip()[2:].strip(), style='List Bullet')
-                    else:
-                        p = cell.add_paragraph(ln)
-
-            if show_attachments:
-                src = source_by_order.get(step.order)
-                if src and src.images.exists():
-                    for img in src.images.all():
-                        if img.substep_index is None:
-                            try:
-                                img_path = os.path.join(settings.MEDIA_ROOT, str(img.image))
-                                if os.path.exists(img_path):
-                                    table = doc.add_table(rows=1, cols=1)
-                                    table.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    cell = table.cell(0, 0)
-                                    paragraph = cell.paragraphs[0]
-                                    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                                    run = paragraph.add_run()
-                                    run.add_picture(img_path, width=Inches(6))
-                            except Exception:
-                                pass
-    doc_io = BytesIO()
-    doc.settings.odd_and_even_pages_header_footer = False
-    doc.save(doc_io)
-    doc_io.seek(0)
+    content = job_to_docx(build_job_doc(job, JOB_LABEL), show_attachments)
     from datetime import datetime
     timestamp_date = datetime.now().strftime('%m-%d-%y')
     timestamp_time = datetime.now().strftime('%I-%M%p').lower()
     safe_title = ''.join(c for c in job.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
     status_text = job.get_status_display().upper()
     filename = f"{safe_title} {status_text} -- {timestamp_date} -- {timestamp_time}.docx"
-    response = HttpResponse(doc_io.getvalue(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-    response['Content-Disposition'] = f'attachment; filename="{quote(filename)}"'
-    response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
-    return response
+    return _export_response(content, filename, DOCX_CONTENT_TYPE)
 
 @login_required
 @require_app_access('process_creator', action='edit')
@@ -2205,6 +1474,8 @@ def template_publish(request, tpl_id: int):
 @require_POST
 def template_create_from_selected(request):
     ids = request.POST.getlist('process_ids[]') or request.POST.getlist('process_ids')
+    if request.POST.get('all') == 'true':
+        ids = [str(pk) for pk in all_process_ids(request.POST.get('filter_module'))]
     name = (request.POST.get('name') or '').strip()
     module_id = request.POST.get('module')
     if not ids or not name or not module_id:
@@ -2288,7 +1559,7 @@ def job_step_image_upload(request, job_step_id: int):
         sub_idx = None
     max_order = step.images.aggregate(models.Max('order')).get('order__max') or 0
     jsi = JobStepImage.objects.create(job_step=step, image=img_file, order=max_order + 1, subtask_index=sub_idx)
-    return JsonResponse({'ok': True, 'id': jsi.id, 'url': jsi.image.url})
+    return JsonResponse({'ok': True, 'id': jsi.id, 'url': jsi.image.url, 'thumb_url': derivative_url(jsi.image, 'thumb')})
 
 
 @login_required